@@ -10,10 +10,26 @@ import pandas as pd
 import plotly.graph_objects as go
 import plotly.express as px
 from plotly.subplots import make_subplots
+import plotly.io as pio
+from plotly.offline import get_plotlyjs, get_plotlyjs_version
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+from markupsafe import Markup
 import json
+import argparse
+import base64
+import gzip
+import hashlib
+import html
+import multiprocessing
+import os
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime, timedelta
 from pathlib import Path
 from data_loader import get_data_loader
+from utils.data_processor import build_activity_fact_table
+from utils.downsampling import DEFAULT_MAX_POINTS, downsample_time_series, format_downsample_note
 
 def load_and_prepare_data(target_month: str) -> dict:
     """
@@ -30,9 +46,11 @@ def load_and_prepare_data(target_month: str) -> dict:
     try:
         # 基本データの読み込み
         basic_data, detail_data, summary_data = loader.load_analysis_data(target_month)
+        monthly_analysis = {}
         
         result = {
             'basic_data': None,
+            'daily_history': None,
             'detail_data': None,
             'summary_data': None,
             'retention_data': None,
@@ -42,7 +60,12 @@ def load_and_prepare_data(target_month: str) -> dict:
         if not basic_data:
             pass
         else:
-            result['basic_data'] = pd.DataFrame(basic_data)
+            # 対象月のスタッフ別daily_activityを型付きのファクトテーブルに展開
+            monthly_analysis = basic_data.get('monthly_analysis', {})
+            month_data = monthly_analysis.get(target_month, {})
+            df_activity = build_activity_fact_table(month_data.get('staff', {}))
+            if not df_activity.empty:
+                result['basic_data'] = df_activity
             result['has_data'] = True
         
         if not detail_data:
@@ -72,30 +95,18 @@ def load_and_prepare_data(target_month: str) -> dict:
         if result['basic_data'] is not None:
             df_basic = result['basic_data']
             
-            # 日付カラムの処理
-            if 'date' in df_basic.columns:
-                df_basic['date'] = pd.to_datetime(df_basic['date'], errors='coerce')
+            # 日付・数値カラムはファクトテーブル構築時に型変換済み
+            result['basic_data'] = add_appointment_rate(df_basic)
             
-            # 数値カラムの前処理
-            numeric_columns = ['call_count', 'reception_bk', 'no_one_in_charge', 'disconnect', 
-                             'charge_connected', 'charge_bk', 'get_appointment', 'call_hours']
-            
-            for col in numeric_columns:
-                if col in df_basic.columns:
-                    df_basic[col] = pd.to_numeric(df_basic[col], errors='coerce').fillna(0)
-            
-            # アポ率の計算
-            df_basic['appointment_rate'] = (
-                df_basic['get_appointment'] / df_basic['call_count'] * 100
-            ).fillna(0)
-            
-            result['basic_data'] = df_basic
+            # 日別トレンドは対象月までの全月分
+            result['daily_history'] = build_daily_history(monthly_analysis, target_month, result['basic_data'])
         
         return result
         
     except Exception as e:
         return {
             'basic_data': None,
+            'daily_history': None,
             'detail_data': None,
             'summary_data': None,
             'retention_data': None,
@@ -103,6 +114,51 @@ def load_and_prepare_data(target_month: str) -> dict:
             'error': str(e)
         }
 
+def add_appointment_rate(df_activity):
+    """日報データにアポ率（%）の列を追加"""
+    df_activity['appointment_rate'] = (
+        df_activity['get_appointment'] / df_activity['call_count'] * 100
+    ).fillna(0)
+    return df_activity
+
+def aggregate_daily_stats(df_activity):
+    """日報データを日別に集計（架電数・アポ数は合計、アポ率は平均）"""
+    return df_activity.groupby('date').agg({
+        'call_count': 'sum',
+        'get_appointment': 'sum',
+        'appointment_rate': 'mean'
+    }).reset_index()
+
+def build_daily_history(monthly_analysis, target_month, df_target=None):
+    """
+    対象月までの全月の日別集計を作成
+    
+    1ヶ月ずつファクトテーブルに展開して日別に集計してから結合するため、
+    全月の日報データを同時にメモリへ載せない。
+    
+    Args:
+        monthly_analysis: 基本分析のmonthly_analysis
+        target_month (str): 対象月（YYYY-MM形式）
+        df_target: 対象月のファクトテーブル（アポ率付き。渡した場合は再展開しない）
+    
+    Returns:
+        pd.DataFrame: 日付順の日別集計（データがない場合はNone）
+    """
+    daily_frames = []
+    for month in sorted(m for m in monthly_analysis if m <= target_month):
+        if month == target_month and df_target is not None:
+            df_month = df_target
+        else:
+            df_month = build_activity_fact_table(monthly_analysis[month].get('staff', {}))
+            if df_month.empty:
+                continue
+            df_month = add_appointment_rate(df_month)
+        daily_frames.append(aggregate_daily_stats(df_month))
+    
+    if not daily_frames:
+        return None
+    return pd.concat(daily_frames, ignore_index=True).sort_values('date', ignore_index=True)
+
 def extract_monthly_conversion_data(detail_data):
     """詳細データから月次コンバージョンデータを抽出"""
     try:
@@ -119,18 +175,29 @@ def extract_monthly_conversion_data(detail_data):
     except Exception as e:
         return None
 
-def create_daily_trend_chart(df_basic):
-    """日別トレンドチャートを作成"""
-    if df_basic is None or df_basic.empty:
+def create_daily_trend_chart(daily_stats, max_points=DEFAULT_MAX_POINTS):
+    """
+    日別トレンドチャートを作成
+    
+    Args:
+        daily_stats: 日別集計のDataFrame（build_daily_history の結果）
+        max_points: 系列あたりの最大描画点数（超える場合はピーク・谷を残して間引く）
+    
+    Returns:
+        go.Figure: チャート（データがない場合はNone）
+    """
+    if daily_stats is None or daily_stats.empty:
         return None
     
     try:
-        # 日別集計
-        daily_stats = df_basic.groupby('date').agg({
-            'call_count': 'sum',
-            'get_appointment': 'sum',
-            'appointment_rate': 'mean'
-        }).reset_index()
+        # 長期間の場合は間引いて描画
+        total_points = len(daily_stats)
+        daily_stats, dropped_points = downsample_time_series(
+            daily_stats,
+            'date',
+            ['call_count', 'get_appointment', 'appointment_rate'],
+            max_points=max_points
+        )
         
         # チャート作成
         fig = make_subplots(
@@ -172,16 +239,20 @@ def create_daily_trend_chart(df_basic):
             row=2, col=1
         )
         
+        title_text = "日別パフォーマンス推移"
+        if dropped_points:
+            title_text += f"<br><sup>{format_downsample_note(dropped_points, total_points)}</sup>"
+        
         fig.update_layout(
             height=600,
-            title_text="日別パフォーマンス推移",
+            title_text=title_text,
             showlegend=True
         )
         
         return fig
         
     except Exception as e:
-        if 'date' not in df_basic.columns:
+        if 'date' not in daily_stats.columns:
             pass
         return None
 
@@ -192,7 +263,7 @@ def create_staff_performance_chart(df_basic):
     
     try:
         # スタッフ別集計
-        staff_stats = df_basic.groupby('staff_name').agg({
+        staff_stats = df_basic.groupby('staff_name', observed=True).agg({
             'call_count': 'sum',
             'get_appointment': 'sum',
             'call_hours': 'sum'
@@ -268,7 +339,7 @@ def create_product_analysis_chart(df_basic):
     
     try:
         # 商材別集計
-        product_stats = df_basic.groupby('product').agg({
+        product_stats = df_basic.groupby('product', observed=True).agg({
             'call_count': 'sum',
             'get_appointment': 'sum',
             'call_hours': 'sum'
@@ -322,94 +393,118 @@ def create_product_analysis_chart(df_basic):
     except Exception as e:
         return None
 
-def generate_dashboard_html(target_month: str, output_path: str = None) -> str:
+# ダッシュボードのHTMLテンプレート
+TEMPLATE_DIR = Path(__file__).parent / 'templates'
+DASHBOARD_TEMPLATE_NAME = 'analysis_dashboard_template.html'
+
+# plotly.jsの読み込み方式（cdn: CDN参照, shared: 出力先の共有アセット, inline: HTMLに埋め込み）
+PLOTLY_JS_MODES = ['cdn', 'shared', 'inline']
+PLOTLY_ASSET_DIR = 'assets'
+
+_template_env = None
+
+def get_template_environment() -> Environment:
+    """テンプレート環境を取得（プロセス内で使い回す）"""
+    global _template_env
+    
+    if _template_env is None:
+        _template_env = Environment(
+            loader=FileSystemLoader(str(TEMPLATE_DIR)),
+            autoescape=select_autoescape(['html'])
+        )
+    
+    return _template_env
+
+def plotly_asset_name() -> str:
+    """共有アセットとして書き出すplotly.jsのファイル名"""
+    return f'plotly-{get_plotlyjs_version()}.min.js'
+
+def ensure_plotly_asset(output_dir) -> Path:
+    """
+    出力先の共有アセットディレクトリにplotly.jsを書き出す（既にあれば何もしない）
+    
+    Args:
+        output_dir: ダッシュボードの出力ディレクトリ
+        
+    Returns:
+        Path: plotly.jsのパス
+    """
+    asset_path = Path(output_dir) / PLOTLY_ASSET_DIR / plotly_asset_name()
+    if not asset_path.exists():
+        asset_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = asset_path.with_suffix('.tmp')
+        tmp_path.write_text(get_plotlyjs(), encoding='utf-8')
+        os.replace(tmp_path, asset_path)
+    return asset_path
+
+def _figure_json(fig, compress=False) -> Markup:
+    """
+    FigureをHTML埋め込み用のコンパクトなJSONに変換
+    
+    <script>内に安全に埋め込めるよう、HTMLとして解釈される文字をエスケープする。
+    compress=Trueの場合はgzip圧縮してBase64で返す。
+    """
+    payload = pio.to_json(fig, validate=False, pretty=False)
+    if compress:
+        compressed = gzip.compress(payload.encode('utf-8'), mtime=0)
+        return Markup(base64.b64encode(compressed).decode('ascii'))
+    payload = payload.replace('<', '\\u003c').replace('>', '\\u003e').replace('&', '\\u0026')
+    return Markup(payload)
+
+def _iter_chart_payloads(chart_builders, compress=False):
+    """
+    チャートを1つずつ作成・JSON化して返すジェネレーター
+    
+    テンプレートの出力と同時に進むため、全チャートのHTMLを同時に保持しない。
+    """
+    chart_id = 0
+    for chart_name, builder in chart_builders:
+        chart = builder()
+        if chart is None:
+            continue
+        chart_id += 1
+        yield {
+            'id': f'chart{chart_id}',
+            'name': chart_name,
+            'json': _figure_json(chart, compress),
+            'encoding': 'gzip-base64' if compress else 'json'
+        }
+
+def generate_dashboard_html(target_month: str, output_path: str = None,
+                            plotly_js: str = 'cdn', compress_data: bool = False) -> str:
     """
     HTMLダッシュボードを生成
     
+    テンプレートの出力をファイルへ逐次書き込むため、ページ全体を文字列として保持しない。
+    
     Args:
         target_month (str): 対象月（YYYY-MM形式）
         output_path (str): 出力パス（Noneの場合はデフォルト）
+        plotly_js (str): plotly.jsの読み込み方式（PLOTLY_JS_MODES）
+        compress_data (bool): チャートデータをgzip圧縮して埋め込むか
         
     Returns:
         str: 生成されたHTMLファイルのパス
     """
+    if plotly_js not in PLOTLY_JS_MODES:
+        raise ValueError(f"未対応のplotly.js読み込み方式です: {plotly_js}")
+    
     # データ読み込み
     data = load_and_prepare_data(target_month)
     
     if not data['has_data']:
-        raise ValueError(f"月 {target_month} のデータが見つかりません")
-    
-    # チャート作成
-    charts = {}
-    
-    if data['basic_data'] is not None:
-        charts['daily_trend'] = create_daily_trend_chart(data['basic_data'])
-        charts['staff_performance'] = create_staff_performance_chart(data['basic_data'])
-        charts['product_analysis'] = create_product_analysis_chart(data['basic_data'])
-    
-    # HTML生成
-    html_content = f"""
-    <!DOCTYPE html>
-    <html lang="ja">
-    <head>
-        <meta charset="UTF-8">
-        <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <title>架電分析ダッシュボード - {target_month}</title>
-        <script src="https://cdn.plot.ly/plotly-latest.min.js"></script>
-        <style>
-            body {{
-                font-family: 'Helvetica Neue', Arial, sans-serif;
-                margin: 0;
-                padding: 20px;
-                background-color: #f5f5f5;
-            }}
-            .header {{
-                text-align: center;
-                margin-bottom: 30px;
-                padding: 20px;
-                background-color: white;
-                border-radius: 10px;
-                box-shadow: 0 2px 10px rgba(0,0,0,0.1);
-            }}
-            .chart-container {{
-                background-color: white;
-                padding: 20px;
-                margin: 20px 0;
-                border-radius: 10px;
-                box-shadow: 0 2px 10px rgba(0,0,0,0.1);
-            }}
-            .chart {{
-                width: 100%;
-                height: 500px;
-            }}
-        </style>
-    </head>
-    <body>
-        <div class="header">
-            <h1>📞 架電分析ダッシュボード</h1>
-            <h2>{target_month}</h2>
-            <p>生成日時: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</p>
-        </div>
-    """
+        detail = f"（{data['error']}）" if data.get('error') else ""
+        raise ValueError(f"月 {target_month} のデータが見つかりません{detail}")
     
-    # チャートをHTMLに追加
-    chart_id = 0
-    for chart_name, chart in charts.items():
-        if chart is not None:
-            chart_id += 1
-            html_content += f"""
-            <div class="chart-container">
-                <div id="chart{chart_id}" class="chart"></div>
-                <script>
-                    {chart.to_html(include_plotlyjs=False, div_id=f"chart{chart_id}")}
-                </script>
-            </div>
-            """
-    
-    html_content += """
-    </body>
-    </html>
-    """
+    # チャート作成処理（描画時に1つずつ実行）
+    chart_builders = []
+    df_basic = data['basic_data']
+    if df_basic is not None:
+        chart_builders = [
+            ('daily_trend', lambda: create_daily_trend_chart(data['daily_history'])),
+            ('staff_performance', lambda: create_staff_performance_chart(df_basic)),
+            ('product_analysis', lambda: create_product_analysis_chart(df_basic))
+        ]
     
     # ファイル保存
     if output_path is None:
@@ -417,22 +512,425 @@ def generate_dashboard_html(target_month: str, output_path: str = None) -> str:
         output_dir.mkdir(exist_ok=True)
         output_path = output_dir / 'dashboard.html'
     
+    # plotly.jsの参照先
+    plotly_js_src = f"https://cdn.plot.ly/plotly-{get_plotlyjs_version()}.min.js"
+    plotly_js_inline = None
+    if plotly_js == 'shared':
+        asset_path = ensure_plotly_asset(Path(output_path).parent)
+        plotly_js_src = f"{PLOTLY_ASSET_DIR}/{asset_path.name}"
+    elif plotly_js == 'inline':
+        plotly_js_inline = Markup(get_plotlyjs())
+    
+    template = get_template_environment().get_template(DASHBOARD_TEMPLATE_NAME)
+    stream = template.generate(
+        target_month=target_month,
+        generated_at=datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        plotly_js_src=plotly_js_src,
+        plotly_js_inline=plotly_js_inline,
+        charts=_iter_chart_payloads(chart_builders, compress_data)
+    )
+    
     with open(output_path, 'w', encoding='utf-8') as f:
-        f.write(html_content)
+        for chunk in stream:
+            f.write(chunk)
     
     return str(output_path)
 
-if __name__ == '__main__':
-    # 最新月のダッシュボードを生成
+def select_months(available_months, start_month=None, end_month=None):
+    """
+    利用可能な月から対象期間の月を抽出
+    
+    Args:
+        available_months (list): 利用可能な月（YYYY-MM形式）
+        start_month (str): 開始月（Noneの場合は制限なし）
+        end_month (str): 終了月（Noneの場合は制限なし）
+        
+    Returns:
+        list: 対象月のリスト（昇順）
+    """
+    return sorted(
+        month for month in available_months
+        if (start_month is None or month >= start_month)
+        and (end_month is None or month <= end_month)
+    )
+
+def _init_batch_worker(zip_path):
+    """
+    バッチ生成ワーカーの初期化
+    
+    fork方式では親プロセスで読み込んだデータをそのまま（読み取り専用で）共有するため
+    何もしない。spawn方式の環境ではワーカーごとにZipを読み込む。
+    """
+    loader = get_data_loader()
+    if not loader.get_available_months():
+        loader.load_from_zip(zip_path)
+
+def _generate_month_report(target_month, output_path, render_options=None):
+    """1ヶ月分のダッシュボードを生成し、所要時間を計測"""
+    started = time.perf_counter()
     try:
-        loader = get_data_loader()
-        months = loader.get_available_months()
+        path = generate_dashboard_html(target_month, output_path, **(render_options or {}))
+        error = None
+    except Exception as e:
+        path = None
+        error = str(e)
+    return {
+        'month': target_month,
+        'path': path,
+        'seconds': time.perf_counter() - started,
+        'error': error
+    }
+
+def generate_index_html(results, output_dir) -> str:
+    """
+    月別ダッシュボードへのリンク一覧（index.html）を生成
+    
+    Args:
+        results (list): generate_batch_dashboards の結果
+        output_dir: 出力ディレクトリ
         
-        if months:
-            latest_month = months[0]
-            output_file = generate_dashboard_html(latest_month)
+    Returns:
+        str: 生成されたindex.htmlのパス
+    """
+    rows = []
+    for result in sorted(results, key=lambda r: r['month'], reverse=True):
+        month = html.escape(result['month'])
+        if result.get('skipped'):
+            link = f'<a href="{html.escape(Path(result["path"]).name)}">{month}</a>'
+            status = '⏭️ 変更なし（前回の出力を使用）'
+        elif result['error'] is None:
+            link = f'<a href="{html.escape(Path(result["path"]).name)}">{month}</a>'
+            status = '✅ 生成済み'
         else:
-            raise ValueError("利用可能なデータが見つかりません")
-            
-    except Exception as e:
-        pass
\ No newline at end of file
+            link = month
+            status = f'⚠️ {html.escape(result["error"])}'
+        seconds = '-' if result.get('skipped') else f"{result['seconds']:.2f}秒"
+        rows.append(f"<tr><td>{link}</td><td>{status}</td><td>{seconds}</td></tr>")
+    
+    index_html = f"""<!DOCTYPE html>
+<html lang="ja">
+<head>
+    <meta charset="UTF-8">
+    <title>架電分析ダッシュボード一覧</title>
+    <style>
+        body {{ font-family: 'Helvetica Neue', Arial, sans-serif; margin: 20px; background-color: #f5f5f5; }}
+        table {{ border-collapse: collapse; background-color: white; box-shadow: 0 2px 10px rgba(0,0,0,0.1); }}
+        th, td {{ padding: 8px 16px; border-bottom: 1px solid #eee; text-align: left; }}
+    </style>
+</head>
+<body>
+    <h1>📞 架電分析ダッシュボード一覧</h1>
+    <p>生成日時: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</p>
+    <table>
+        <tr><th>対象月</th><th>状態</th><th>生成時間</th></tr>
+        {''.join(rows)}
+    </table>
+</body>
+</html>
+"""
+    index_path = Path(output_dir) / 'index.html'
+    with open(index_path, 'w', encoding='utf-8') as f:
+        f.write(index_html)
+    
+    return str(index_path)
+
+def generate_batch_dashboards(months, output_dir='output', workers=None, zip_path=None,
+                              render_options=None) -> list:
+    """
+    複数月のダッシュボードをワーカープロセスで並列生成
+    
+    データセットは呼び出し元のプロセスで一度だけ読み込んでおく。fork可能な環境では
+    ワーカーがそれを読み取り専用で共有し、それ以外ではzip_pathから各ワーカーが読み込む。
+    
+    Args:
+        months (list): 対象月のリスト
+        output_dir: 出力ディレクトリ
+        workers (int): ワーカー数（Noneの場合はCPU数と対象月数の小さい方）
+        zip_path (str): データZipのパス（spawn方式のワーカー用）
+        render_options (dict): generate_dashboard_html に渡す出力オプション
+        
+    Returns:
+        list: 月ごとの結果（month, path, seconds, error）
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    render_options = render_options or {}
+    
+    if not months:
+        return []
+    
+    # 共有アセットはワーカー起動前に一度だけ書き出す
+    if render_options.get('plotly_js') == 'shared':
+        ensure_plotly_asset(output_dir)
+    
+    workers = workers or min(os.cpu_count() or 1, len(months))
+    tasks = {month: str(output_dir / f'dashboard_{month}.html') for month in months}
+    
+    if workers <= 1:
+        return [_generate_month_report(month, path, render_options) for month, path in tasks.items()]
+    
+    # fork方式なら親プロセスのデータをコピーせずに共有できる
+    start_methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context('fork' if 'fork' in start_methods else None)
+    
+    results = []
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=context,
+        initializer=_init_batch_worker,
+        initargs=(zip_path,)
+    ) as executor:
+        futures = [
+            executor.submit(_generate_month_report, month, path, render_options)
+            for month, path in tasks.items()
+        ]
+        for future in as_completed(futures):
+            results.append(future.result())
+    
+    return sorted(results, key=lambda r: r['month'])
+
+# ビルドマニフェスト（出力ファイルごとの入力ハッシュ）
+BUILD_MANIFEST_NAME = 'build_manifest.json'
+# ダッシュボードに使われる月別JSONの種類
+DASHBOARD_PAYLOAD_TYPES = ['基本分析', '詳細分析', '月次サマリー', '定着率分析']
+# ダッシュボード生成に関わるコード
+DASHBOARD_CODE_FILES = [
+    Path(__file__),
+    Path(__file__).parent / 'data_loader.py',
+    Path(__file__).parent / 'utils' / 'data_processor.py',
+    Path(__file__).parent / 'utils' / 'downsampling.py'
+]
+
+def _sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+def _code_version_hash() -> str:
+    """ダッシュボード生成コードのハッシュ"""
+    digest = hashlib.sha256()
+    for path in DASHBOARD_CODE_FILES:
+        if path.exists():
+            digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+def _template_hash() -> str:
+    """HTMLテンプレートのハッシュ"""
+    return _sha256((TEMPLATE_DIR / DASHBOARD_TEMPLATE_NAME).read_bytes())
+
+def hash_zip_members(zip_path) -> dict:
+    """
+    データZip内のJSONファイルごとのハッシュを算出
+    
+    展開・デコードはせず、Zipメンバーのバイト列を1ファイルにつき1回だけ読んでハッシュする。
+    
+    Args:
+        zip_path (str): データZipのパス
+        
+    Returns:
+        dict: JSONファイル名（ディレクトリを除く）ごとのハッシュ
+    """
+    file_hashes = {}
+    with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+        for info in zip_ref.infolist():
+            filename = os.path.basename(info.filename)
+            if info.is_dir() or not filename.endswith('.json'):
+                continue
+            digest = hashlib.sha256()
+            with zip_ref.open(info) as member:
+                for chunk in iter(lambda: member.read(1024 * 1024), b''):
+                    digest.update(chunk)
+            file_hashes[filename] = digest.hexdigest()
+    return file_hashes
+
+def compute_common_hashes(render_options=None) -> dict:
+    """
+    全ての月のダッシュボードに共通する入力（テンプレート・コード・出力オプション）のハッシュを算出
+    
+    Args:
+        render_options (dict): 出力オプション（plotly.jsの読み込み方式など）
+        
+    Returns:
+        dict: template・code・options のハッシュ
+    """
+    return {
+        'template': _template_hash(),
+        'code': _code_version_hash(),
+        'options': _sha256(json.dumps(render_options or {}, sort_keys=True).encode('utf-8'))
+    }
+
+def compute_input_hashes(target_month: str, file_hashes: dict, common_hashes: dict) -> dict:
+    """
+    指定月のダッシュボードの入力ハッシュを算出
+    
+    Args:
+        target_month (str): 対象月（YYYY-MM形式）
+        file_hashes (dict): JSONファイル名ごとのハッシュ（hash_zip_members の結果）
+        common_hashes (dict): 全月共通の入力ハッシュ（compute_common_hashes の結果）
+        
+    Returns:
+        dict: 入力種別（JSONファイル名・template・code・options）ごとのハッシュ
+    """
+    hashes = {}
+    for payload_type in DASHBOARD_PAYLOAD_TYPES:
+        for filename, file_hash in file_hashes.items():
+            if f'{payload_type}_{target_month}.json' in filename:
+                hashes[filename] = file_hash
+    hashes.update(common_hashes)
+    return hashes
+
+def load_build_manifest(output_dir) -> dict:
+    """ビルドマニフェストを読み込み（存在しない・壊れている場合は空）"""
+    manifest_path = Path(output_dir) / BUILD_MANIFEST_NAME
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        return manifest if isinstance(manifest.get('outputs'), dict) else {'outputs': {}}
+    except (OSError, ValueError):
+        return {'outputs': {}}
+
+def save_build_manifest(manifest, output_dir):
+    """ビルドマニフェストを書き込み（途中で中断しても壊れないよう置き換えで保存）"""
+    manifest_path = Path(output_dir) / BUILD_MANIFEST_NAME
+    manifest['updated_at'] = datetime.now().isoformat(timespec='seconds')
+    tmp_path = manifest_path.with_suffix('.json.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2, sort_keys=True)
+    os.replace(tmp_path, manifest_path)
+
+def plan_incremental_build(months, output_dir, manifest, file_hashes, force=False, render_options=None) -> list:
+    """
+    入力ハッシュをマニフェストと比較し、再生成が必要な月を判定
+    
+    Args:
+        months (list): 対象月のリスト
+        output_dir: 出力ディレクトリ
+        manifest (dict): 前回のビルドマニフェスト
+        file_hashes (dict): JSONファイル名ごとのハッシュ（hash_zip_members の結果）
+        force (bool): Trueの場合は全て再生成
+        render_options (dict): 出力オプション
+        
+    Returns:
+        list: 月ごとの判定（month, output, hashes, rebuild, reason）
+    """
+    common_hashes = compute_common_hashes(render_options)
+    plan = []
+    for month in months:
+        output_path = Path(output_dir) / f'dashboard_{month}.html'
+        hashes = compute_input_hashes(month, file_hashes, common_hashes)
+        previous = manifest['outputs'].get(output_path.name)
+        
+        if force:
+            rebuild, reason = True, '強制再生成'
+        elif previous is None:
+            rebuild, reason = True, '新規（マニフェストに記録なし）'
+        elif not output_path.exists():
+            rebuild, reason = True, '出力ファイルなし'
+        elif previous.get('inputs') != hashes:
+            old_inputs = previous.get('inputs', {})
+            changed = sorted(
+                key for key in set(old_inputs) | set(hashes)
+                if old_inputs.get(key) != hashes.get(key)
+            )
+            rebuild, reason = True, f"入力変更: {', '.join(changed)}"
+        else:
+            rebuild, reason = False, '入力に変更なし'
+        
+        plan.append({
+            'month': month,
+            'output': str(output_path),
+            'hashes': hashes,
+            'rebuild': rebuild,
+            'reason': reason
+        })
+    return plan
+
+def main(argv=None):
+    """バッチ生成CLIのエントリーポイント"""
+    parser = argparse.ArgumentParser(description='架電分析ダッシュボード（HTML）を生成します')
+    parser.add_argument('--zip', required=True, help='分析JSONをまとめたZipファイルのパス')
+    parser.add_argument('--all', action='store_true', help='利用可能な全ての月を生成')
+    parser.add_argument('--start', help='開始月（YYYY-MM）')
+    parser.add_argument('--end', help='終了月（YYYY-MM）')
+    parser.add_argument('--workers', type=int, default=None, help='並列ワーカー数（1で逐次実行）')
+    parser.add_argument('--output-dir', default='output', help='出力ディレクトリ')
+    parser.add_argument('--force', action='store_true', help='入力に変更がなくても全て再生成')
+    parser.add_argument(
+        '--plotly-js', choices=PLOTLY_JS_MODES, default='cdn',
+        help='plotly.jsの読み込み方式（cdn / shared: 出力先assetsに1つだけ配置 / inline: HTMLに埋め込み）'
+    )
+    parser.add_argument('--compress-data', action='store_true', help='チャートデータをgzip圧縮して埋め込む')
+    args = parser.parse_args(argv)
+    
+    # データセットは一度だけ読み込み、ワーカーと共有する
+    loader = get_data_loader()
+    if not loader.load_from_zip(args.zip):
+        print("❌ Zipファイルの読み込みに失敗しました")
+        return 1
+    
+    available_months = loader.get_available_months()
+    if args.all or args.start or args.end:
+        months = select_months(available_months, args.start, args.end)
+    else:
+        # 期間指定がない場合は最新月のみ
+        months = available_months[:1]
+    
+    if not months:
+        print("❌ 対象期間に利用可能なデータが見つかりません")
+        return 1
+    
+    # 入力ハッシュが前回から変わった月だけを再生成
+    Path(args.output_dir).mkdir(parents=True, exist_ok=True)
+    manifest = load_build_manifest(args.output_dir)
+    render_options = {'plotly_js': args.plotly_js, 'compress_data': args.compress_data}
+    plan = plan_incremental_build(
+        months, args.output_dir, manifest, hash_zip_members(args.zip),
+        force=args.force, render_options=render_options
+    )
+    rebuild_months = [item['month'] for item in plan if item['rebuild']]
+    skipped = [item for item in plan if not item['rebuild']]
+    
+    # スキップした月のHTMLも共有アセットを参照するため、再生成の有無にかかわらず配置する
+    if args.plotly_js == 'shared':
+        ensure_plotly_asset(args.output_dir)
+    
+    print(f"📊 {len(rebuild_months)}/{len(months)}ヶ月分のダッシュボードを生成します: {', '.join(rebuild_months) or 'なし'}")
+    started = time.perf_counter()
+    results = generate_batch_dashboards(
+        rebuild_months, args.output_dir, args.workers, args.zip, render_options
+    )
+    total_seconds = time.perf_counter() - started
+    
+    plan_by_month = {item['month']: item for item in plan}
+    for result in results:
+        item = plan_by_month[result['month']]
+        output_name = Path(item['output']).name
+        if result['error'] is None:
+            print(f"✅ {result['month']}: {result['seconds']:.2f}秒 → {result['path']}（{item['reason']}）")
+            manifest['outputs'][output_name] = {
+                'month': result['month'],
+                'inputs': item['hashes'],
+                'built_at': datetime.now().isoformat(timespec='seconds')
+            }
+        else:
+            print(f"⚠️ {result['month']}: {result['seconds']:.2f}秒 生成失敗 ({result['error']})")
+            # 失敗した出力は次回必ず再生成する
+            manifest['outputs'].pop(output_name, None)
+    
+    for item in skipped:
+        print(f"⏭️ {item['month']}: スキップ（{item['reason']}）→ {item['output']}")
+    
+    save_build_manifest(manifest, args.output_dir)
+    
+    # 一覧ページはスキップした月も含めて作成
+    index_results = results + [
+        {'month': item['month'], 'path': item['output'], 'seconds': 0.0, 'error': None, 'skipped': True}
+        for item in skipped
+    ]
+    index_path = generate_index_html(index_results, args.output_dir)
+    succeeded = sum(1 for result in results if result['error'] is None)
+    print(f"📁 一覧ページ: {index_path}")
+    print(f"⏱️ 合計 {total_seconds:.2f}秒（生成 {succeeded}/{len(results)}ヶ月成功、スキップ {len(skipped)}ヶ月）")
+    
+    return 0 if succeeded == len(results) else 1
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,427 @@
+"""同時セッション負荷試験
+
+StreamlitのAppTestでstreamlit_app.pyのセッションを複数作成し、1つのプロセスで何人まで
+同時に利用できるかを確認する。各セッションはログインし、合成データ（utils.synthetic_data）の
+Zipファイルをアップロードしてから、月次サマリー分析・定着率分析・単月詳細データの全タブ
+（サブタブを含む）を順に操作する。外部サービスは使わず、全てローカルで完結する。
+
+AppTestは再実行のたびにプロセス全体で共有するRuntimeを差し替えるため、再実行は同時に1つしか
+実行できない。そこで各セッションをスレッドで動かし、再実行はロックで1つずつ処理する。
+記録する応答時間はロック待ちを含むため、1プロセスのStreamlitが同時アクセスを順番に処理する
+ときに利用者が待つ時間に相当する（処理時間はロック取得後の再実行だけの時間）。
+実行中はプロセスのRSSを一定間隔で記録する。
+
+実行例（リポジトリのルートで実行）:
+    python -m benchmarks.load_test --sessions 5 --scale 1
+    python -m benchmarks.load_test --sessions 20 --scale 10 --iterations 2 --think-time 0.5
+"""
+import argparse
+import datetime
+import io
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import threading
+import time
+from contextlib import redirect_stdout
+
+import numpy as np
+from streamlit.logger import set_log_level
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_PATH = os.path.join(os.path.dirname(BENCHMARK_DIR), 'streamlit_app.py')
+DEFAULT_RESULTS_PATH = os.path.join(BENCHMARK_DIR, 'load_results.json')
+DEFAULT_SESSIONS = 5
+DEFAULT_SCALE = 1
+DEFAULT_ITERATIONS = 1
+# 1回の再実行の上限（秒）。超えた場合はその操作を失敗として記録する
+DEFAULT_RERUN_TIMEOUT = 300
+DEFAULT_RSS_INTERVAL = 0.5
+DEFAULT_USERNAME = 'user'
+
+# 操作する分析タイプ（分析タイプ選択の表示ラベル）
+ANALYSIS_LABELS = {
+    'basic_analysis': "📊 月次サマリー分析",
+    'retention_analysis': "📈 定着率分析",
+    'monthly_detail': "📋 単月詳細データ"
+}
+# 定着率分析のビュー
+RETENTION_TABS = ['trend', 'cohort', 'simulator']
+# 単月詳細データのタブと、タブ内のサブタブ（サブタブ選択のキー, サブタブIDのリスト）
+DETAIL_TABS = {
+    'daily': None,
+    'branch': ('branch_subtab', ['actual', 'unit', 'actual_3m', 'unit_3m']),
+    'staff': ('staff_subtab', ['overall', 'branch', 'efficiency', 'trend']),
+    'product': ('product_subtab', ['performance', 'cross', 'comparison_3m', 'detail']),
+    'detail': None
+}
+
+
+def _set_analysis(label):
+    """分析タイプを選択する操作"""
+    def action(at):
+        at.selectbox[0].set_value(label)
+    return action
+
+
+def _set_radio(key, value):
+    """タブ（ラジオボタン）を選択する操作"""
+    def action(at):
+        at.radio(key=key).set_value(value)
+    return action
+
+
+def build_scenario():
+    """
+    1巡分の操作手順を作成
+
+    Returns:
+        list: (操作名, 操作関数) のリスト。操作関数はAppTestを受け取り、ウィジェットの値を設定する
+    """
+    steps = [
+        ('basic_analysis', _set_analysis(ANALYSIS_LABELS['basic_analysis'])),
+        ('retention_analysis', _set_analysis(ANALYSIS_LABELS['retention_analysis']))
+    ]
+    for tab in RETENTION_TABS:
+        steps.append((f'retention:{tab}', _set_radio('retention_tab', tab)))
+    steps.append(('monthly_detail', _set_analysis(ANALYSIS_LABELS['monthly_detail'])))
+    for tab, subtabs in DETAIL_TABS.items():
+        steps.append((f'detail:{tab}', _set_radio('detail_tab', tab)))
+        if subtabs is None:
+            continue
+        key, subtab_ids = subtabs
+        for subtab in subtab_ids:
+            steps.append((f'detail:{tab}:{subtab}', _set_radio(key, subtab)))
+    return steps
+
+
+class LoadTestRun:
+    """1回の負荷試験の実行状態（再実行の直列化・計測記録・RSSの記録）"""
+
+    def __init__(self, rerun_timeout=DEFAULT_RERUN_TIMEOUT):
+        self.rerun_timeout = rerun_timeout
+        self.started = time.perf_counter()
+        self.records = []
+        self.rss_samples = []
+        self.active_sessions = 0
+        self._rerun_lock = threading.Lock()
+        self._records_lock = threading.Lock()
+
+    def rerun(self, at, session, step):
+        """
+        1回の再実行を計測
+
+        Args:
+            at: AppTest
+            session: セッション番号
+            step: 操作名
+
+        Returns:
+            bool: 例外やタイムアウトなく完了したか
+        """
+        requested = time.perf_counter()
+        error = None
+        with self._rerun_lock:
+            started = time.perf_counter()
+            try:
+                # streamlit_authenticatorのCookie検証メッセージを出力しない
+                with redirect_stdout(io.StringIO()):
+                    at.run(timeout=self.rerun_timeout)
+                if at.exception:
+                    error = at.exception[0].value
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+            finished = time.perf_counter()
+        self.add_record(session, step, requested, finished - requested, finished - started, error)
+        return error is None
+
+    def add_record(self, session, step, requested, response_seconds, service_seconds, error=None):
+        """再実行（または実行できなかった操作）の記録を追加"""
+        with self._records_lock:
+            self.records.append({
+                'session': session,
+                'step': step,
+                'offset_seconds': round(requested - self.started, 4),
+                'response_seconds': response_seconds,
+                'service_seconds': service_seconds,
+                'error': error
+            })
+
+    def change_active_sessions(self, delta):
+        """実行中のセッション数を増減"""
+        with self._records_lock:
+            self.active_sessions += delta
+
+    def sample_rss(self, stop_event, interval):
+        """停止されるまでRSSを一定間隔で記録"""
+        from utils.memory import get_process_rss
+
+        while True:
+            with self._records_lock:
+                completed = len(self.records)
+                active = self.active_sessions
+            self.rss_samples.append({
+                'offset_seconds': round(time.perf_counter() - self.started, 3),
+                'rss_bytes': get_process_rss(),
+                'active_sessions': active,
+                'completed_reruns': completed
+            })
+            if stop_event.wait(interval):
+                break
+
+
+def run_session(run, index, archive_name, archive_bytes, username, password, iterations, think_time, seed):
+    """
+    1セッション分の操作（ログイン→アップロード→各分析・タブの操作）を実行
+
+    Args:
+        run: LoadTestRun
+        index: セッション番号
+        archive_name: アップロードするファイル名
+        archive_bytes: アップロードするファイルの内容
+        username: ログインするユーザー名
+        password: パスワード
+        iterations: 操作手順を繰り返す回数
+        think_time: 操作間の待ち時間の上限（秒、0〜上限の一様乱数）
+        seed: 待ち時間の乱数シード
+    """
+    from streamlit.testing.v1 import AppTest
+    from components.file_upload import INGESTION_POLL_SECONDS
+    from utils.ingestion import INGESTION_JOB_KEY
+
+    rng = random.Random(seed + index)
+    at = AppTest.from_file(APP_PATH, default_timeout=run.rerun_timeout)
+    run.change_active_sessions(1)
+    try:
+        if not run.rerun(at, index, 'open'):
+            return
+        at.text_input[0].set_value(username)
+        at.text_input[1].set_value(password)
+        at.button[0].click()
+        if not run.rerun(at, index, 'login'):
+            return
+        at.file_uploader[0].set_value((archive_name, archive_bytes, 'application/zip'))
+        if not run.rerun(at, index, 'upload'):
+            return
+        # 取り込みはバックグラウンドで進むため、進捗表示の更新と同じ間隔で完了まで再実行する
+        while INGESTION_JOB_KEY in at.session_state:
+            time.sleep(INGESTION_POLL_SECONDS)
+            if not run.rerun(at, index, 'ingest'):
+                return
+
+        for _ in range(iterations):
+            for step, action in build_scenario():
+                if think_time > 0:
+                    time.sleep(rng.uniform(0, think_time))
+                try:
+                    action(at)
+                except Exception as e:
+                    # 前の操作でウィジェットが表示されなかった場合など
+                    run.add_record(index, step, time.perf_counter(), None, None, f"{type(e).__name__}: {e}")
+                    continue
+                run.rerun(at, index, step)
+    finally:
+        run.change_active_sessions(-1)
+
+
+def _percentiles(values):
+    """p50/p95/最大値（秒）"""
+    if not values:
+        return {'count': 0, 'p50': None, 'p95': None, 'max': None}
+    array = np.asarray(values)
+    return {
+        'count': len(values),
+        'p50': float(np.percentile(array, 50)),
+        'p95': float(np.percentile(array, 95)),
+        'max': float(array.max())
+    }
+
+
+def summarize_latency(records):
+    """
+    操作ごと・全体の応答時間と処理時間のp50/p95を集計
+
+    Args:
+        records: LoadTestRun.records
+
+    Returns:
+        dict: overall（全体）と steps（操作名 -> 集計）
+    """
+    def summarize(items):
+        completed = [r for r in items if r['response_seconds'] is not None]
+        return {
+            'response': _percentiles([r['response_seconds'] for r in completed]),
+            'service': _percentiles([r['service_seconds'] for r in completed]),
+            'errors': sum(1 for r in items if r['error'])
+        }
+
+    steps = {}
+    for record in records:
+        steps.setdefault(record['step'], []).append(record)
+    return {
+        'overall': summarize(records),
+        'steps': {step: summarize(items) for step, items in steps.items()}
+    }
+
+
+def run_load_test(sessions=DEFAULT_SESSIONS, scale=DEFAULT_SCALE, iterations=DEFAULT_ITERATIONS,
+                  think_time=0.0, ramp_up=0.0, username=DEFAULT_USERNAME, password=None,
+                  seed=0, rss_interval=DEFAULT_RSS_INTERVAL, rerun_timeout=DEFAULT_RERUN_TIMEOUT):
+    """
+    合成データを生成し、指定数のセッションで同時に操作して計測
+
+    Args:
+        sessions: 同時セッション数
+        scale: 合成データのスタッフ数の倍率
+        iterations: 各セッションが操作手順を繰り返す回数
+        think_time: 操作間の待ち時間の上限（秒）
+        ramp_up: 全セッションの開始を分散させる時間（秒）
+        username: ログインするユーザー名
+        password: パスワード（Noneの場合は認証設定の値）
+        seed: 合成データと待ち時間の乱数シード
+        rss_interval: RSSの記録間隔（秒）
+        rerun_timeout: 1回の再実行の上限（秒）
+
+    Returns:
+        dict: メタデータ・応答時間の集計・RSSの推移・全再実行の記録
+    """
+    from utils.config import CREDENTIALS
+    from utils.memory import get_process_rss
+    from utils.synthetic_data import DEFAULT_STAFF_COUNT, generate_dataset, write_dataset_zip
+
+    if password is None:
+        password = CREDENTIALS['usernames'][username]['password']
+
+    staff_count = DEFAULT_STAFF_COUNT * scale
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        archive_path = os.path.join(tmp_dir, f'synthetic_x{scale}.zip')
+        write_dataset_zip(generate_dataset(staff_count=staff_count, seed=seed), archive_path)
+        with open(archive_path, 'rb') as f:
+            archive_bytes = f.read()
+
+    steps_per_session = 3 + iterations * len(build_scenario())
+    print(f"👥 {sessions}セッション × {steps_per_session}回の再実行（取り込み待ちを除く）"
+          f"（スタッフ {staff_count:,}名、アップロード {len(archive_bytes) / 1024 / 1024:.1f} MB）")
+
+    rss_before = get_process_rss()
+    run = LoadTestRun(rerun_timeout)
+    stop_event = threading.Event()
+    sampler = threading.Thread(target=run.sample_rss, args=(stop_event, rss_interval), daemon=True)
+    sampler.start()
+
+    threads = []
+    for index in range(sessions):
+        thread = threading.Thread(
+            target=run_session,
+            args=(run, index, os.path.basename(archive_path), archive_bytes, username, password,
+                  iterations, think_time, seed),
+            name=f'load-session-{index}'
+        )
+        threads.append(thread)
+        thread.start()
+        if ramp_up > 0 and sessions > 1:
+            time.sleep(ramp_up / (sessions - 1))
+    for thread in threads:
+        thread.join()
+    stop_event.set()
+    sampler.join()
+    elapsed = time.perf_counter() - run.started
+
+    rss_values = [s['rss_bytes'] for s in run.rss_samples if s['rss_bytes'] is not None]
+    return {
+        'metadata': {
+            'created_at': datetime.datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'sessions': sessions,
+            'scale': scale,
+            'staff_count': staff_count,
+            'iterations': iterations,
+            'think_time': think_time,
+            'ramp_up': ramp_up,
+            'seed': seed,
+            'elapsed_seconds': elapsed,
+            'throughput_reruns_per_second': len(run.records) / elapsed if elapsed > 0 else None
+        },
+        'latency': summarize_latency(run.records),
+        'rss': {
+            'before_bytes': rss_before,
+            'peak_bytes': max(rss_values) if rss_values else None,
+            'final_bytes': rss_values[-1] if rss_values else None,
+            'samples': run.rss_samples
+        },
+        'records': run.records
+    }
+
+
+def _format_ms(seconds):
+    return '-' if seconds is None else f"{seconds * 1000:,.0f}"
+
+
+def _format_mb(size):
+    return '-' if size is None else f"{size / 1024 / 1024:,.1f}"
+
+
+def print_report(result):
+    """計測結果を表形式で出力"""
+    latency = result['latency']
+    print(f"{'操作':<34} {'回数':>5} {'応答p50':>9} {'応答p95':>9} {'処理p50':>9} {'処理p95':>9} {'失敗':>5}  (ms)")
+    for step, summary in list(latency['steps'].items()) + [('(全体)', latency['overall'])]:
+        response, service = summary['response'], summary['service']
+        print(f"{step:<36} {response['count']:>5} {_format_ms(response['p50']):>9} "
+              f"{_format_ms(response['p95']):>9} {_format_ms(service['p50']):>9} "
+              f"{_format_ms(service['p95']):>9} {summary['errors']:>5}")
+
+    rss = result['rss']
+    print(f"🧠 RSS: 開始前 {_format_mb(rss['before_bytes'])} MB → ピーク {_format_mb(rss['peak_bytes'])} MB"
+          f" → 終了時 {_format_mb(rss['final_bytes'])} MB")
+    samples = rss['samples']
+    # 推移は最大10点程度に間引いて表示
+    for sample in samples[::max(1, len(samples) // 10)]:
+        print(f"  {sample['offset_seconds']:>8.1f}s  {_format_mb(sample['rss_bytes']):>9} MB"
+              f"  セッション {sample['active_sessions']:>3}  再実行 {sample['completed_reruns']:>5}")
+    metadata = result['metadata']
+    print(f"⏱️ 所要時間 {metadata['elapsed_seconds']:.1f}秒、"
+          f"スループット {metadata['throughput_reruns_per_second']:.2f} 再実行/秒")
+
+
+def main(argv=None):
+    """コマンドライン実行"""
+    parser = argparse.ArgumentParser(description='同時セッションの負荷試験を実行します')
+    parser.add_argument('--sessions', type=int, default=DEFAULT_SESSIONS, help='同時セッション数')
+    parser.add_argument('--scale', type=int, default=DEFAULT_SCALE, help='合成データのスタッフ数の倍率')
+    parser.add_argument('--iterations', type=int, default=DEFAULT_ITERATIONS, help='操作手順の繰り返し回数')
+    parser.add_argument('--think-time', type=float, default=0.0, help='操作間の待ち時間の上限（秒）')
+    parser.add_argument('--ramp-up', type=float, default=0.0, help='全セッションの開始を分散させる時間（秒）')
+    parser.add_argument('--username', default=DEFAULT_USERNAME, help='ログインするユーザー名')
+    parser.add_argument('--password', help='パスワード（省略時は認証設定の値）')
+    parser.add_argument('--seed', type=int, default=0, help='合成データと待ち時間の乱数シード')
+    parser.add_argument('--rss-interval', type=float, default=DEFAULT_RSS_INTERVAL, help='RSSの記録間隔（秒）')
+    parser.add_argument('--timeout', type=float, default=DEFAULT_RERUN_TIMEOUT, help='1回の再実行の上限（秒）')
+    parser.add_argument('-o', '--output', default=DEFAULT_RESULTS_PATH, help='計測結果の保存先（JSON）')
+    args = parser.parse_args(argv)
+
+    # Streamlit外での実行時の警告を抑制
+    set_log_level('error')
+
+    from utils.config import CREDENTIALS
+    if args.password is None and args.username not in CREDENTIALS['usernames']:
+        print(f"❌ 認証設定にユーザーがありません: {args.username}")
+        return 1
+
+    result = run_load_test(
+        args.sessions, args.scale, args.iterations, args.think_time, args.ramp_up,
+        args.username, args.password, args.seed, args.rss_interval, args.timeout
+    )
+    print_report(result)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    print(f"💾 計測結果を保存しました → {args.output}")
+    return 1 if result['latency']['overall']['errors'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,360 @@
+"""処理段階別ベンチマーク
+
+合成データ（utils.synthetic_data）を規模を変えて生成し、読み込み・展開・集計・描画の
+各段階を個別に計測する。段階ごとに実行時間（複数回の中央値）とピークメモリ（tracemalloc）を
+記録して結果をJSONに保存し、保存済みのベースラインと比較して性能劣化を検出する。
+
+実行例（リポジトリのルートで実行）:
+    python -m benchmarks.run_benchmarks --scales 1 10 --save-baseline
+    python -m benchmarks.run_benchmarks --scales 1 10 --threshold 0.2
+"""
+import argparse
+import datetime
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+
+import pandas as pd
+from streamlit.logger import set_log_level
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_RESULTS_PATH = os.path.join(BENCHMARK_DIR, 'results.json')
+DEFAULT_BASELINE_PATH = os.path.join(BENCHMARK_DIR, 'baseline.json')
+DEFAULT_SCALES = [1, 10]
+DEFAULT_REPEAT = 3
+# ベースラインからの増加率がこれを超えたら劣化とみなす
+DEFAULT_THRESHOLD = 0.2
+# 計測誤差とみなす差（秒）。これ以下の増加は劣化として扱わない
+NOISE_FLOOR_SECONDS = 0.005
+# ピークメモリの増加がこれ以下の場合も劣化として扱わない
+NOISE_FLOOR_BYTES = 1024 * 1024
+# 複数月を扱う段階で使う月数
+COMPARE_MONTH_COUNT = 3
+
+
+def _prepare_context(scale, seed, stages):
+    """
+    指定規模の合成データを生成し、各段階の入力を準備
+
+    Args:
+        scale: スタッフ数の倍率
+        seed: 乱数シード
+        stages: 計測する段階名のリスト
+
+    Returns:
+        dict: 各段階で使う入力データ
+    """
+    from utils.data_processor import (
+        extract_zip_data, get_available_months_from_data,
+        load_analysis_data_from_json, extract_daily_activity_from_staff, load_multi_month_data
+    )
+    from utils.retention_engine import build_retention_activity_table, compute_staff_features
+    from utils.synthetic_data import DEFAULT_STAFF_COUNT, generate_dataset, write_dataset_zip
+
+    staff_count = DEFAULT_STAFF_COUNT * scale
+    zip_buffer = io.BytesIO()
+    write_dataset_zip(generate_dataset(staff_count=staff_count, seed=seed), zip_buffer)
+    zip_bytes = zip_buffer.getvalue()
+
+    json_data = extract_zip_data(io.BytesIO(zip_bytes))
+    months = get_available_months_from_data(json_data)
+    month = months[0]
+    compare_months = sorted(months[:COMPARE_MONTH_COUNT])
+    basic_data, detail_data, summary_data = load_analysis_data_from_json(json_data, month)
+    staff_dict = basic_data['monthly_analysis'][month]['staff']
+
+    # HTMLダッシュボード生成はデータローダー経由で読み込む
+    if 'generate_dashboard_html' in stages:
+        from data_loader import get_data_loader
+        with redirect_stdout(io.StringIO()):
+            get_data_loader().load_from_zip(io.BytesIO(zip_bytes))
+
+    retention_activity = build_retention_activity_table(json_data)
+
+    return {
+        'scale': scale,
+        'staff_count': staff_count,
+        'zip_bytes': zip_bytes,
+        'json_data': json_data,
+        'month': month,
+        'compare_months': compare_months,
+        'basic_data': basic_data,
+        'summary_data': summary_data,
+        'staff_dict': staff_dict,
+        'df_basic': extract_daily_activity_from_staff(staff_dict),
+        'monthly_data': load_multi_month_data(json_data, compare_months),
+        'retention_activity': retention_activity,
+        'retention_features': compute_staff_features(retention_activity)[0]
+    }
+
+
+def _bench_extract_zip_data(ctx):
+    from utils.data_processor import extract_zip_data
+    return extract_zip_data(io.BytesIO(ctx['zip_bytes']))
+
+
+def _bench_get_available_months(ctx):
+    from utils.data_processor import get_available_months_from_data
+    return get_available_months_from_data(ctx['json_data'])
+
+
+def _bench_extract_daily_activity(ctx):
+    from utils.data_processor import extract_daily_activity_from_staff
+    return extract_daily_activity_from_staff(ctx['staff_dict'])
+
+
+def _bench_load_multi_month_data(ctx):
+    from utils.data_processor import load_multi_month_data
+    return load_multi_month_data(ctx['json_data'], ctx['compare_months'])
+
+
+def _bench_branch_month_summary(ctx):
+    from pages.monthly_detail.main import build_branch_month_summary
+    from utils.derived_cache import get_derived_cache
+    # 派生データキャッシュを空にして毎回計算させる
+    get_derived_cache(ctx['json_data']).clear()
+    return build_branch_month_summary(ctx['json_data'], ctx['month'])
+
+
+def _bench_staff_summary(ctx):
+    from pages.monthly_detail.main import build_staff_summary
+    return build_staff_summary(ctx['df_basic'], ctx['basic_data'], ctx['summary_data'], ctx['month'])
+
+
+def _bench_trend_chart(ctx):
+    from components.charts import create_trend_chart
+    from utils.config import BRANCH_COLORS
+    return create_trend_chart(ctx['monthly_data'], 'total_calls', '架電数', branch_colors=BRANCH_COLORS)
+
+
+def _bench_monthly_histogram(ctx):
+    from components.charts import create_monthly_histogram
+    return create_monthly_histogram(ctx['monthly_data'], 'total_calls', '架電数')
+
+
+def _bench_generate_dashboard_html(ctx):
+    from analysis_dashboard import generate_dashboard_html
+    with tempfile.TemporaryDirectory() as temp_dir:
+        return generate_dashboard_html(ctx['month'], os.path.join(temp_dir, 'dashboard.html'))
+
+
+def _bench_retention_features(ctx):
+    from utils.retention_engine import compute_staff_features
+    return compute_staff_features(ctx['retention_activity'])
+
+
+def _bench_score_risk(ctx):
+    from utils.retention_engine import compute_risk_flags, score_risk
+    return score_risk(compute_risk_flags(ctx['retention_features']))
+
+
+# 段階名 -> 計測関数（この順に実行）
+STAGES = {
+    'extract_zip_data': _bench_extract_zip_data,
+    'get_available_months_from_data': _bench_get_available_months,
+    'extract_daily_activity_from_staff': _bench_extract_daily_activity,
+    'load_multi_month_data': _bench_load_multi_month_data,
+    'build_branch_month_summary': _bench_branch_month_summary,
+    'build_staff_summary': _bench_staff_summary,
+    'compute_staff_features': _bench_retention_features,
+    'score_risk': _bench_score_risk,
+    'create_trend_chart': _bench_trend_chart,
+    'create_monthly_histogram': _bench_monthly_histogram,
+    'generate_dashboard_html': _bench_generate_dashboard_html
+}
+
+
+def measure_stage(func, ctx, repeat):
+    """
+    1段階の実行時間とピークメモリを計測
+
+    初回のインポート等を除くため1回空実行した後、実行時間はtracemallocを無効にした
+    状態でrepeat回計測し、ピークメモリは別に1回だけtracemalloc下で実行して取得する。
+
+    Args:
+        func: 計測関数
+        ctx: 入力データ
+        repeat: 実行時間の計測回数
+
+    Returns:
+        dict: 計測結果
+    """
+    func(ctx)
+    durations = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(ctx)
+        durations.append(time.perf_counter() - started)
+
+    tracemalloc.start()
+    try:
+        func(ctx)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'seconds': statistics.median(durations),
+        'min_seconds': min(durations),
+        'peak_memory_bytes': peak,
+        'runs': durations
+    }
+
+
+def run_benchmarks(scales=None, repeat=DEFAULT_REPEAT, stages=None, seed=0):
+    """
+    規模ごとに全段階を計測
+
+    Args:
+        scales: スタッフ数の倍率のリスト
+        repeat: 各段階の計測回数
+        stages: 計測する段階名のリスト（Noneの場合は全段階）
+        seed: 合成データの乱数シード
+
+    Returns:
+        dict: メタデータと計測結果のリスト
+    """
+    scales = scales or DEFAULT_SCALES
+    stage_names = stages or list(STAGES)
+    unknown = [name for name in stage_names if name not in STAGES]
+    if unknown:
+        raise ValueError(f"未知の段階です: {', '.join(unknown)}")
+
+    results = []
+    for scale in scales:
+        ctx = _prepare_context(scale, seed, stage_names)
+        print(f"📊 規模 x{scale}（スタッフ {ctx['staff_count']:,}名、"
+              f"日次活動 {len(ctx['df_basic']):,}行/月）")
+        for name in stage_names:
+            result = measure_stage(STAGES[name], ctx, repeat)
+            result.update({'stage': name, 'scale': scale, 'staff_count': ctx['staff_count']})
+            results.append(result)
+            print(f"  {name:<36} {result['seconds'] * 1000:>10.1f} ms"
+                  f"  peak {result['peak_memory_bytes'] / 1024 / 1024:>8.1f} MB")
+
+    return {
+        'metadata': {
+            'created_at': datetime.datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'platform': platform.platform(),
+            'scales': scales,
+            'repeat': repeat,
+            'seed': seed
+        },
+        'results': results
+    }
+
+
+def compare_with_baseline(current, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    計測結果をベースラインと比較
+
+    Args:
+        current: run_benchmarks の結果
+        baseline: 保存済みのベースライン（同じ形式）
+        threshold: 劣化とみなす実行時間・ピークメモリの増加率
+
+    Returns:
+        list: 比較結果（段階・規模ごと）。regressed が True のものが劣化
+    """
+    baseline_results = {(r['stage'], r['scale']): r for r in baseline.get('results', [])}
+    comparisons = []
+    for result in current['results']:
+        base = baseline_results.get((result['stage'], result['scale']))
+        if base is None:
+            continue
+        time_ratio = result['seconds'] / base['seconds'] if base['seconds'] > 0 else None
+        memory_ratio = (result['peak_memory_bytes'] / base['peak_memory_bytes']
+                        if base['peak_memory_bytes'] > 0 else None)
+        time_regressed = (
+            time_ratio is not None and time_ratio > 1 + threshold
+            and result['seconds'] - base['seconds'] > NOISE_FLOOR_SECONDS
+        )
+        memory_regressed = (
+            memory_ratio is not None and memory_ratio > 1 + threshold
+            and result['peak_memory_bytes'] - base['peak_memory_bytes'] > NOISE_FLOOR_BYTES
+        )
+        comparisons.append({
+            'stage': result['stage'],
+            'scale': result['scale'],
+            'seconds': result['seconds'],
+            'baseline_seconds': base['seconds'],
+            'time_ratio': time_ratio,
+            'peak_memory_bytes': result['peak_memory_bytes'],
+            'baseline_peak_memory_bytes': base['peak_memory_bytes'],
+            'memory_ratio': memory_ratio,
+            'regressed': time_regressed or memory_regressed
+        })
+    return comparisons
+
+
+def _format_ratio(ratio):
+    return '-' if ratio is None else f"{ratio:.2f}x"
+
+
+def _save_json(data, path):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+
+
+def main(argv=None):
+    """コマンドライン実行"""
+    parser = argparse.ArgumentParser(description='処理段階別のベンチマークを実行します')
+    parser.add_argument('--scales', type=int, nargs='+', default=DEFAULT_SCALES,
+                        help='合成データのスタッフ数の倍率（例: 1 10 100）')
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help='各段階の計測回数')
+    parser.add_argument('--stages', nargs='+', choices=list(STAGES), help='計測する段階（省略時は全段階）')
+    parser.add_argument('--seed', type=int, default=0, help='合成データの乱数シード')
+    parser.add_argument('-o', '--output', default=DEFAULT_RESULTS_PATH, help='計測結果の保存先（JSON）')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE_PATH, help='比較するベースライン（JSON）')
+    parser.add_argument('--save-baseline', action='store_true', help='今回の計測結果をベースラインとして保存')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='劣化とみなす増加率（0.2で20%%増）')
+    args = parser.parse_args(argv)
+
+    # Streamlit外での実行時の警告を抑制
+    set_log_level('error')
+
+    try:
+        current = run_benchmarks(args.scales, args.repeat, args.stages, args.seed)
+    except ValueError as e:
+        print(f"❌ ベンチマークに失敗しました: {e}")
+        return 1
+    _save_json(current, args.output)
+    print(f"💾 計測結果を保存しました → {args.output}")
+
+    if args.save_baseline:
+        _save_json(current, args.baseline)
+        print(f"💾 ベースラインを保存しました → {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"ℹ️ ベースラインがありません（--save-baseline で作成できます）: {args.baseline}")
+        return 0
+
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)
+    comparisons = compare_with_baseline(current, baseline, args.threshold)
+    regressions = [c for c in comparisons if c['regressed']]
+    print(f"📈 ベースライン比較（閾値 +{args.threshold:.0%}）")
+    for c in comparisons:
+        mark = '❌' if c['regressed'] else '✅'
+        print(f"  {mark} x{c['scale']:<4} {c['stage']:<36} 時間 {_format_ratio(c['time_ratio']):>7}"
+              f"  メモリ {_format_ratio(c['memory_ratio']):>7}")
+    if regressions:
+        print(f"❌ {len(regressions)}件の性能劣化を検出しました")
+        return 1
+    print("✅ 性能劣化はありません")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,26 +1,25 @@
 """グラフ作成ロジック"""
 import plotly.express as px
 import plotly.graph_objects as go
+from plotly.subplots import make_subplots
 import pandas as pd
 import numpy as np
 import streamlit as st
+from utils.perf import timed
 
-def create_trend_chart(monthly_data, metric_column, metric_name, staff_filter=None, branch_colors=None):
+def _build_trend_traces(monthly_data, metric_column, metric_name, staff_filter=None):
     """
-    月別推移チャートを作成（人ごとの色分け、月次表示対応）
+    スタッフごとの月別推移トレースを作成
     
     Args:
         monthly_data: 月別データ辞書
         metric_column: 指標列名
         metric_name: 指標表示名
         staff_filter: スタッフフィルター（Noneの場合は全スタッフ）
-        branch_colors: 支部色設定（人ごと色分けのため現在未使用）
         
     Returns:
-        plotly figure
+        list: go.Scatter のリスト
     """
-    fig = go.Figure()
-    
     # 全スタッフのデータを統合
     all_staff_data = {}
     months = sorted(monthly_data.keys())
@@ -28,25 +27,19 @@ def create_trend_chart(monthly_data, metric_column, metric_name, staff_filter=No
     for month, df in monthly_data.items():
         if staff_filter:
             df = df[df['staff_name'].isin(staff_filter)]
+        if metric_column not in df.columns:
+            continue
         
-        for _, row in df.iterrows():
-            staff_name = row['staff_name']
-            branch = row['branch']
-            value = row[metric_column]
-            
+        for staff_name, branch, value in zip(df['staff_name'], df['branch'], df[metric_column]):
             if staff_name not in all_staff_data:
                 all_staff_data[staff_name] = {
-                    'months': [],
-                    'values': [],
+                    'values': {},
                     'branch': branch
                 }
-            
-            all_staff_data[staff_name]['months'].append(month)
-            all_staff_data[staff_name]['values'].append(value)
+            all_staff_data[staff_name]['values'][month] = value
     
     # 人数に応じた色パレットを生成
-    staff_names = list(all_staff_data.keys())
-    num_staff = len(staff_names)
+    num_staff = len(all_staff_data)
     
     if num_staff <= 10:
         # 10人以下の場合はplotlyの標準カラーを使用
@@ -55,25 +48,17 @@ def create_trend_chart(monthly_data, metric_column, metric_name, staff_filter=No
         # 10人以上の場合はより多くの色を生成
         colors = px.colors.qualitative.Set3 + px.colors.qualitative.Pastel + px.colors.qualitative.Set1
     
-    # 各スタッフの推移線を追加（人ごとに異なる色）
+    # 各スタッフの推移線を作成（人ごとに異なる色）
+    traces = []
     for i, (staff_name, data) in enumerate(all_staff_data.items()):
         branch = data['branch']
         color = colors[i % len(colors)]  # 色をローテーション
         
-        # データが3ヶ月分揃っていない場合の補完
-        complete_months = []
-        complete_values = []
-        for month in months:
-            if month in data['months']:
-                idx = data['months'].index(month)
-                complete_months.append(month)
-                complete_values.append(data['values'][idx])
-            else:
-                complete_months.append(month)
-                complete_values.append(None)  # 欠損値
+        # データが3ヶ月分揃っていない場合は欠損値で補完
+        complete_values = [data['values'].get(month) for month in months]
         
-        fig.add_trace(go.Scatter(
-            x=complete_months,
+        traces.append(go.Scatter(
+            x=months,
             y=complete_values,
             mode='lines+markers',
             name=f"{staff_name} ({branch})",
@@ -86,6 +71,30 @@ def create_trend_chart(monthly_data, metric_column, metric_name, staff_filter=No
                          '<extra></extra>'
         ))
     
+    return traces
+
+
+@timed(category='chart')
+def create_trend_chart(monthly_data, metric_column, metric_name, staff_filter=None, branch_colors=None):
+    """
+    月別推移チャートを作成（人ごとの色分け、月次表示対応）
+    
+    Args:
+        monthly_data: 月別データ辞書
+        metric_column: 指標列名
+        metric_name: 指標表示名
+        staff_filter: スタッフフィルター（Noneの場合は全スタッフ）
+        branch_colors: 支部色設定（人ごと色分けのため現在未使用）
+        
+    Returns:
+        plotly figure
+    """
+    fig = go.Figure()
+    months = sorted(monthly_data.keys())
+    
+    for trace in _build_trend_traces(monthly_data, metric_column, metric_name, staff_filter):
+        fig.add_trace(trace)
+    
     # 月次表示のためのx軸フォーマット設定
     fig.update_layout(
         title=f"📈 {metric_name} - 3ヶ月推移",
@@ -112,23 +121,18 @@ def create_trend_chart(monthly_data, metric_column, metric_name, staff_filter=No
     
     return fig
 
-def create_monthly_histogram(monthly_data, metric_column, metric_name, staff_filter=None):
+def _build_histogram_traces(monthly_data, metric_column, staff_filter=None):
     """
-    月別ヒストグラムを作成（月ごとに色分けし、最適なbinサイズで統一）
+    月ごとに色分けしたヒストグラムトレースを作成（最適なbinサイズで統一）
     
     Args:
         monthly_data: 月別データ辞書
         metric_column: 指標列名
-        metric_name: 指標表示名
         staff_filter: スタッフフィルター
         
     Returns:
-        plotly figure
+        list: go.Histogram のリスト（データがない場合は空リスト）
     """
-    import numpy as np
-    
-    fig = go.Figure()
-    
     months = sorted(monthly_data.keys())
     # 月ごとに区別しやすい色（Plotlyのカテゴリカルカラーパレット）
     colors = ['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd', '#8c564b']
@@ -142,6 +146,8 @@ def create_monthly_histogram(monthly_data, metric_column, metric_name, staff_fil
             df = monthly_data[month]
             if staff_filter:
                 df = df[df['staff_name'].isin(staff_filter)]
+            if metric_column not in df.columns:
+                continue
             
             values = df[metric_column].dropna().tolist()
             if values:
@@ -149,7 +155,7 @@ def create_monthly_histogram(monthly_data, metric_column, metric_name, staff_fil
                 all_values.extend(values)
     
     if not all_values:
-        return go.Figure()
+        return []
     
     # 最適なbinサイズを計算（Sturgesの法則とFreedman-Diaconisの法則の中間値）
     n_data = len(all_values)
@@ -168,16 +174,16 @@ def create_monthly_histogram(monthly_data, metric_column, metric_name, staff_fil
     else:
         optimal_bins = sturges_bins
     
-    # 共通のbinエッジを計算
+    # 共通のbin範囲
     data_min, data_max = min(all_values), max(all_values)
-    bin_edges = np.linspace(data_min, data_max, optimal_bins + 1)
     
     # 各月のヒストグラムを作成
+    traces = []
     for i, month in enumerate(months):
         if month in monthly_values:
             values = monthly_values[month]
             
-            fig.add_trace(go.Histogram(
+            traces.append(go.Histogram(
                 x=values,
                 name=f"{month} (n={len(values)})",
                 opacity=0.7,
@@ -191,6 +197,31 @@ def create_monthly_histogram(monthly_data, metric_column, metric_name, staff_fil
                 legendgroup=month
             ))
     
+    return traces
+
+
+@timed(category='chart')
+def create_monthly_histogram(monthly_data, metric_column, metric_name, staff_filter=None):
+    """
+    月別ヒストグラムを作成（月ごとに色分けし、最適なbinサイズで統一）
+    
+    Args:
+        monthly_data: 月別データ辞書
+        metric_column: 指標列名
+        metric_name: 指標表示名
+        staff_filter: スタッフフィルター
+        
+    Returns:
+        plotly figure
+    """
+    traces = _build_histogram_traces(monthly_data, metric_column, staff_filter)
+    if not traces:
+        return go.Figure()
+    
+    fig = go.Figure()
+    for trace in traces:
+        fig.add_trace(trace)
+    
     fig.update_layout(
         title=dict(
             text=f"📊 {metric_name} - 月別分布比較",
@@ -214,6 +245,132 @@ def create_monthly_histogram(monthly_data, metric_column, metric_name, staff_fil
     
     return fig
 
+@timed(category='chart')
+def create_multi_metric_trend_chart(monthly_data, metrics, staff_filter=None, default_metric=None):
+    """
+    全指標の推移チャートと月別分布を1つのFigureに埋め込み、ブラウザ側で切り替えられるようにする
+    
+    指標ごとのトレースを可視/不可視で切り替えるドロップダウン（updatemenus）を付けるため、
+    指標の切り替えにサーバーの再実行は発生しない。
+    
+    Args:
+        monthly_data: 月別データ辞書
+        metrics: (指標列名, 指標表示名) のリスト
+        staff_filter: スタッフフィルター（Noneの場合は全スタッフ）
+        default_metric: 初期表示する指標列名（Noneの場合は先頭の指標）
+        
+    Returns:
+        plotly figure
+    """
+    months = sorted(monthly_data.keys())
+    available = [
+        (column, name) for column, name in metrics
+        if any(column in df.columns for df in monthly_data.values())
+    ]
+    
+    fig = make_subplots(
+        rows=2, cols=1,
+        row_heights=[0.58, 0.42],
+        vertical_spacing=0.12,
+        subplot_titles=("📈 3ヶ月推移", "📊 月別分布比較")
+    )
+    if not available:
+        return fig
+    
+    if default_metric not in [column for column, _ in available]:
+        default_metric = available[0][0]
+    
+    # 指標ごとにトレースを追加し、各指標のトレース範囲を記録
+    trace_ranges = []
+    for column, name in available:
+        start = len(fig.data)
+        visible = column == default_metric
+        for trace in _build_trend_traces(monthly_data, column, name, staff_filter):
+            trace.visible = visible
+            fig.add_trace(trace, row=1, col=1)
+        for trace in _build_histogram_traces(monthly_data, column, staff_filter):
+            trace.visible = visible
+            fig.add_trace(trace, row=2, col=1)
+        trace_ranges.append((column, name, start, len(fig.data)))
+    
+    # 指標切り替えボタン（選択指標のトレースのみ表示）
+    total_traces = len(fig.data)
+    buttons = []
+    active_index = 0
+    for i, (column, name, start, end) in enumerate(trace_ranges):
+        if column == default_metric:
+            active_index = i
+        buttons.append(dict(
+            label=name,
+            name=column,
+            method='update',
+            args=[
+                {'visible': [start <= k < end for k in range(total_traces)]},
+                {'yaxis.title.text': name, 'xaxis2.title.text': name}
+            ]
+        ))
+    
+    default_name = trace_ranges[active_index][1]
+    fig.update_xaxes(
+        title_text="月", type='category', categoryorder='array',
+        categoryarray=months, tickangle=45, row=1, col=1
+    )
+    fig.update_yaxes(title_text=default_name, row=1, col=1)
+    fig.update_xaxes(title_text=default_name, row=2, col=1)
+    fig.update_yaxes(title_text="頻度", row=2, col=1)
+    fig.update_layout(
+        updatemenus=[dict(
+            type='dropdown',
+            buttons=buttons,
+            active=active_index,
+            showactive=True,
+            x=0,
+            xanchor='left',
+            y=1.1,
+            yanchor='top'
+        )],
+        barmode='overlay',
+        hovermode='closest',
+        showlegend=True,
+        height=1000,
+        legend=dict(
+            orientation="v",
+            yanchor="top",
+            y=1,
+            xanchor="left",
+            x=1.02
+        ),
+        margin=dict(r=150, t=120)
+    )
+    
+    return fig
+
+def select_multi_metric(fig, metric):
+    """
+    create_multi_metric_trend_chart のFigureで表示する指標を切り替える
+    
+    作成済みのFigureを指標ごとに作り直さないよう、ドロップダウンの該当ボタンと同じ更新
+    （トレースの可視/不可視と軸タイトル）をFigureに適用し、選択中のボタンも合わせる。
+    
+    Args:
+        fig: create_multi_metric_trend_chart で作成したFigure
+        metric: 表示する指標列名（Figureにない場合は変更しない）
+        
+    Returns:
+        plotly figure: 引数のFigure
+    """
+    if not fig.layout.updatemenus:
+        return fig
+    menu = fig.layout.updatemenus[0]
+    for i, button in enumerate(menu.buttons):
+        if button.name == metric:
+            if menu.active != i:
+                restyle, relayout = button.args
+                fig.plotly_update(restyle_data=restyle, relayout_data=relayout)
+                menu.active = i
+            break
+    return fig
+
 def create_funnel_chart(values, labels, title="営業フロー ファネルチャート"):
     """
     ファネルチャートを作成
@@ -341,4 +498,83 @@ def create_heatmap(data, x_labels, y_labels, title="ヒートマップ", colorsc
         yaxis_title="支部"
     )
     
-    return fig 
\ No newline at end of file
+    return fig 
+
+
+@timed(category='chart')
+def create_small_multiples_chart(data, panels, x_order, color_map=None, cols=3, panel_height=260,
+                                 hover_formats=None):
+    """
+    複数指標を1つのFigureのサブプロットとして並べたスモールマルチプルを作成
+    
+    指標ごとに個別のFigureを作るより、レイアウト・シリアライズ・描画が1回で済む。
+    X軸は全サブプロットで共有し、系列（支部）の色と凡例も共通化する。
+    
+    Args:
+        data: ロング形式のDataFrame（month, branch, indicator, value 列）
+        panels: (指標ID, 表示ラベル) のリスト（表示順）
+        x_order: X軸（月）の表示順
+        color_map: 系列名→色の辞書
+        cols: 1行あたりのサブプロット数
+        panel_height: サブプロット1行あたりの高さ(px)
+        hover_formats: 指標ID→Y値の表示形式（例: '¥%{y:,}'）の辞書
+        
+    Returns:
+        plotly figure
+    """
+    color_map = color_map or {}
+    hover_formats = hover_formats or {}
+    rows = max((len(panels) + cols - 1) // cols, 1)
+    
+    fig = make_subplots(
+        rows=rows,
+        cols=cols,
+        subplot_titles=[label for _, label in panels],
+        shared_xaxes=True,
+        vertical_spacing=min(0.08, 0.5 / rows),
+        horizontal_spacing=0.06
+    )
+    
+    month_order = {month: i for i, month in enumerate(x_order)}
+    shown_in_legend = set()
+    
+    for k, (panel_id, label) in enumerate(panels):
+        row, col = k // cols + 1, k % cols + 1
+        panel_df = data[data['indicator'] == panel_id]
+        y_format = hover_formats.get(panel_id, '%{y:,}')
+        
+        for branch, branch_df in panel_df.groupby('branch', sort=True):
+            branch_df = branch_df.sort_values('month', key=lambda s: s.map(month_order))
+            color = color_map.get(branch, '#95a5a6')
+            fig.add_trace(
+                go.Scatter(
+                    x=branch_df['month'],
+                    y=branch_df['value'],
+                    mode='lines+markers',
+                    name=branch,
+                    legendgroup=branch,
+                    showlegend=branch not in shown_in_legend,
+                    line=dict(color=color),
+                    marker=dict(color=color),
+                    hovertemplate=f'支部: %{{fullData.name}}<br>月: %{{x}}<br>{label}: {y_format}<extra></extra>'
+                ),
+                row=row, col=col
+            )
+            shown_in_legend.add(branch)
+    
+    fig.update_xaxes(type='category', categoryorder='array', categoryarray=list(x_order))
+    fig.update_yaxes(tickformat=',', separatethousands=True)
+    fig.update_layout(
+        height=panel_height * rows + 80,
+        legend=dict(
+            orientation='h',
+            yanchor='bottom',
+            y=1.02,
+            xanchor='center',
+            x=0.5,
+            font=dict(family='"Meiryo", "Yu Gothic", "Noto Sans JP", "sans-serif"', size=12)
+        ),
+        margin=dict(t=80)
+    )
+    
+    return fig
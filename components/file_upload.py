@@ -1,30 +1,113 @@
 """ファイルアップロード処理"""
 import streamlit as st
-from utils.data_processor import extract_zip_data, get_available_months_from_data
+from utils.data_processor import get_available_months_from_data
+from utils.dataset_bundle import BUNDLE_EXTENSION
+from utils.ingestion import INGESTION_JOB_KEY, INGESTION_SUMMARY_KEY, start_ingestion
+from utils.memory import REJECTED_UPLOAD_KEY
+
+# 取り込み中に進捗を更新する間隔（秒）
+INGESTION_POLL_SECONDS = 0.5
 
 def render_upload_section():
     """ファイルアップロードセクションを表示"""
     st.subheader("📁 データアップロード")
     uploaded_file = st.file_uploader(
-        "JSONファイルを含むZipファイルをアップロード",
-        type=['zip'],
-        help="複数のJSONファイルをZip形式でアップロードしてください"
+        "JSONファイルを含むZipファイルまたはバンドルファイルをアップロード",
+        type=['zip', BUNDLE_EXTENSION.lstrip('.')],
+        help=f"複数のJSONファイルをZip形式、または変換済みの{BUNDLE_EXTENSION}形式でアップロードしてください"
     )
     
-    # アップロードされたデータをセッションに保存
+    job = st.session_state.get(INGESTION_JOB_KEY)
+    # ファイルが外された・差し替えられた場合は取り込み中の処理を中止
+    if job is not None and (uploaded_file is None or job.file_name != uploaded_file.name):
+        job.cancel()
+        del st.session_state[INGESTION_JOB_KEY]
+        job = None
+    
+    # アップロードされたデータをバックグラウンドで取り込む
     if uploaded_file is not None:
-        if 'json_data' not in st.session_state or st.session_state.get('uploaded_file_name') != uploaded_file.name:
-            with st.spinner("Zipファイルを処理中..."):
-                json_data = extract_zip_data(uploaded_file)
-                st.session_state['json_data'] = json_data
-                st.session_state['uploaded_file_name'] = uploaded_file.name
-                st.session_state['available_months'] = get_available_months_from_data(json_data)
-            
-            if json_data:
-                st.success(f"✅ {len(json_data)}個のJSONファイルを読み込みました")
-                st.write(f"利用可能な月: {', '.join(st.session_state['available_months'])}")
-            else:
-                st.error("❌ JSONファイルが見つかりませんでした")
+        # メモリ予算を超えて読み込みを取り消したファイルは再読み込みしない
+        if st.session_state.get(REJECTED_UPLOAD_KEY) == uploaded_file.name:
+            # 取り込み中に予算を超えた場合も、残りの取り込みを中止して途中のデータを保持しない
+            if job is not None:
+                job.cancel()
+                del st.session_state[INGESTION_JOB_KEY]
+            st.error("❌ このファイルはメモリ予算を超えるため読み込めません。月数を絞ったファイルをアップロードしてください")
+            return
+        st.session_state.pop(REJECTED_UPLOAD_KEY, None)
+        if job is None and ('json_data' not in st.session_state or st.session_state.get('uploaded_file_name') != uploaded_file.name):
+            st.session_state.pop('json_data', None)
+            st.session_state.pop('available_months', None)
+            st.session_state['uploaded_file_name'] = uploaded_file.name
+            job = start_ingestion(uploaded_file.name, uploaded_file.getvalue())
+            st.session_state[INGESTION_JOB_KEY] = job
+    
+    if job is not None:
+        _publish_ingested_data(job)
+        render_ingestion_progress()
+    
+    summary = st.session_state.pop(INGESTION_SUMMARY_KEY, None)
+    if summary:
+        for error in summary['errors']:
+            st.error(error)
+        if summary['file_count']:
+            st.success(f"✅ {summary['file_count']}個のJSONファイルを読み込みました（{summary['elapsed_seconds']:.1f}秒）")
+            st.write(f"利用可能な月: {', '.join(summary['months'])}")
+            st.caption(f"{summary['partition_count']}ヶ月分のパーティションに正規化しました")
+        else:
+            st.error("❌ JSONファイルが見つかりませんでした")
+
+def _publish_ingested_data(job):
+    """
+    取り込み済みのデータをセッションに反映
+
+    Args:
+        job: 取り込み中のIngestionJob
+
+    Returns:
+        bool: 新しく取り込んだ月を反映したか
+    """
+    store = job.store
+    if store is None or st.session_state.get('json_data') is store:
+        return False
+    st.session_state['json_data'] = store
+    st.session_state['available_months'] = get_available_months_from_data(store)
+    return True
+
+@st.fragment(run_every=INGESTION_POLL_SECONDS)
+def render_ingestion_progress():
+    """取り込みの進捗（ファイル数・バイト数・残り時間）を表示し、月が増えたら画面全体を更新"""
+    job = st.session_state.get(INGESTION_JOB_KEY)
+    if job is None:
+        return
+    
+    published = _publish_ingested_data(job)
+    if job.finished:
+        progress = job.progress()
+        st.session_state[INGESTION_SUMMARY_KEY] = {
+            'file_count': progress['done_files'] if job.store is not None else 0,
+            'months': st.session_state.get('available_months', []),
+            'partition_count': len(job.store.partitions) if job.store is not None else 0,
+            'elapsed_seconds': progress['elapsed_seconds'],
+            'errors': list(job.errors)
+        }
+        del st.session_state[INGESTION_JOB_KEY]
+        st.rerun()
+    if published:
+        # 取り込み済みの月を分析対象に加えるため、画面全体を再実行
+        st.rerun()
+    
+    progress = job.progress()
+    ratio = progress['done_bytes'] / progress['total_bytes'] if progress['total_bytes'] else 0
+    st.progress(min(ratio, 1.0), text="アップロードファイルを取り込み中...")
+    eta = progress['eta_seconds']
+    st.caption(
+        f"{progress['done_files']}/{progress['total_files'] or '-'} ファイル・"
+        f"{progress['done_bytes'] / 1024 / 1024:,.1f}/{progress['total_bytes'] / 1024 / 1024:,.1f} MB・"
+        f"残り {f'約{eta:.0f}秒' if eta is not None else '-'}"
+    )
+    if progress['ready_months']:
+        st.caption(f"分析できる月: {', '.join(progress['ready_months'])}")
 
 def render_analysis_selection():
     """分析タイプ選択セクションを表示"""
@@ -37,7 +120,8 @@ def render_analysis_selection():
         analysis_options = {
             "📊 月次サマリー分析": "basic_analysis",
             "📈 定着率分析": "retention_analysis",
-            "📋 単月詳細データ": "monthly_detail"
+            "📋 単月詳細データ": "monthly_detail",
+            "🔎 SQLクエリ分析": "query_analysis"
         }
         
         analysis_type = st.selectbox(
@@ -80,6 +164,13 @@ def render_usage_guide():
     - `月次サマリー_YYYY-MM.json`
     - `定着率分析_YYYY-MM.json`
     
+    Zipファイルの代わりに、変換済みのバンドルファイル（`.isbundle`）もアップロードできます。
+    JSONの空白や繰り返しのキーを省いた形式のため、サイズが小さく読み込みも高速です。
+    
+    ```
+    python -m utils.dataset_bundle 分析データ.zip -o 分析データ.isbundle
+    ```
+    
     ### 注意事項
     
     - ファイル名は上記の形式に従ってください
@@ -0,0 +1,51 @@
+"""遅延タブ表示ロジック
+
+st.tabs は非表示タブの中身も毎回実行されるため、選択中のタブだけを
+実行するセレクター方式のタブを提供する
+"""
+import streamlit as st
+
+
+def lazy_tab_selector(tabs, key, default=None):
+    """
+    タブ選択UIを表示し、選択中のタブIDを返す
+
+    呼び出し側は戻り値で分岐し、選択中のタブのみレンダリングする。
+    選択状態はセッション状態とURLクエリパラメータに保持されるため、
+    リロードやディープリンクでも同じタブが開かれる。
+
+    Args:
+        tabs: (タブID, 表示ラベル) のリスト
+        key: セッション状態・クエリパラメータのキー
+        default: 初期表示するタブID（Noneの場合は先頭タブ）
+
+    Returns:
+        str: 選択中のタブID
+    """
+    tab_ids = [tab_id for tab_id, _ in tabs]
+    labels = dict(tabs)
+
+    # 初回はURLクエリパラメータ（ディープリンク）を優先
+    if st.session_state.get(key) not in tab_ids:
+        query_value = st.query_params.get(key)
+        if query_value in tab_ids:
+            st.session_state[key] = query_value
+        elif default in tab_ids:
+            st.session_state[key] = default
+        else:
+            st.session_state[key] = tab_ids[0]
+
+    selected = st.radio(
+        key,
+        tab_ids,
+        format_func=lambda tab_id: labels[tab_id],
+        horizontal=True,
+        key=key,
+        label_visibility="collapsed"
+    )
+
+    # ディープリンク用にURLへ反映
+    if st.query_params.get(key) != selected:
+        st.query_params[key] = selected
+
+    return selected
@@ -0,0 +1,82 @@
+"""メモリ使用量パネル
+
+管理者向けに、セッションごとのデータ量（アップロードデータ/派生データ）と予算、
+tracemallocによる割り当て箇所のスナップショットをサイドバーに表示する
+"""
+import tracemalloc
+
+import streamlit as st
+import pandas as pd
+from utils.memory import (
+    MEMORY_TIERS, get_process_rss, start_tracemalloc, stop_tracemalloc, take_memory_snapshot
+)
+
+MEMORY_SNAPSHOT_KEY = 'memory_snapshot'
+
+
+def _mb(size):
+    """バイト数をMB表記に変換"""
+    return round(size / 1024 / 1024, 1)
+
+
+def render_memory_panel(report):
+    """
+    メモリ使用量と予算、tracemallocのスナップショットを表示
+
+    Args:
+        report: enforce_memory_budget の戻り値
+    """
+    if report is None:
+        return
+
+    with st.expander("🧠 メモリ使用量", expanded=False):
+        rss = get_process_rss()
+        rss_label = f"{_mb(rss):,.1f} MB" if rss is not None else "不明"
+        st.caption(
+            f"プロセスRSS: {rss_label} / セッションデータ合計: {_mb(report['total_bytes']):,.1f} MB"
+            f"（全体予算 {_mb(report['global_budget']):,.0f} MB、"
+            f"セッション予算 {_mb(report['session_budget']):,.0f} MB）"
+        )
+
+        sessions = pd.DataFrame([
+            {
+                'session': session['session_id'][:8] + (' (現在)' if session['session_id'] == report['current_session_id'] else ''),
+                **{f"{label}_MB": _mb(session[tier]) for tier, label in MEMORY_TIERS.items()},
+                'total_MB': _mb(sum(session[tier] for tier in MEMORY_TIERS)),
+                'last_seen': pd.Timestamp(session['last_seen'], unit='s', tz='Asia/Tokyo').strftime('%H:%M:%S')
+            }
+            for session in report['sessions']
+        ])
+        st.dataframe(sessions, hide_index=True, use_container_width=True)
+
+        if report['evictions']:
+            st.caption("この再実行で解放したデータ（他のセッションは次回の再実行で解放）")
+            evictions = pd.DataFrame([
+                {
+                    'session': eviction['session_id'][:8],
+                    'tier': MEMORY_TIERS[eviction['tier']],
+                    'MB': _mb(eviction['bytes']),
+                    'status': '次回の再実行で解放' if eviction['pending'] else '解放済み'
+                }
+                for eviction in report['evictions']
+            ])
+            st.dataframe(evictions, hide_index=True, use_container_width=True)
+
+        # tracemallocはプロセス全体で共有されるため、追跡中は全セッションの処理が遅くなる
+        tracing = st.toggle("割り当てを追跡（tracemalloc）", value=tracemalloc.is_tracing(), key="memory_tracemalloc")
+        if tracing:
+            start_tracemalloc()
+        else:
+            stop_tracemalloc()
+            st.session_state.pop(MEMORY_SNAPSHOT_KEY, None)
+            return
+
+        current, peak = tracemalloc.get_traced_memory()
+        st.caption(f"追跡中の割り当て: {_mb(current):,.1f} MB（ピーク {_mb(peak):,.1f} MB）")
+        if st.button("📸 スナップショット取得", key="memory_take_snapshot"):
+            previous = st.session_state.get(MEMORY_SNAPSHOT_KEY)
+            snapshot, top_stats = take_memory_snapshot(previous)
+            st.session_state[MEMORY_SNAPSHOT_KEY] = snapshot
+            if top_stats is not None and not top_stats.empty:
+                st.caption("前回のスナップショットとの差分" if previous is not None else "割り当ての多い箇所")
+                st.dataframe(top_stats, hide_index=True, use_container_width=True)
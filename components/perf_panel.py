@@ -0,0 +1,57 @@
+"""パフォーマンス計測パネル
+
+管理者向けに、直近の再実行で記録された段階別の所要時間と行数をサイドバーに表示する
+"""
+import streamlit as st
+import pandas as pd
+from utils.config import PERF_PANEL_USERS
+from utils.perf import get_perf_recorder, records_to_jsonl, summarize_records
+
+
+def can_view_perf_panel(username):
+    """計測パネルを表示できるユーザーか判定"""
+    return username in PERF_PANEL_USERS
+
+
+def render_perf_panel():
+    """直近の再実行の計測結果と履歴を表示"""
+    recorder = get_perf_recorder()
+    if recorder is None:
+        return
+
+    with st.expander("⏱️ パフォーマンス計測", expanded=False):
+        records = recorder.get_records(recorder.rerun_id)
+        total_ms = sum(record['seconds'] for record in records) * 1000
+        st.caption(f"再実行 #{recorder.rerun_id}: {len(records)}件の計測（合計 {total_ms:,.1f} ms）")
+
+        if records:
+            st.dataframe(summarize_records(records), hide_index=True, use_container_width=True)
+        else:
+            st.caption("この再実行では計測対象の処理は実行されませんでした（キャッシュ済み）")
+
+        all_records = recorder.get_records()
+        if all_records:
+            history = (
+                pd.DataFrame(all_records)
+                .groupby('rerun')
+                .agg(calls=('seconds', 'size'), total_ms=('seconds', 'sum'))
+                .reset_index()
+                .sort_values('rerun', ascending=False)
+            )
+            history['total_ms'] = (history['total_ms'] * 1000).round(1)
+            st.caption("再実行ごとの合計")
+            st.dataframe(history, hide_index=True, use_container_width=True)
+
+        col1, col2 = st.columns(2)
+        with col1:
+            st.download_button(
+                "📥 JSONL",
+                data=records_to_jsonl(all_records).encode('utf-8'),
+                file_name="perf_records.jsonl",
+                mime="application/x-ndjson",
+                disabled=not all_records,
+                key="perf_download"
+            )
+        with col2:
+            if st.button("🗑️ クリア", key="perf_clear"):
+                recorder.clear()
@@ -86,6 +86,46 @@ def display_ranking_with_ties(df, ranking_column, display_columns, max_rank=10,
             display_text = f"{rank}. {staff_name}{branch_tag} : {display_values[0]} ({display_values[1]})"
         st.markdown(display_text, unsafe_allow_html=True)
 
+@st.fragment
+def display_filtered_ranking(df, filter_column, slider_label, min_value, max_value, default_value,
+                             slider_key, ranking_column, display_columns, max_rank=10,
+                             branch_colors=None, format_as_currency=False, format_as_percent=False):
+    """
+    最低件数スライダー付きのランキング表示関数
+    
+    スライダー操作時はこのランキングのみ再実行され、ページ全体は再描画されない。
+    
+    Args:
+        df: 集計済みのDataFrame
+        filter_column: しきい値で絞り込む列名
+        slider_label: スライダーのラベル
+        min_value: スライダーの最小値
+        max_value: スライダーの最大値
+        default_value: スライダーの初期値
+        slider_key: スライダーのウィジェットキー
+        ranking_column: ランキング基準の列名
+        display_columns: 表示する列のリスト
+        max_rank: 表示する最大順位
+        branch_colors: 支部の色設定辞書
+        format_as_currency: 通貨フォーマットで表示するか
+        format_as_percent: パーセントフォーマットで表示するか
+    """
+    threshold = st.slider(slider_label, min_value, max_value, default_value, key=slider_key)
+    filtered = df[df[filter_column] >= threshold]
+    if not filtered.empty:
+        display_ranking_with_ties(
+            filtered,
+            ranking_column,
+            display_columns,
+            max_rank=max_rank,
+            branch_colors=branch_colors,
+            format_as_currency=format_as_currency,
+            format_as_percent=format_as_percent
+        )
+    else:
+        st.info("条件に該当するデータがありません")
+
+
 def create_ranking_dataframe(df, ranking_column, display_columns, max_rank=10):
     """
     ランキングデータフレームを作成
@@ -34,6 +34,10 @@ class Config:
         self.CACHE_ENABLED = self._get_bool('CACHE_ENABLED', True)
         self.CACHE_TTL = int(self._get_env('CACHE_TTL', '1800'))  # 30分
         
+        # メモリ予算設定（超過時は派生データ→アップロードデータの順に解放）
+        self.SESSION_MEMORY_BUDGET = int(self._get_env('SESSION_MEMORY_BUDGET_MB', '512')) * 1024 * 1024
+        self.GLOBAL_MEMORY_BUDGET = int(self._get_env('GLOBAL_MEMORY_BUDGET_MB', '2048')) * 1024 * 1024
+        
         # セキュリティ設定
         self.SECRET_KEY = self._get_env('SECRET_KEY', 'your-secret-key-here')
         
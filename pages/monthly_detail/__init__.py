@@ -9,6 +9,7 @@ from .main import render_monthly_detail_page
 # from .branch_analysis import render_branch_analysis_tab
 # from .staff_analysis import render_staff_analysis_tab
 from .product_analysis import render_product_analysis_tab
+from .prefetch import prefetch_adjacent_months
 # from .detail_data import render_detail_data_tab
 
 __version__ = "1.0.0"
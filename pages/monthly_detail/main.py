@@ -1,6 +1,7 @@
 """月次詳細データページ"""
 import streamlit as st
 import pandas as pd
+import numpy as np
 import plotly.graph_objects as go
 import plotly.express as px
 from datetime import datetime, timedelta
@@ -13,9 +14,14 @@ from utils.data_processor import (
     generate_branch_product_cross_data,
     format_number_value
 )
-from components.charts import create_funnel_chart, create_pie_chart, create_trend_chart, create_monthly_histogram, create_bar_chart, create_line_chart
-from components.rankings import display_ranking_with_ties
-from utils.config import BRANCH_COLORS, CARD_STYLE
+from components.charts import create_funnel_chart, create_pie_chart, create_trend_chart, create_monthly_histogram, create_bar_chart, create_line_chart, create_small_multiples_chart, create_multi_metric_trend_chart, select_multi_metric
+from components.rankings import display_ranking_with_ties, display_filtered_ranking
+from components.lazy_tabs import lazy_tab_selector
+from utils.config import BRANCH_COLORS, CARD_STYLE, DETAIL_PAGE_SIZE_OPTIONS, DEFAULT_DETAIL_PAGE_SIZE
+from utils.derived_cache import get_derived_cache
+from utils.downsampling import DEFAULT_MAX_POINTS, DOWNSAMPLE_METHODS, downsample_time_series, format_downsample_note
+from utils.export import EXPORT_FORMATS, get_available_export_formats, export_to_spooled_file
+from utils.perf import timed
 
 def get_prev_months(month_str, n=3):
     """指定月から過去n月分の月リストを取得"""
@@ -32,8 +38,7 @@ def render_monthly_detail_page(json_data, selected_month):
     if basic_data and detail_data and summary_data:
         # データフレーム作成
         try:
-            staff_dict = basic_data["monthly_analysis"][selected_month]["staff"]
-            df_basic = extract_daily_activity_from_staff(staff_dict)
+            df_basic = get_month_activity_df(json_data, basic_data, selected_month)
         except Exception as e:
             st.error(f"データ抽出エラー: {e}")
             df_basic = pd.DataFrame()
@@ -46,6 +51,89 @@ def render_monthly_detail_page(json_data, selected_month):
     else:
         st.warning("⚠️ 分析データが見つかりませんでした")
 
+def get_month_activity_df(json_data, basic_data, month, cache=None):
+    """
+    指定月の日報フラットDataFrameを取得（派生データキャッシュ経由）
+    
+    cache を渡した場合は st.* を呼び出さないため、先読みの別スレッドからも使える。
+    """
+    def build():
+        staff_dict = basic_data["monthly_analysis"][month]["staff"]
+        return extract_daily_activity_from_staff(staff_dict)
+    
+    if cache is None:
+        cache = get_derived_cache(json_data)
+    return cache.get_or_build(('month_activity', month), build)
+
+@timed()
+def build_branch_month_summary(json_data, month, cache=None):
+    """
+    3ヶ月比較用に指定月の支部別集計を作成
+    
+    Args:
+        json_data: JSONデータ
+        month: 対象月 (YYYY-MM形式)
+        cache: 派生データキャッシュ（Noneの場合は現在のセッションのキャッシュ）
+        
+    Returns:
+        pd.DataFrame: 支部別集計（データがない場合はNone）
+    """
+    b, d, s = load_analysis_data_from_json(json_data, month)
+    if not (b and s):
+        return None
+    
+    df_b = get_month_activity_df(json_data, b, month, cache=cache)
+    df_b = df_b.assign(branch=df_b["branch"].fillna("未設定"))
+    
+    # 基本集計
+    unique_staff = df_b.groupby('branch')['staff_name'].nunique().reset_index()
+    unique_staff.columns = ['branch', 'unique_staff_count']
+    
+    call_col = 'call_count' if 'call_count' in df_b.columns else 'total_calls'
+    appointment_col = 'get_appointment' if 'get_appointment' in df_b.columns else 'appointments'
+    success_col = 'charge_connected' if 'charge_connected' in df_b.columns else 'successful_calls'
+    hours_col = 'call_hours' if 'call_hours' in df_b.columns else None
+    
+    agg_dict = {call_col: 'sum', success_col: 'sum', appointment_col: 'sum'}
+    if hours_col:
+        agg_dict[hours_col] = 'sum'
+    
+    branch_df = df_b.groupby('branch').agg(agg_dict).reset_index()
+    
+    # カラム名を統一
+    columns = ['branch', 'call_count', 'charge_connected', 'get_appointment']
+    if hours_col:
+        columns.append('call_hours')
+    branch_df.columns = columns
+    
+    branch_df = branch_df.merge(unique_staff, on='branch', how='left')
+    
+    # TAAANデータ
+    if 'branch_performance' in s:
+        for col in ['total_deals','total_approved','total_revenue']:
+            branch_df[col] = branch_df['branch'].map(lambda x: s['branch_performance'].get(x,{}).get(col,0))
+    else:
+        branch_df['total_deals'] = 0
+        branch_df['total_approved'] = 0
+        branch_df['total_revenue'] = 0
+    
+    return branch_df
+
+def load_branch_month_summaries(json_data, compare_months):
+    """比較対象月の支部別集計を取得（派生データキャッシュ経由）"""
+    cache = get_derived_cache(json_data)
+    branch_summaries = {}
+    for m in compare_months:
+        try:
+            branch_summaries[m] = cache.get_or_build(
+                ('branch_month_summary', m),
+                lambda m=m: build_branch_month_summary(json_data, m)
+            )
+        except Exception as e:
+            st.warning(f"{m}月のデータ読み込みエラー: {e}")
+            branch_summaries[m] = None
+    return branch_summaries
+
 def render_sales_flow_metrics(df_basic, summary_data):
     """営業フロー指標セクションをレンダリング"""
     st.subheader("営業フロー指標")
@@ -153,47 +241,69 @@ def render_main_tabs(df_basic, basic_data, detail_data, summary_data, selected_m
                     ('call_count' in df_basic.columns or 'total_calls' in df_basic.columns))
     
     if has_call_data:
-        # タブを作成
-        tab1, tab2, tab3, tab4, tab5 = st.tabs(["📊 日次トレンド", "🏢 支部別分析", "👥 スタッフ別分析", "📦 商材別分析", "📋 詳細データ"])
-        
-        with tab1:
-            render_daily_trend_tab(df_basic)
-        
-        with tab2:
+        # タブを作成（選択中のタブのみ実行）
+        active_tab = lazy_tab_selector([
+            ("daily", "📊 日次トレンド"),
+            ("branch", "🏢 支部別分析"),
+            ("staff", "👥 スタッフ別分析"),
+            ("product", "📦 商材別分析"),
+            ("detail", "📋 詳細データ")
+        ], key="detail_tab")
+        
+        if active_tab == "daily":
+            render_daily_trend_tab(df_basic, json_data)
+        
+        elif active_tab == "branch":
             render_branch_analysis_tab(df_basic, summary_data, selected_month, json_data)
         
-        with tab3:
+        elif active_tab == "staff":
             render_staff_analysis_tab(df_basic, basic_data, summary_data, selected_month, json_data)
         
-        with tab4:
+        elif active_tab == "product":
             from .product_analysis import render_product_analysis_tab
             render_product_analysis_tab(df_basic, summary_data, json_data, selected_month)
         
-        with tab5:
-            render_detail_data_tab(df_basic, selected_month)
+        elif active_tab == "detail":
+            render_detail_data_tab(df_basic, selected_month, json_data)
     else:
         st.warning("⚠️ 架電データが見つかりませんでした")
 
-def render_daily_trend_tab(df_basic):
-    """日次トレンドタブをレンダリング"""
-    st.subheader("日次トレンド")
+def summarize_daily_activity(df_basic):
+    """
+    日報データを日別に集計
     
-    # 日次トレンドのサブタブ
-    trend_tab1, trend_tab2 = st.tabs(["📊 日別トレンド", "📈 累計値トレンド"])
+    Args:
+        df_basic: 日報データ
     
-    # 日別トレンド - カラム名を動的に決定
+    Returns:
+        pd.DataFrame: date, total_calls, successful_calls, appointments 列の日別合計
+    """
+    # カラム名を動的に決定
     call_col = 'call_count' if 'call_count' in df_basic.columns else 'total_calls'
     appointment_col = 'get_appointment' if 'get_appointment' in df_basic.columns else 'appointments'
     success_col = 'charge_connected' if 'charge_connected' in df_basic.columns else 'successful_calls'
     
-    daily_trend = df_basic.groupby('date').agg({
+    daily_totals = df_basic.groupby('date').agg({
         call_col: 'sum',
         success_col: 'sum',
         appointment_col: 'sum'
     }).reset_index()
     
     # カラム名を統一
-    daily_trend.columns = ['date', 'total_calls', 'successful_calls', 'appointments']
+    daily_totals.columns = ['date', 'total_calls', 'successful_calls', 'appointments']
+    return daily_totals
+
+def build_daily_trend(daily_totals):
+    """
+    日別集計から日次トレンド表示用のデータを作成
+    
+    Args:
+        daily_totals: summarize_daily_activity の結果
+    
+    Returns:
+        pd.DataFrame: JSTの日付（12:00）・土日判定・累計値を付けた日次トレンド
+    """
+    daily_trend = daily_totals.copy()
     
     # 日付をdatetimeに変換（UTC→JST変換）
     daily_trend['date'] = pd.to_datetime(daily_trend['date'], utc=True).dt.tz_convert('Asia/Tokyo').dt.date
@@ -205,8 +315,115 @@ def render_daily_trend_tab(df_basic):
     # 土日判定を追加
     daily_trend['is_weekend'] = daily_trend['date'].dt.dayofweek.isin([5, 6])  # 5=土曜日, 6=日曜日
     
+    # 累計値は間引き前の全データで計算
+    daily_trend['cumulative_calls'] = daily_trend['total_calls'].cumsum()
+    daily_trend['cumulative_connects'] = daily_trend['successful_calls'].cumsum()
+    daily_trend['cumulative_appointments'] = daily_trend['appointments'].cumsum()
+    return daily_trend
+
+def build_daily_trend_history(month_frames):
+    """
+    月別の日報データから全期間の日次トレンドを作成
+    
+    1ヶ月ずつ日別に集計してから結合するため、全月の日報データを同時にメモリへ載せない。
+    
+    Args:
+        month_frames: 月別の日報データのイテラブル（iter_month_activity_frames の結果など）
+    
+    Returns:
+        pd.DataFrame: build_daily_trend と同じ形式の日次トレンド（データがない場合は空）
+    """
+    daily_totals = [summarize_daily_activity(df_month) for df_month in month_frames]
+    if not daily_totals:
+        return pd.DataFrame()
+    combined = pd.concat(daily_totals, ignore_index=True).groupby('date', as_index=False).sum()
+    return build_daily_trend(combined)
+
+def select_daily_trend_points(daily_trend, display_range=None, method='minmax', max_points=DEFAULT_MAX_POINTS):
+    """
+    日次トレンドを表示期間で絞り込み、表示点数を上限以下に間引く
+    
+    Args:
+        daily_trend: build_daily_trend の結果
+        display_range: 表示期間（開始, 終了）。Noneの場合は全期間
+        method: 間引き方式（DOWNSAMPLE_METHODS のキー、または 'none'）
+        max_points: 表示点数の上限
+    
+    Returns:
+        tuple: (表示するデータ, 間引いた点数, 間引き前の表示期間内の点数)
+    """
+    in_range = daily_trend
+    if display_range is not None:
+        in_range = daily_trend[
+            (daily_trend['date'] >= display_range[0]) & (daily_trend['date'] <= display_range[1])
+        ]
+    if method == 'none':
+        return in_range, 0, len(in_range)
+    shown, dropped_points = downsample_time_series(
+        in_range,
+        'date',
+        ['total_calls', 'successful_calls', 'appointments',
+         'cumulative_calls', 'cumulative_connects', 'cumulative_appointments'],
+        max_points=max_points,
+        method=method
+    )
+    return shown, dropped_points, len(in_range)
+
+def render_daily_trend_tab(df_basic, json_data=None):
+    """日次トレンドタブをレンダリング"""
+    st.subheader("日次トレンド")
+    
+    # 複数月のデータがある場合は全月の日次推移も表示できる
+    months = sorted(st.session_state.get('available_months', []))
+    trend_scope = "選択月のみ"
+    if json_data is not None and len(months) > 1:
+        trend_scope = st.radio("対象期間", ["選択月のみ", "全月"], horizontal=True, key="daily_trend_scope")
+    
+    # 日次トレンドのサブタブ
+    trend_tab1, trend_tab2 = st.tabs(["📊 日別トレンド", "📈 累計値トレンド"])
+    
+    if trend_scope == "全月":
+        # 月別の日報データ（キャッシュ済みの月はそれを使う）から作成し、派生データキャッシュに保持
+        cache = get_derived_cache(json_data)
+        daily_trend = cache.get_or_build(
+            ('daily_trend', 'all', tuple(months)),
+            lambda: build_daily_trend_history(iter_month_activity_frames(json_data, months, cache=cache))
+        )
+    else:
+        daily_trend = build_daily_trend(summarize_daily_activity(df_basic))
+    
+    # 長期間の場合は表示期間と間引き方式を選択
+    dropped_points = 0
+    if len(daily_trend) > DEFAULT_MAX_POINTS:
+        range_min = daily_trend['date'].min().to_pydatetime()
+        range_max = daily_trend['date'].max().to_pydatetime()
+        ctrl_col1, ctrl_col2 = st.columns([3, 1])
+        with ctrl_col1:
+            display_range = st.slider(
+                "表示期間",
+                min_value=range_min,
+                max_value=range_max,
+                value=(range_min, range_max),
+                format="YYYY/MM/DD",
+                key=f"daily_trend_range_{range_min:%Y%m%d}_{range_max:%Y%m%d}"
+            )
+        with ctrl_col2:
+            downsample_method = st.selectbox(
+                "間引き方式",
+                ['minmax', 'lttb', 'none'],
+                format_func=lambda m: DOWNSAMPLE_METHODS.get(m, "間引きなし"),
+                key="daily_trend_downsample"
+            )
+        
+        daily_trend, dropped_points, displayed_points = select_daily_trend_points(
+            daily_trend, display_range, downsample_method
+        )
+        if dropped_points:
+            st.caption(f"📉 {format_downsample_note(dropped_points, displayed_points)}")
+    
     # 土日ハイライト用の全日付範囲を作成（JST時間で）
-    if not daily_trend.empty:
+    # 間引き表示時は点が日単位でなくなるためハイライトしない
+    if not daily_trend.empty and not dropped_points:
         # JST時間での日付範囲を作成
         date_range = pd.date_range(
             start=daily_trend['date'].min(),
@@ -302,10 +519,6 @@ def render_daily_trend_tab(df_basic):
     
     with trend_tab2:
         # 累計値トレンドグラフ
-        daily_trend['cumulative_calls'] = daily_trend['total_calls'].cumsum()
-        daily_trend['cumulative_connects'] = daily_trend['successful_calls'].cumsum()
-        daily_trend['cumulative_appointments'] = daily_trend['appointments'].cumsum()
-        
         fig_cumulative = go.Figure()
         
         # 土日の背景色を追加（視覚効果のため半日前倒し）
@@ -459,12 +672,15 @@ def render_branch_analysis_tab(df_basic, summary_data, selected_month, json_data
         .round(1)
     )
     
-    # サブタブを追加
-    subtab1, subtab2, subtab3, subtab4 = st.tabs([
-        "実数", "単位あたり分析", "実数3ヶ月比較", "単位あたり3ヶ月比較"
-    ])
+    # サブタブを追加（選択中のサブタブのみ実行）
+    active_subtab = lazy_tab_selector([
+        ("actual", "実数"),
+        ("unit", "単位あたり分析"),
+        ("actual_3m", "実数3ヶ月比較"),
+        ("unit_3m", "単位あたり3ヶ月比較")
+    ], key="branch_subtab")
     
-    with subtab1:
+    if active_subtab == "actual":
         st.markdown("#### 実数")
         col1, col2, col3 = st.columns(3)
         
@@ -674,7 +890,7 @@ def render_branch_analysis_tab(df_basic, summary_data, selected_month, json_data
         display_columns = ['支部', 'スタッフ数', '架電数', '担当コネクト', 'アポ獲得', 'TAAAN商談', '承認済み', 'コネクト率', 'アポ率', '承認率']
         st.dataframe(display_table[display_columns], use_container_width=True)
     
-    with subtab2:
+    if active_subtab == "unit":
         st.markdown("#### 単位あたり分析")
         
         # 1人あたり指標の計算
@@ -857,7 +1073,7 @@ def render_branch_analysis_tab(df_basic, summary_data, selected_month, json_data
         else:
             st.info("時間あたり指標の表示には架電時間データが必要です")
     
-    with subtab3:
+    if active_subtab == "actual_3m":
         st.markdown("#### 実数3ヶ月比較")
         
         # 比較月リスト作成
@@ -865,53 +1081,7 @@ def render_branch_analysis_tab(df_basic, summary_data, selected_month, json_data
         st.info(f"比較対象月: {', '.join(compare_months)}")
         
         # 各月の支部別集計を取得
-        branch_summaries = {}
-        for m in compare_months:
-            b, d, s = load_analysis_data_from_json(json_data, m)
-            if b and s:
-                try:
-                    staff_dict = b["monthly_analysis"][m]["staff"]
-                    df_b = extract_daily_activity_from_staff(staff_dict)
-                    df_b["branch"] = df_b["branch"].fillna("未設定")
-                    
-                    # 基本集計
-                    unique_staff = df_b.groupby('branch')['staff_name'].nunique().reset_index()
-                    unique_staff.columns = ['branch', 'unique_staff_count']
-                    
-                    call_col = 'call_count' if 'call_count' in df_b.columns else 'total_calls'
-                    appointment_col = 'get_appointment' if 'get_appointment' in df_b.columns else 'appointments'
-                    success_col = 'charge_connected' if 'charge_connected' in df_b.columns else 'successful_calls'
-                    hours_col = 'call_hours' if 'call_hours' in df_b.columns else None
-                    
-                    agg_dict = {call_col: 'sum', success_col: 'sum', appointment_col: 'sum'}
-                    if hours_col:
-                        agg_dict[hours_col] = 'sum'
-                    
-                    branch_df = df_b.groupby('branch').agg(agg_dict).reset_index()
-                    
-                    # カラム名を統一
-                    columns = ['branch', 'call_count', 'charge_connected', 'get_appointment']
-                    if hours_col:
-                        columns.append('call_hours')
-                    branch_df.columns = columns
-                    
-                    branch_df = branch_df.merge(unique_staff, on='branch', how='left')
-                    
-                    # TAAANデータ
-                    if 'branch_performance' in s:
-                        for col in ['total_deals','total_approved','total_revenue']:
-                            branch_df[col] = branch_df['branch'].map(lambda x: s['branch_performance'].get(x,{}).get(col,0))
-                    else:
-                        branch_df['total_deals'] = 0
-                        branch_df['total_approved'] = 0
-                        branch_df['total_revenue'] = 0
-                    
-                    branch_summaries[m] = branch_df
-                except Exception as e:
-                    st.warning(f"{m}月のデータ読み込みエラー: {e}")
-                    branch_summaries[m] = None
-            else:
-                branch_summaries[m] = None
+        branch_summaries = load_branch_month_summaries(json_data, compare_months)
         
         # 指標リスト
         indicators = [
@@ -925,57 +1095,15 @@ def render_branch_analysis_tab(df_basic, summary_data, selected_month, json_data
             ('unique_staff_count', 'ユニーク稼働者数')
         ]
         
-        # 3列レイアウトで指標を表示
-        for i in range(0, len(indicators), 3):
-            cols = st.columns(3)
-            for j, (col, label) in enumerate(indicators[i:i+3]):
-                with cols[j]:
-                    st.markdown(f"##### {label}（支部別3ヶ月比較）")
-                    plot_df = []
-                    for m in compare_months:
-                        df = branch_summaries.get(m)
-                        if df is not None and col in df.columns:
-                            for _, row in df.iterrows():
-                                plot_df.append({"month": m, "branch": row['branch'], "value": row[col]})
-                    
-                    if plot_df:
-                        plot_df = pd.DataFrame(plot_df)
-                        # 統一した色パレットを使用
-                        color_sequence = [BRANCH_COLORS.get(branch, '#95a5a6') for branch in plot_df['branch'].unique()]
-                        
-                        # 報酬関連はホバーテンプレートに¥マークを追加
-                        is_revenue = 'revenue' in col
-                        hover_template = f'支部: %{{fullData.name}}<br>月: %{{x}}<br>{label}: ¥%{{y:,}}<extra></extra>' if is_revenue else f'支部: %{{fullData.name}}<br>月: %{{x}}<br>{label}: %{{y:,}}<extra></extra>'
-                        
-                        fig = px.line(
-                            plot_df, x='month', y='value', color='branch', markers=True,
-                            color_discrete_sequence=color_sequence,
-                            labels={"value": label, "month": "月", "branch": "支部"}
-                        )
-                        
-                        # ホバーテンプレートを個別に設定
-                        for trace in fig.data:
-                            trace.hovertemplate = hover_template
-                        
-                        fig.update_xaxes(type='category', tickvals=compare_months, ticktext=compare_months)
-                        fig.update_layout(
-                            yaxis_title=label,
-                            yaxis=dict(tickformat=',', separatethousands=True),
-                            legend=dict(
-                                orientation='h',
-                                yanchor='bottom',
-                                y=-0.5,
-                                xanchor='center',
-                                x=0.5,
-                                font=dict(family='"Meiryo", "Yu Gothic", "Noto Sans JP", "sans-serif"', size=12)
-                            ),
-                            height=300
-                        )
-                        st.plotly_chart(fig, use_container_width=True)
-                    else:
-                        st.info("データがありません")
+        # 支部別3ヶ月比較を表示
+        long_df = build_branch_3month_long_df(branch_summaries, compare_months, indicators)
+        hover_formats = {
+            col: '¥%{y:,}' if 'revenue' in col else '%{y:,}'
+            for col, _ in indicators
+        }
+        render_branch_3month_comparison(long_df, indicators, compare_months, hover_formats)
     
-    with subtab4:
+    if active_subtab == "unit_3m":
         st.markdown("#### 単位あたり3ヶ月比較")
         
         # 比較月リスト作成（実数3ヶ月比較と同じデータを使用）
@@ -983,53 +1111,7 @@ def render_branch_analysis_tab(df_basic, summary_data, selected_month, json_data
         st.info(f"比較対象月: {', '.join(compare_months)}")
         
         # 各月の支部別集計を取得（実数3ヶ月比較と同じロジック）
-        branch_summaries = {}
-        for m in compare_months:
-            b, d, s = load_analysis_data_from_json(json_data, m)
-            if b and s:
-                try:
-                    staff_dict = b["monthly_analysis"][m]["staff"]
-                    df_b = extract_daily_activity_from_staff(staff_dict)
-                    df_b["branch"] = df_b["branch"].fillna("未設定")
-                    
-                    # 基本集計
-                    unique_staff = df_b.groupby('branch')['staff_name'].nunique().reset_index()
-                    unique_staff.columns = ['branch', 'unique_staff_count']
-                    
-                    call_col = 'call_count' if 'call_count' in df_b.columns else 'total_calls'
-                    appointment_col = 'get_appointment' if 'get_appointment' in df_b.columns else 'appointments'
-                    success_col = 'charge_connected' if 'charge_connected' in df_b.columns else 'successful_calls'
-                    hours_col = 'call_hours' if 'call_hours' in df_b.columns else None
-                    
-                    agg_dict = {call_col: 'sum', success_col: 'sum', appointment_col: 'sum'}
-                    if hours_col:
-                        agg_dict[hours_col] = 'sum'
-                    
-                    branch_df = df_b.groupby('branch').agg(agg_dict).reset_index()
-                    
-                    # カラム名を統一
-                    columns = ['branch', 'call_count', 'charge_connected', 'get_appointment']
-                    if hours_col:
-                        columns.append('call_hours')
-                    branch_df.columns = columns
-                    
-                    branch_df = branch_df.merge(unique_staff, on='branch', how='left')
-                    
-                    # TAAANデータ
-                    if 'branch_performance' in s:
-                        for col in ['total_deals','total_approved','total_revenue']:
-                            branch_df[col] = branch_df['branch'].map(lambda x: s['branch_performance'].get(x,{}).get(col,0))
-                    else:
-                        branch_df['total_deals'] = 0
-                        branch_df['total_approved'] = 0
-                        branch_df['total_revenue'] = 0
-                    
-                    branch_summaries[m] = branch_df
-                except Exception as e:
-                    st.warning(f"{m}月のデータ読み込みエラー: {e}")
-                    branch_summaries[m] = None
-            else:
-                branch_summaries[m] = None
+        branch_summaries = load_branch_month_summaries(json_data, compare_months)
         
         # 単位あたり指標リスト
         unit_indicators = [
@@ -1075,68 +1157,141 @@ def render_branch_analysis_tab(df_basic, summary_data, selected_month, json_data
             else:
                 unit_monthly[m] = None
         
-        # 3列レイアウトで指標を表示
-        for i in range(0, len(unit_indicators), 3):
-            cols = st.columns(3)
-            for j, (col, label) in enumerate(unit_indicators[i:i+3]):
-                with cols[j]:
-                    st.markdown(f"##### {label}（支部別3ヶ月比較）")
-                    plot_df = []
-                    for m in compare_months:
-                        df = unit_monthly.get(m)
-                        if df is not None and col in df.columns:
-                            for _, row in df.iterrows():
-                                # NaNや無限大値をスキップ
-                                value = row[col]
-                                if pd.notna(value) and value != float('inf') and value != float('-inf'):
-                                    plot_df.append({"month": m, "branch": row['branch'], "value": value})
+        # 支部別3ヶ月比較を表示
+        long_df = build_branch_3month_long_df(unit_monthly, compare_months, unit_indicators)
+        hover_formats = {}
+        for col, _ in unit_indicators:
+            if 'revenue' in col:
+                # 単位あたり報酬は1桁表示
+                precision = ':.1f' if 'per_staff' in col else ':.0f'
+                hover_formats[col] = f'¥%{{y{precision}}}'
+            else:
+                hover_formats[col] = '%{y:,.1f}'
+        render_branch_3month_comparison(long_df, unit_indicators, compare_months, hover_formats)
+
+@timed()
+def build_branch_3month_long_df(monthly_frames, compare_months, indicators):
+    """
+    支部別3ヶ月比較用のロング形式データを作成
+    
+    Args:
+        monthly_frames: 月→支部別集計DataFrameの辞書
+        compare_months: 比較対象月のリスト
+        indicators: (列名, 表示ラベル) のリスト
+    
+    Returns:
+        pd.DataFrame: month, branch, indicator, value 列のDataFrame（NaN・無限大は除外）
+    """
+    frames = []
+    for m in compare_months:
+        df = monthly_frames.get(m)
+        if df is None:
+            continue
+        value_cols = [col for col, _ in indicators if col in df.columns]
+        if not value_cols:
+            continue
+        melted = df.melt(id_vars='branch', value_vars=value_cols, var_name='indicator', value_name='value')
+        melted['month'] = m
+        frames.append(melted)
+    
+    if not frames:
+        return pd.DataFrame(columns=['month', 'branch', 'indicator', 'value'])
+    
+    long_df = pd.concat(frames, ignore_index=True)
+    long_df['value'] = pd.to_numeric(long_df['value'], errors='coerce')
+    return long_df[np.isfinite(long_df['value'])]
+
+
+def render_branch_3month_comparison(long_df, indicators, compare_months, hover_formats):
+    """
+    支部別3ヶ月比較グラフを表示
+    
+    まとめて表示（スモールマルチプル）では全指標を1つのFigureで描画し、
+    オフの場合は指標ごとのグラフを3列で表示する。
+    
+    Args:
+        long_df: build_branch_3month_long_df で作成したデータ
+        indicators: (列名, 表示ラベル) のリスト
+        compare_months: 比較対象月のリスト
+        hover_formats: 列名→ホバー時のY値表示形式の辞書
+    """
+    small_multiples = st.toggle(
+        "📐 全指標を1つのグラフにまとめて表示",
+        value=True,
+        key="branch_3m_small_multiples",
+        help="オンにすると全指標を1つのグラフ（共通のX軸・支部色）で描画し、表示が軽くなります。"
+    )
+    
+    if small_multiples:
+        if long_df.empty:
+            st.info("データがありません")
+            return
+        fig = create_small_multiples_chart(
+            long_df,
+            indicators,
+            compare_months,
+            color_map=BRANCH_COLORS,
+            hover_formats=hover_formats
+        )
+        st.plotly_chart(fig, use_container_width=True)
+        return
+    
+    # 3列レイアウトで指標を表示
+    for i in range(0, len(indicators), 3):
+        cols = st.columns(3)
+        for j, (col, label) in enumerate(indicators[i:i+3]):
+            with cols[j]:
+                st.markdown(f"##### {label}（支部別3ヶ月比較）")
+                plot_df = long_df[long_df['indicator'] == col]
+                
+                if not plot_df.empty:
+                    # 統一した色パレットを使用
+                    color_sequence = [BRANCH_COLORS.get(branch, '#95a5a6') for branch in plot_df['branch'].unique()]
+                    hover_template = f'支部: %{{fullData.name}}<br>月: %{{x}}<br>{label}: {hover_formats[col]}<extra></extra>'
                     
-                    if plot_df:
-                        plot_df = pd.DataFrame(plot_df)
-                        # 統一した色パレットを使用
-                        color_sequence = [BRANCH_COLORS.get(branch, '#95a5a6') for branch in plot_df['branch'].unique()]
-                        
-                        # 報酬関連はホバーテンプレートに¥マークを追加
-                        is_revenue = 'revenue' in col
-                        if is_revenue:
-                            # 単位あたり報酬は1桁表示
-                            precision = ':.1f' if 'per_staff' in col else ':.0f'
-                            hover_template = f'支部: %{{fullData.name}}<br>月: %{{x}}<br>{label}: ¥%{{y{precision}}}<extra></extra>'
-                        else:
-                            hover_template = f'支部: %{{fullData.name}}<br>月: %{{x}}<br>{label}: %{{y:,.1f}}<extra></extra>'
-                        
-                        fig = px.line(
-                            plot_df, x='month', y='value', color='branch', markers=True,
-                            color_discrete_sequence=color_sequence,
-                            labels={"value": label, "month": "月", "branch": "支部"}
-                        )
-                        
-                        # ホバーテンプレートを個別に設定
-                        for trace in fig.data:
-                            trace.hovertemplate = hover_template
-                        
-                        fig.update_xaxes(type='category', tickvals=compare_months, ticktext=compare_months)
-                        fig.update_layout(
-                            yaxis_title=label,
-                            yaxis=dict(tickformat=',', separatethousands=True),
-                            legend=dict(
-                                orientation='h',
-                                yanchor='bottom',
-                                y=-0.5,
-                                xanchor='center',
-                                x=0.5,
-                                font=dict(family='"Meiryo", "Yu Gothic", "Noto Sans JP", "sans-serif"', size=12)
-                            ),
-                            height=300
-                        )
-                        st.plotly_chart(fig, use_container_width=True)
-                    else:
-                        st.info("データがありません")
+                    fig = px.line(
+                        plot_df, x='month', y='value', color='branch', markers=True,
+                        color_discrete_sequence=color_sequence,
+                        labels={"value": label, "month": "月", "branch": "支部"}
+                    )
+                    
+                    # ホバーテンプレートを個別に設定
+                    for trace in fig.data:
+                        trace.hovertemplate = hover_template
+                    
+                    fig.update_xaxes(type='category', tickvals=compare_months, ticktext=compare_months)
+                    fig.update_layout(
+                        yaxis_title=label,
+                        yaxis=dict(tickformat=',', separatethousands=True),
+                        legend=dict(
+                            orientation='h',
+                            yanchor='bottom',
+                            y=-0.5,
+                            xanchor='center',
+                            x=0.5,
+                            font=dict(family='"Meiryo", "Yu Gothic", "Noto Sans JP", "sans-serif"', size=12)
+                        ),
+                        height=300
+                    )
+                    st.plotly_chart(fig, use_container_width=True)
+                else:
+                    st.info("データがありません")
 
-def render_staff_analysis_tab(df_basic, basic_data, summary_data, selected_month, json_data):
-    """スタッフ別分析タブをレンダリング"""
-    st.subheader("スタッフ別分析")
+
+@timed()
+def build_staff_summary(df_basic, basic_data, summary_data, selected_month):
+    """
+    スタッフ別集計（ランキング用）を作成
+    
+    Args:
+        df_basic: 日報データのDataFrame
+        basic_data: 基本分析データ
+        summary_data: 月次サマリーデータ
+        selected_month: 対象月
     
+    Returns:
+        tuple: (スタッフ別集計DataFrame, スタッフ別TAAANデータの辞書)
+    """
     # 共通のスタッフ別集計処理
     # 日報データから基本集計
     call_col = 'call_count' if 'call_count' in df_basic.columns else 'total_calls'
@@ -1210,6 +1365,572 @@ def render_staff_analysis_tab(df_basic, basic_data, summary_data, selected_month
         .round(1)
     )
     
+    # 稼働日数（架電数>0の日数）をスタッフ単位でまとめて計算
+    working_days = (
+        df_basic[df_basic[call_col] > 0]
+        .groupby('staff_name')['date']
+        .nunique()
+    )
+    staff_summary['working_days'] = (
+        staff_summary['staff_name'].map(working_days).fillna(0).astype(int)
+    )
+    
+    # 稼働日当たり効率の計算
+    staff_summary['calls_per_working_day'] = (
+        staff_summary['total_calls'] / staff_summary['working_days']
+    ).fillna(0).round(1)
+    
+    staff_summary['appointments_per_working_day'] = (
+        staff_summary['appointments'] / staff_summary['working_days']
+    ).fillna(0).round(1)
+    
+    staff_summary['deals_per_working_day'] = (
+        staff_summary['taaan_deals'] / staff_summary['working_days']
+    ).fillna(0).round(1)
+    
+    staff_summary['approved_per_working_day'] = (
+        staff_summary['approved_deals'] / staff_summary['working_days']
+    ).fillna(0).round(1)
+    
+    staff_summary['revenue_per_working_day'] = (
+        staff_summary['total_revenue'] / staff_summary['working_days']
+    ).fillna(0).round(0)
+    
+    return staff_summary, taaan_staff_data
+
+
+@timed()
+def build_staff_hours_summary(df_basic, taaan_staff_data):
+    """
+    スタッフ別の時間当たり効率集計を作成
+    
+    Args:
+        df_basic: 日報データのDataFrame
+        taaan_staff_data: スタッフ別TAAANデータの辞書
+    
+    Returns:
+        pd.DataFrame: 時間当たり効率の集計
+    """
+    # 架電時間データから時間当たり効率を計算
+    call_col = 'call_count' if 'call_count' in df_basic.columns else 'total_calls'
+    appointment_col = 'get_appointment' if 'get_appointment' in df_basic.columns else 'appointments'
+    
+    staff_hours_summary = df_basic.groupby('staff_name').agg({
+        call_col: 'sum',
+        'call_hours': 'sum',
+        appointment_col: 'sum',
+        'branch': 'first'
+    }).reset_index()
+    
+    staff_hours_summary.columns = ['staff_name', 'total_calls', 'total_hours', 'appointments', 'branch']
+    
+    # 時間当たり効率の計算
+    staff_hours_summary['calls_per_hour'] = (
+        staff_hours_summary['total_calls'] / staff_hours_summary['total_hours']
+    ).fillna(0).round(1)
+    
+    staff_hours_summary['appointments_per_hour'] = (
+        staff_hours_summary['appointments'] / staff_hours_summary['total_hours']
+    ).fillna(0).round(1)
+    
+    # TAAANデータを結合
+    staff_hours_summary['taaan_deals'] = staff_hours_summary['staff_name'].map(
+        lambda x: taaan_staff_data.get(x, {}).get('taaan_deals', 0)
+    )
+    staff_hours_summary['approved_deals'] = staff_hours_summary['staff_name'].map(
+        lambda x: taaan_staff_data.get(x, {}).get('approved_deals', 0)
+    )
+    staff_hours_summary['total_revenue'] = staff_hours_summary['staff_name'].map(
+        lambda x: taaan_staff_data.get(x, {}).get('total_revenue', 0)
+    )
+    
+    staff_hours_summary['deals_per_hour'] = (
+        staff_hours_summary['taaan_deals'] / staff_hours_summary['total_hours']
+    ).fillna(0).round(1)
+    
+    staff_hours_summary['revenue_per_hour'] = (
+        staff_hours_summary['total_revenue'] / staff_hours_summary['total_hours']
+    ).fillna(0).round(0)
+    
+    return staff_hours_summary
+
+
+@st.fragment
+def render_branch_staff_ranking(staff_summary):
+    """
+    支部選択ボタンと支部内ランキングを表示
+    
+    支部ボタンの操作時はこのセクションのみ再実行される。
+    
+    Args:
+        staff_summary: スタッフ別集計DataFrame
+    """
+    # 支部選択（ボタン形式）
+    available_branches = sorted(staff_summary['branch'].unique())
+    st.write("**📍 分析対象支部を選択**")
+    
+    # 支部ボタンを動的に配置
+    if len(available_branches) <= 6:
+        # 6個以下の場合は横一列に配置
+        cols = st.columns(len(available_branches))
+        for i, branch in enumerate(available_branches):
+            with cols[i]:
+                if st.button(f"{branch}", use_container_width=True, key=f"branch_btn_{branch}"):
+                    st.session_state.selected_branch_ranking = branch
+    else:
+        # 7個以上の場合は2行に分けて配置
+        mid_point = (len(available_branches) + 1) // 2
+        first_row = available_branches[:mid_point]
+        second_row = available_branches[mid_point:]
+        
+        # 1行目
+        cols1 = st.columns(len(first_row))
+        for i, branch in enumerate(first_row):
+            with cols1[i]:
+                if st.button(f"{branch}", use_container_width=True, key=f"branch_btn_{branch}"):
+                    st.session_state.selected_branch_ranking = branch
+        
+        # 2行目
+        cols2 = st.columns(len(second_row))
+        for i, branch in enumerate(second_row):
+            with cols2[i]:
+                if st.button(f"{branch}", use_container_width=True, key=f"branch_btn_{branch}"):
+                    st.session_state.selected_branch_ranking = branch
+    
+    # デフォルトの選択支部を設定
+    if 'selected_branch_ranking' not in st.session_state:
+        st.session_state.selected_branch_ranking = available_branches[0]
+    
+    selected_branch = st.session_state.selected_branch_ranking
+    
+    # 選択された支部のスタッフをフィルタリング
+    branch_staff = staff_summary[staff_summary['branch'] == selected_branch]
+    
+    if not branch_staff.empty:
+        
+        # デバッグ情報を表示
+        total_taaan_deals = branch_staff['taaan_deals'].sum()
+        if total_taaan_deals == 0:
+            st.warning("⚠️ この支部のTAAAN商談数が0件です。基本分析データにTAAAN商談情報が含まれているか確認してください。")
+        
+        # 6つのランキングを2列×3行で表示
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            # 1. 架電数ランキング（支部内）
+            st.markdown("##### 🏆 架電数ランキング (日報)")
+            display_ranking_with_ties(
+                branch_staff, 
+                'total_calls', 
+                ['total_calls'], 
+                max_rank=5, 
+                show_branch=False
+            )
+            
+            st.markdown("---")
+            
+            # 2. 担当コネクト数ランキング（支部内）
+            st.markdown("##### 📞 担当コネクト数ランキング (日報)")
+            display_ranking_with_ties(
+                branch_staff, 
+                'charge_connected', 
+                ['charge_connected'], 
+                max_rank=5, 
+                show_branch=False
+            )
+            
+            st.markdown("---")
+            
+            # 3. アポ獲得数ランキング（支部内）
+            st.markdown("##### 🎯 アポ獲得数ランキング (日報)")
+            display_ranking_with_ties(
+                branch_staff, 
+                'appointments', 
+                ['appointments'], 
+                max_rank=5, 
+                show_branch=False
+            )
+        
+        with col2:
+            # 4. TAAAN商談数ランキング（支部内）
+            st.markdown("##### 💼 TAAAN商談数ランキング (TAAAN)")
+            display_ranking_with_ties(
+                branch_staff, 
+                'taaan_deals', 
+                ['taaan_deals'], 
+                max_rank=5, 
+                show_branch=False
+            )
+            
+            st.markdown("---")
+            
+            # 5. TAAAN承認数ランキング（支部内）
+            st.markdown("##### ✅ TAAAN承認数ランキング (TAAAN)")
+            display_ranking_with_ties(
+                branch_staff, 
+                'approved_deals', 
+                ['approved_deals'], 
+                max_rank=5, 
+                show_branch=False
+            )
+            
+            st.markdown("---")
+            
+            # 6. TAAAN報酬額ランキング（支部内）
+            st.markdown("##### 💰 TAAAN報酬額ランキング (TAAAN)")
+            display_ranking_with_ties(
+                branch_staff, 
+                'total_revenue', 
+                ['total_revenue'], 
+                max_rank=5, 
+                show_branch=False
+            )
+    else:
+        st.warning(f"選択された支部 '{selected_branch}' にはスタッフが存在しません。")
+
+
+# 3ヶ月推移で選択可能な指標（列名, 表示名）
+STAFF_TREND_METRICS = [
+    ("total_calls", "📞 架電数 (日報)"),
+    ("charge_connected", "🔗 担当コネクト数 (日報)"),
+    ("appointments", "🎯 アポ獲得数 (日報)"),
+    ("taaan_deals", "💼 TAAAN商談数 (TAAAN)"),
+    ("approved_deals", "✅ TAAAN承認数 (TAAAN)"),
+    ("total_revenue", "💰 TAAAN報酬額 (TAAAN)"),
+    ("calls_per_hour", "📞 1時間あたり架電数"),
+    ("appointments_per_hour", "🎯 1時間あたりアポ獲得数"),
+    ("deals_per_hour", "💼 1時間あたりTAAAN商談数"),
+    ("revenue_per_hour", "💰 1時間あたり報酬額"),
+    ("calls_per_working_day", "📞 1稼働日あたり架電数"),
+    ("appointments_per_working_day", "🎯 1稼働日あたりアポ獲得数"),
+    ("deals_per_working_day", "💼 1稼働日あたりTAAAN商談数"),
+    ("approved_per_working_day", "✅ 1稼働日あたり承認数"),
+    ("revenue_per_working_day", "💰 1稼働日あたり報酬額")
+]
+
+
+@timed(rows=lambda table: len(table['values']))
+def build_staff_trend_table(monthly_data, staff_filter=None):
+    """
+    3ヶ月推移の詳細データ用に、スタッフ×月×指標の表を作成
+    
+    指標の切り替え時は作成済みの表から指標の列を取り出すだけで済むよう、
+    全指標をまとめて1回で作成する。
+    
+    Args:
+        monthly_data: 月別スタッフ集計DataFrameの辞書
+        staff_filter: 対象スタッフ名のリスト（Noneの場合は全スタッフ）
+    
+    Returns:
+        dict:
+            branch: スタッフ名 -> 支部（最初に見つかった月の値）のSeries
+            values: スタッフ名を行、(指標, 月) を列とするDataFrame
+    """
+    frames = []
+    for month, month_df in monthly_data.items():
+        metric_cols = [key for key, _ in STAFF_TREND_METRICS if key in month_df.columns]
+        frames.append(month_df[['staff_name', 'branch'] + metric_cols].assign(month=month))
+    combined = pd.concat(frames, ignore_index=True)
+    if staff_filter:
+        combined = combined[combined['staff_name'].isin(staff_filter)]
+    # 同じ月に同じスタッフが複数行ある場合は最初の行を使う
+    combined = combined.drop_duplicates(['staff_name', 'month'])
+    
+    staff_names = sorted(combined['staff_name'].unique())
+    branch = combined.drop_duplicates('staff_name').set_index('staff_name')['branch'].reindex(staff_names)
+    metric_cols = [key for key, _ in STAFF_TREND_METRICS if key in combined.columns]
+    values = combined.set_index(['staff_name', 'month'])[metric_cols].unstack('month').reindex(staff_names)
+    return {'branch': branch.fillna('未設定'), 'values': values}
+
+
+def _format_trend_values(values, metric):
+    """詳細データ表示用に指標の値を書式化（データがない月は「-」）"""
+    if metric == 'total_revenue':
+        pattern = "¥{:,.0f}"
+    elif 'per_hour' in metric or 'per_working_day' in metric:
+        pattern = "{:.1f}"
+    else:
+        pattern = "{:.0f}"
+    return values.map(lambda value: "-" if pd.isna(value) else pattern.format(value))
+
+
+@st.fragment
+def render_staff_trend_section(monthly_data, json_data):
+    """
+    3ヶ月推移の指標選択・チャート・詳細データを表示
+    
+    指標ボタンや比較タイプの操作時はこのセクションのみ再実行される。
+    ブラウザ側切り替えを有効にすると、全指標を埋め込んだFigureを
+    （対象月・スタッフ条件ごとに1回だけ）作成し、指標の切り替えは再実行なしで行う。
+    
+    Args:
+        monthly_data: 月別スタッフ集計DataFrameの辞書
+        json_data: アップロードされたJSONデータ（派生データキャッシュ用）
+    """
+    
+    # 分析タイプ選択（ラジオボタンで改善）
+    st.markdown("### 📊 比較タイプ")
+    comparison_type = st.radio(
+        "比較タイプ",
+        ["🌐 全スタッフ比較", "🏢 支部内比較"],
+        horizontal=True,
+        key="trend_comparison_type",
+        label_visibility="collapsed"
+    )
+    
+    st.markdown("---")
+    
+    # 分析指標選択（カテゴリ別タブで改善）
+    st.markdown("### 📈 分析指標選択")
+    client_side_metrics = st.toggle(
+        "⚡ グラフ内で指標を切り替える（再実行なし）",
+        value=False,
+        key="trend_client_side_metrics",
+        help="全指標をグラフに埋め込み、グラフ左上のメニューからブラウザ上で切り替えます。スタッフ数が多い場合は初回表示が重くなります。"
+    )
+    
+    if not client_side_metrics:
+        metric_tab1, metric_tab2, metric_tab3 = st.tabs(["📊 実数指標", "⚡ 時間効率", "📅 日別効率"])
+        
+        # 実数指標
+        with metric_tab1:
+            metric_cols1 = st.columns(3)
+            with metric_cols1[0]:
+                if st.button("📞 架電数", use_container_width=True, key="btn_calls"):
+                    st.session_state.selected_metric_key = "total_calls"
+                    st.session_state.selected_metric_name = "📞 架電数 (日報)"
+                if st.button("💼 TAAAN商談数", use_container_width=True, key="btn_deals"):
+                    st.session_state.selected_metric_key = "taaan_deals"
+                    st.session_state.selected_metric_name = "💼 TAAAN商談数 (TAAAN)"
+            with metric_cols1[1]:
+                if st.button("🔗 担当コネクト数", use_container_width=True, key="btn_connects"):
+                    st.session_state.selected_metric_key = "charge_connected"
+                    st.session_state.selected_metric_name = "🔗 担当コネクト数 (日報)"
+                if st.button("✅ TAAAN承認数", use_container_width=True, key="btn_approved_1"):
+                    st.session_state.selected_metric_key = "approved_deals"
+                    st.session_state.selected_metric_name = "✅ TAAAN承認数 (TAAAN)"
+            with metric_cols1[2]:
+                if st.button("🎯 アポ獲得数", use_container_width=True, key="btn_appointments"):
+                    st.session_state.selected_metric_key = "appointments"
+                    st.session_state.selected_metric_name = "🎯 アポ獲得数 (日報)"
+                if st.button("💰 TAAAN報酬額", use_container_width=True, key="btn_revenue_1"):
+                    st.session_state.selected_metric_key = "total_revenue"
+                    st.session_state.selected_metric_name = "💰 TAAAN報酬額 (TAAAN)"
+        
+        # 時間効率指標
+        with metric_tab2:
+            metric_cols2 = st.columns(2)
+            with metric_cols2[0]:
+                if st.button("📞 1時間あたり架電数", use_container_width=True, key="btn_calls_hour"):
+                    st.session_state.selected_metric_key = "calls_per_hour"
+                    st.session_state.selected_metric_name = "📞 1時間あたり架電数"
+                if st.button("💼 1時間あたりTAAAN商談数", use_container_width=True, key="btn_deals_hour"):
+                    st.session_state.selected_metric_key = "deals_per_hour"
+                    st.session_state.selected_metric_name = "💼 1時間あたりTAAAN商談数"
+            with metric_cols2[1]:
+                if st.button("🎯 1時間あたりアポ獲得数", use_container_width=True, key="btn_appt_hour"):
+                    st.session_state.selected_metric_key = "appointments_per_hour"
+                    st.session_state.selected_metric_name = "🎯 1時間あたりアポ獲得数"
+                if st.button("💰 1時間あたり報酬額", use_container_width=True, key="btn_rev_hour"):
+                    st.session_state.selected_metric_key = "revenue_per_hour"
+                    st.session_state.selected_metric_name = "💰 1時間あたり報酬額"
+        
+        # 日別効率指標
+        with metric_tab3:
+            metric_cols3 = st.columns(3)
+            with metric_cols3[0]:
+                if st.button("📞 1稼働日あたり架電数", use_container_width=True, key="btn_calls_day"):
+                    st.session_state.selected_metric_key = "calls_per_working_day"
+                    st.session_state.selected_metric_name = "📞 1稼働日あたり架電数"
+                if st.button("✅ 1稼働日あたり承認数", use_container_width=True, key="btn_appr_day"):
+                    st.session_state.selected_metric_key = "approved_per_working_day"
+                    st.session_state.selected_metric_name = "✅ 1稼働日あたり承認数"
+            with metric_cols3[1]:
+                if st.button("🎯 1稼働日あたりアポ獲得数", use_container_width=True, key="btn_appt_day"):
+                    st.session_state.selected_metric_key = "appointments_per_working_day"
+                    st.session_state.selected_metric_name = "🎯 1稼働日あたりアポ獲得数"
+                if st.button("💰 1稼働日あたり報酬額", use_container_width=True, key="btn_rev_day"):
+                    st.session_state.selected_metric_key = "revenue_per_working_day"
+                    st.session_state.selected_metric_name = "💰 1稼働日あたり報酬額"
+            with metric_cols3[2]:
+                if st.button("💼 1稼働日あたりTAAAN商談数", use_container_width=True, key="btn_deals_day"):
+                    st.session_state.selected_metric_key = "deals_per_working_day"
+                    st.session_state.selected_metric_name = "💼 1稼働日あたりTAAAN商談数"
+        
+        # デフォルト選択
+        if 'selected_metric_key' not in st.session_state:
+            st.session_state.selected_metric_key = "appointments"
+            st.session_state.selected_metric_name = "🎯 アポ獲得数 (日報)"
+        
+        selected_metric = st.session_state.selected_metric_key
+        selected_metric_name = st.session_state.selected_metric_name
+        
+        # 現在選択中の指標を表示
+        st.info(f"📊 **現在選択中**: {selected_metric_name}")
+        
+        st.markdown("---")
+    else:
+        # 詳細データ・統計サマリー用の指標（グラフはグラフ内のメニューで切り替え）
+        metric_names = dict(STAFF_TREND_METRICS)
+        metric_keys = list(metric_names)
+        current_metric = st.session_state.get('selected_metric_key', 'appointments')
+        selected_metric = st.selectbox(
+            "📋 詳細データに表示する指標",
+            metric_keys,
+            index=metric_keys.index(current_metric) if current_metric in metric_keys else 0,
+            format_func=lambda key: metric_names[key],
+            key="trend_table_metric"
+        )
+        selected_metric_name = metric_names[selected_metric]
+        
+        st.markdown("---")
+    
+    # 支部内比較の場合は支部選択
+    staff_filter = None
+    if comparison_type == "🏢 支部内比較":
+        # 利用可能な支部を取得
+        all_branches = set()
+        for month_df in monthly_data.values():
+            all_branches.update(month_df['branch'].unique())
+        available_branches = sorted([b for b in all_branches if pd.notna(b) and b != ''])
+        
+        if available_branches:
+            selected_branch_trend = st.selectbox(
+                "🏢 分析対象支部",
+                available_branches,
+                key="trend_branch"
+            )
+            
+            # 選択支部のスタッフを取得
+            branch_staff = set()
+            for month_df in monthly_data.values():
+                branch_df = month_df[month_df['branch'] == selected_branch_trend]
+                branch_staff.update(branch_df['staff_name'].tolist())
+            staff_filter = list(branch_staff)
+            
+            st.info(f"📍 **{selected_branch_trend}支部** の {len(staff_filter)}名のスタッフを分析対象とします")
+        else:
+            st.warning("⚠️ 支部情報が見つかりません。")
+    else:
+        # 全スタッフ表示用の情報
+        total_staff = set()
+        for month_df in monthly_data.values():
+            total_staff.update(month_df['staff_name'].tolist())
+        st.info(f"🌐 **全スタッフ** {len(total_staff)}名を分析対象とします")
+    
+    # チャート表示
+    st.subheader("📊 推移チャート", help="**推移チャートの見方**:\n\n• **折れ線**: 各スタッフの3ヶ月間の指標の変化\n• **色分け**: スタッフごとに異なる色で表示\n• **凡例**: スタッフ名（支部名）を表示\n• **ホバー**: 線上にマウスを置くと、そのスタッフの詳細データを表示")
+    
+    if client_side_metrics:
+        # 全指標を埋め込んだFigureを対象月・スタッフ条件ごとに1回だけ作成
+        cache_key = (
+            'multi_metric_trend_chart',
+            tuple(sorted(monthly_data.keys())),
+            tuple(sorted(staff_filter)) if staff_filter else None
+        )
+        try:
+            chart = get_derived_cache(json_data).get_or_build(
+                cache_key,
+                lambda: create_multi_metric_trend_chart(
+                    monthly_data,
+                    STAFF_TREND_METRICS,
+                    staff_filter,
+                    default_metric=selected_metric
+                )
+            )
+            # キャッシュ済みのFigureは作成時の指標を表示しているため、選択中の指標に合わせる
+            select_multi_metric(chart, selected_metric)
+            st.caption("💡 グラフ左上のメニューで指標を切り替えられます（上段: 推移、下段: 月別分布）")
+            st.plotly_chart(chart, use_container_width=True)
+        except Exception as e:
+            st.error(f"❌ チャート生成エラー: {str(e)}")
+    else:
+        try:
+            chart = create_trend_chart(
+                monthly_data, 
+                selected_metric, 
+                selected_metric_name,
+                staff_filter, 
+                BRANCH_COLORS
+            )
+            st.plotly_chart(chart, use_container_width=True)
+            
+            # ヒストグラム表示
+            st.subheader("📊 月別分布", help="**ヒストグラムの見方**:\n\n• **横軸**: 指標の値の範囲\n• **縦軸**: 頻度（その値を持つスタッフの人数）\n• **n**: 各月のデータがあるスタッフの総数\n• **分布の比較**: 月ごとの色で、同じ指標の分布の変化を確認できます")
+            hist_chart = create_monthly_histogram(
+                monthly_data,
+                selected_metric,
+                selected_metric_name,
+                staff_filter
+            )
+            st.plotly_chart(hist_chart, use_container_width=True)
+        
+        except Exception as e:
+            st.error(f"❌ チャート生成エラー: {str(e)}")
+    
+    # 基本的なデータテーブル表示
+    st.subheader("📋 詳細データ")
+    
+    # スタッフ×月×指標の表を対象月・スタッフ条件ごとに1回だけ作成し、選択中の指標を取り出す
+    months = sorted(monthly_data.keys())
+    trend_table = get_derived_cache(json_data).get_or_build(
+        (
+            'staff_trend_table',
+            tuple(months),
+            tuple(sorted(staff_filter)) if staff_filter else None
+        ),
+        lambda: build_staff_trend_table(monthly_data, staff_filter)
+    )
+    values = trend_table['values']
+    if selected_metric in values.columns.get_level_values(0):
+        metric_values = values[selected_metric].reindex(columns=months).apply(pd.to_numeric, errors='coerce')
+    else:
+        metric_values = pd.DataFrame(np.nan, index=values.index, columns=months)
+    
+    if not metric_values.empty:
+        comparison_df = pd.DataFrame({'スタッフ名': metric_values.index, '支部': trend_table['branch'].to_numpy()})
+        for month in months:
+            comparison_df[month] = _format_trend_values(metric_values[month], selected_metric).to_numpy()
+        st.dataframe(comparison_df, use_container_width=True, height=400)
+        
+        # 統計情報
+        st.subheader("📊 統計サマリー")
+        
+        stats_cols = st.columns(len(months))
+        for i, month in enumerate(months):
+            with stats_cols[i]:
+                month_values = metric_values[month].dropna()
+                
+                if not month_values.empty:
+                    avg_val = month_values.mean()
+                    max_val = month_values.max()
+                    min_val = month_values.min()
+                    
+                    st.markdown(f"**{month}月**")
+                    if selected_metric == 'total_revenue':
+                        st.metric("平均", f"¥{avg_val:,.0f}")
+                        st.metric("最大", f"¥{max_val:,.0f}")
+                        st.metric("最小", f"¥{min_val:,.0f}")
+                    else:
+                        st.metric("平均", f"{avg_val:.1f}")
+                        st.metric("最大", f"{max_val:.1f}")
+                        st.metric("最小", f"{min_val:.1f}")
+                else:
+                    st.markdown(f"**{month}月**")
+                    st.info("データなし")
+
+
+def render_staff_analysis_tab(df_basic, basic_data, summary_data, selected_month, json_data):
+    """スタッフ別分析タブをレンダリング"""
+    st.subheader("スタッフ別分析")
+    
+    # 共通のスタッフ別集計処理（月単位で再利用）
+    cache = get_derived_cache(json_data)
+    staff_summary, taaan_staff_data = cache.get_or_build(
+        ('staff_summary', selected_month),
+        lambda: build_staff_summary(df_basic, basic_data, summary_data, selected_month)
+    )
+    
     # 全体TAAANデータの状況を確認
     total_staff_count = len(staff_summary)
     total_taaan_deals_all = staff_summary['taaan_deals'].sum()
@@ -1223,11 +1944,14 @@ def render_staff_analysis_tab(df_basic, basic_data, summary_data, selected_month
     summary_staff_count = len(summary_data.get('staff_performance', {})) if 'staff_performance' in summary_data else 0
     
     # スタッフ別分析のサブタブ
-    staff_subtab1, staff_subtab2, staff_subtab3, staff_subtab4 = st.tabs([
-        "📊 全体実数ランキング", "🏢 支部内実数ランキング", "⚡ 効率性ランキング", "📈 月別推移(3ヶ月)"
-    ])
+    active_staff_subtab = lazy_tab_selector([
+        ("overall", "📊 全体実数ランキング"),
+        ("branch", "🏢 支部内実数ランキング"),
+        ("efficiency", "⚡ 効率性ランキング"),
+        ("trend", "📈 月別推移(3ヶ月)")
+    ], key="staff_subtab")
     
-    with staff_subtab1:
+    if active_staff_subtab == "overall":
         st.subheader("📊 全体実数ランキング")
         st.write("全スタッフの実数（絶対値）でのランキングです。")
         
@@ -1317,154 +2041,16 @@ def render_staff_analysis_tab(df_basic, basic_data, summary_data, selected_month
             else:
                 st.info("売上データがありません")
     
-    with staff_subtab2:
+    if active_staff_subtab == "branch":
         st.subheader("🏢 支部内実数ランキング")
         st.write("支部内でのスタッフランキングです。")
         
-        # 支部選択（ボタン形式）
-        available_branches = sorted(staff_summary['branch'].unique())
-        st.write("**📍 分析対象支部を選択**")
-        
-        # 支部ボタンを動的に配置
-        if len(available_branches) <= 6:
-            # 6個以下の場合は横一列に配置
-            cols = st.columns(len(available_branches))
-            for i, branch in enumerate(available_branches):
-                with cols[i]:
-                    if st.button(f"{branch}", use_container_width=True, key=f"branch_btn_{branch}"):
-                        st.session_state.selected_branch_ranking = branch
-        else:
-            # 7個以上の場合は2行に分けて配置
-            mid_point = (len(available_branches) + 1) // 2
-            first_row = available_branches[:mid_point]
-            second_row = available_branches[mid_point:]
-            
-            # 1行目
-            cols1 = st.columns(len(first_row))
-            for i, branch in enumerate(first_row):
-                with cols1[i]:
-                    if st.button(f"{branch}", use_container_width=True, key=f"branch_btn_{branch}"):
-                        st.session_state.selected_branch_ranking = branch
-            
-            # 2行目
-            cols2 = st.columns(len(second_row))
-            for i, branch in enumerate(second_row):
-                with cols2[i]:
-                    if st.button(f"{branch}", use_container_width=True, key=f"branch_btn_{branch}"):
-                        st.session_state.selected_branch_ranking = branch
-        
-        # デフォルトの選択支部を設定
-        if 'selected_branch_ranking' not in st.session_state:
-            st.session_state.selected_branch_ranking = available_branches[0]
-        
-        selected_branch = st.session_state.selected_branch_ranking
-        
-        # 選択された支部のスタッフをフィルタリング
-        branch_staff = staff_summary[staff_summary['branch'] == selected_branch]
-        
-        if not branch_staff.empty:
-            
-            # デバッグ情報を表示
-            total_taaan_deals = branch_staff['taaan_deals'].sum()
-            if total_taaan_deals == 0:
-                st.warning("⚠️ この支部のTAAAN商談数が0件です。基本分析データにTAAAN商談情報が含まれているか確認してください。")
-            
-            # 6つのランキングを2列×3行で表示
-            col1, col2 = st.columns(2)
-            
-            with col1:
-                # 1. 架電数ランキング（支部内）
-                st.markdown("##### 🏆 架電数ランキング (日報)")
-                display_ranking_with_ties(
-                    branch_staff, 
-                    'total_calls', 
-                    ['total_calls'], 
-                    max_rank=5, 
-                    show_branch=False
-                )
-                
-                st.markdown("---")
-                
-                # 2. 担当コネクト数ランキング（支部内）
-                st.markdown("##### 📞 担当コネクト数ランキング (日報)")
-                display_ranking_with_ties(
-                    branch_staff, 
-                    'charge_connected', 
-                    ['charge_connected'], 
-                    max_rank=5, 
-                    show_branch=False
-                )
-                
-                st.markdown("---")
-                
-                # 3. アポ獲得数ランキング（支部内）
-                st.markdown("##### 🎯 アポ獲得数ランキング (日報)")
-                display_ranking_with_ties(
-                    branch_staff, 
-                    'appointments', 
-                    ['appointments'], 
-                    max_rank=5, 
-                    show_branch=False
-                )
-            
-            with col2:
-                # 4. TAAAN商談数ランキング（支部内）
-                st.markdown("##### 💼 TAAAN商談数ランキング (TAAAN)")
-                display_ranking_with_ties(
-                    branch_staff, 
-                    'taaan_deals', 
-                    ['taaan_deals'], 
-                    max_rank=5, 
-                    show_branch=False
-                )
-                
-                st.markdown("---")
-                
-                # 5. TAAAN承認数ランキング（支部内）
-                st.markdown("##### ✅ TAAAN承認数ランキング (TAAAN)")
-                display_ranking_with_ties(
-                    branch_staff, 
-                    'approved_deals', 
-                    ['approved_deals'], 
-                    max_rank=5, 
-                    show_branch=False
-                )
-                
-                st.markdown("---")
-                
-                # 6. TAAAN報酬額ランキング（支部内）
-                st.markdown("##### 💰 TAAAN報酬額ランキング (TAAAN)")
-                display_ranking_with_ties(
-                    branch_staff, 
-                    'total_revenue', 
-                    ['total_revenue'], 
-                    max_rank=5, 
-                    show_branch=False
-                )
-        else:
-            st.warning(f"選択された支部 '{selected_branch}' にはスタッフが存在しません。")
+        render_branch_staff_ranking(staff_summary)
     
-    with staff_subtab3:
+    if active_staff_subtab == "efficiency":
         st.subheader("⚡ 効率性ランキング")
         st.write("時間当たりや稼働日当たりの効率性指標でのランキングです。")
         
-        # 稼働日数を計算する関数
-        def calculate_working_days(staff_name, basic_data):
-            """スタッフの稼働日数を計算"""
-            try:
-                staff_data = basic_data[basic_data['staff_name'] == staff_name]
-                call_col = 'call_count' if 'call_count' in basic_data.columns else 'total_calls'
-                # 架電数>0の日をカウント
-                working_days = len(staff_data[staff_data[call_col] > 0]['date'].unique())
-                return working_days
-            except:
-                return 0
-        
-        # 稼働日数を各スタッフについて計算
-        staff_summary['working_days'] = staff_summary['staff_name'].apply(
-            lambda x: calculate_working_days(x, df_basic)
-        )
-        
         # 稼働日数データの可用性をチェック
         working_days_available = staff_summary['working_days'].sum() > 0
         
@@ -1487,288 +2073,191 @@ def render_staff_analysis_tab(df_basic, basic_data, summary_data, selected_month
                 # コネクト率ランキング
                 st.markdown("##### 📞 コネクト率ランキング", help="**コネクト率の定義**: 担当コネクト数 ÷ 架電数 × 100（%）\n\n架電のうち、どの程度の割合で担当者とつながることができたかを示す指標です。")
                 # 最低架電数のフィルター
-                min_calls_for_rate = st.slider("最低架電数", 1, 100, 20, key="connect_rate_filter")
-                connect_rate_filtered = staff_summary[staff_summary['total_calls'] >= min_calls_for_rate]
-                if not connect_rate_filtered.empty:
-                    display_ranking_with_ties(
-                        connect_rate_filtered, 
-                        'connect_rate', 
-                        ['connect_rate'], 
-                        max_rank=10, 
-                        branch_colors=BRANCH_COLORS,
-                        format_as_percent=True
-                    )
-                else:
-                    st.info("条件に該当するデータがありません")
+                display_filtered_ranking(
+                    staff_summary, 
+                    'total_calls', 
+                    "最低架電数", 1, 100, 20, 
+                    'connect_rate_filter', 
+                    'connect_rate', 
+                    ['connect_rate'], 
+                    branch_colors=BRANCH_COLORS,
+                    format_as_percent=True
+                )
                 
                 st.markdown("---")
                 
                 # 承認率ランキング
                 st.markdown("##### ✅ 承認率ランキング", help="**承認率の定義**: 承認数 ÷ TAAAN商談数 × 100（%）\n\nTAAANに入力した商談のうち、どの程度の割合で承認されたかを示す指標です。")
-                min_deals_for_approval = st.slider("最低商談数", 1, 20, 3, key="approval_rate_filter")
-                approval_rate_filtered = staff_summary[
-                    (staff_summary['taaan_deals'] >= min_deals_for_approval) & 
-                    (staff_summary['taaan_deals'] > 0)
-                ]
-                if not approval_rate_filtered.empty:
-                    display_ranking_with_ties(
-                        approval_rate_filtered, 
-                        'approval_rate', 
-                        ['approval_rate'], 
-                        max_rank=10, 
-                        branch_colors=BRANCH_COLORS,
-                        format_as_percent=True
-                    )
-                else:
-                    st.info("条件に該当するデータがありません")
+                display_filtered_ranking(
+                    staff_summary, 
+                    'taaan_deals', 
+                    "最低商談数", 1, 20, 3, 
+                    'approval_rate_filter', 
+                    'approval_rate', 
+                    ['approval_rate'], 
+                    branch_colors=BRANCH_COLORS,
+                    format_as_percent=True
+                )
             
             with col2:
                 # アポ率ランキング
                 st.markdown("##### 🎯 アポ率ランキング", help="**アポ率の定義**: アポ獲得数 ÷ 担当コネクト数 × 100（%）\n\n担当者とつながった通話のうち、どの程度の割合でアポを獲得できたかを示す指標です。")
-                min_connects_for_appt = st.slider("最低コネクト数", 1, 50, 10, key="appt_rate_filter")
-                appt_rate_filtered = staff_summary[staff_summary['charge_connected'] >= min_connects_for_appt]
-                if not appt_rate_filtered.empty:
-                    display_ranking_with_ties(
-                        appt_rate_filtered, 
-                        'appointment_rate', 
-                        ['appointment_rate'], 
-                        max_rank=10, 
-                        branch_colors=BRANCH_COLORS,
-                        format_as_percent=True
-                    )
-                else:
-                    st.info("条件に該当するデータがありません")
+                display_filtered_ranking(
+                    staff_summary, 
+                    'charge_connected', 
+                    "最低コネクト数", 1, 50, 10, 
+                    'appt_rate_filter', 
+                    'appointment_rate', 
+                    ['appointment_rate'], 
+                    branch_colors=BRANCH_COLORS,
+                    format_as_percent=True
+                )
         
         with eff_tab2:
             if hours_available:
-                # 架電時間データから時間当たり効率を計算
-                call_col = 'call_count' if 'call_count' in df_basic.columns else 'total_calls'
-                appointment_col = 'get_appointment' if 'get_appointment' in df_basic.columns else 'appointments'
-                
-                staff_hours_summary = df_basic.groupby('staff_name').agg({
-                    call_col: 'sum',
-                    'call_hours': 'sum',
-                    appointment_col: 'sum',
-                    'branch': 'first'
-                }).reset_index()
-                
-                staff_hours_summary.columns = ['staff_name', 'total_calls', 'total_hours', 'appointments', 'branch']
-                
-                # 時間当たり効率の計算
-                staff_hours_summary['calls_per_hour'] = (
-                    staff_hours_summary['total_calls'] / staff_hours_summary['total_hours']
-                ).fillna(0).round(1)
-                
-                staff_hours_summary['appointments_per_hour'] = (
-                    staff_hours_summary['appointments'] / staff_hours_summary['total_hours']
-                ).fillna(0).round(1)
-                
-                # TAAANデータを結合
-                staff_hours_summary['taaan_deals'] = staff_hours_summary['staff_name'].map(
-                    lambda x: taaan_staff_data.get(x, {}).get('taaan_deals', 0)
-                )
-                staff_hours_summary['approved_deals'] = staff_hours_summary['staff_name'].map(
-                    lambda x: taaan_staff_data.get(x, {}).get('approved_deals', 0)
-                )
-                staff_hours_summary['total_revenue'] = staff_hours_summary['staff_name'].map(
-                    lambda x: taaan_staff_data.get(x, {}).get('total_revenue', 0)
+                staff_hours_summary = cache.get_or_build(
+                    ('staff_hours_summary', selected_month),
+                    lambda: build_staff_hours_summary(df_basic, taaan_staff_data)
                 )
                 
-                staff_hours_summary['deals_per_hour'] = (
-                    staff_hours_summary['taaan_deals'] / staff_hours_summary['total_hours']
-                ).fillna(0).round(1)
-                
-                staff_hours_summary['revenue_per_hour'] = (
-                    staff_hours_summary['total_revenue'] / staff_hours_summary['total_hours']
-                ).fillna(0).round(0)
-                
                 # 効率性ランキング表示
                 col1, col2 = st.columns(2)
                 
                 with col1:
                     # 1時間あたり架電数ランキング
                     st.markdown("##### 📞 1時間あたり架電数ランキング")
-                    min_hours_calls = st.slider("最低架電時間（時間）", 1, 50, 10, key="calls_hour_filter")
-                    calls_hour_filtered = staff_hours_summary[staff_hours_summary['total_hours'] >= min_hours_calls]
-                    if not calls_hour_filtered.empty:
-                        display_ranking_with_ties(
-                            calls_hour_filtered, 
-                            'calls_per_hour', 
-                            ['calls_per_hour', 'total_hours'], 
-                            max_rank=10, 
-                            branch_colors=BRANCH_COLORS
-                        )
-                    else:
-                        st.info("条件に該当するデータがありません")
+                    display_filtered_ranking(
+                        staff_hours_summary, 
+                        'total_hours', 
+                        "最低架電時間（時間）", 1, 50, 10, 
+                        'calls_hour_filter', 
+                        'calls_per_hour', 
+                        ['calls_per_hour', 'total_hours'], 
+                        branch_colors=BRANCH_COLORS
+                    )
                     
                     st.markdown("---")
                     
                     # 1時間あたりアポ獲得数ランキング
                     st.markdown("##### 🎯 1時間あたりアポ獲得数ランキング")
-                    min_hours_appt = st.slider("最低架電時間（時間）", 1, 50, 10, key="appt_hour_filter")
-                    appt_hour_filtered = staff_hours_summary[staff_hours_summary['total_hours'] >= min_hours_appt]
-                    if not appt_hour_filtered.empty:
-                        display_ranking_with_ties(
-                            appt_hour_filtered, 
-                            'appointments_per_hour', 
-                            ['appointments_per_hour', 'appointments'], 
-                            max_rank=10, 
-                            branch_colors=BRANCH_COLORS
-                        )
-                    else:
-                        st.info("条件に該当するデータがありません")
+                    display_filtered_ranking(
+                        staff_hours_summary, 
+                        'total_hours', 
+                        "最低架電時間（時間）", 1, 50, 10, 
+                        'appt_hour_filter', 
+                        'appointments_per_hour', 
+                        ['appointments_per_hour', 'appointments'], 
+                        branch_colors=BRANCH_COLORS
+                    )
                 
                 with col2:
                     # 1時間あたりTAAAN商談数ランキング
                     st.markdown("##### 💼 1時間あたりTAAAN商談数ランキング")
-                    min_hours_deals = st.slider("最低架電時間（時間）", 1, 50, 10, key="deals_hour_filter")
-                    deals_hour_filtered = staff_hours_summary[staff_hours_summary['total_hours'] >= min_hours_deals]
-                    if not deals_hour_filtered.empty:
-                        display_ranking_with_ties(
-                            deals_hour_filtered, 
-                            'deals_per_hour', 
-                            ['deals_per_hour', 'taaan_deals'], 
-                            max_rank=10, 
-                            branch_colors=BRANCH_COLORS
-                        )
-                    else:
-                        st.info("条件に該当するデータがありません")
+                    display_filtered_ranking(
+                        staff_hours_summary, 
+                        'total_hours', 
+                        "最低架電時間（時間）", 1, 50, 10, 
+                        'deals_hour_filter', 
+                        'deals_per_hour', 
+                        ['deals_per_hour', 'taaan_deals'], 
+                        branch_colors=BRANCH_COLORS
+                    )
                     
                     st.markdown("---")
                     
                     # 1時間あたり報酬額ランキング
                     st.markdown("##### 💰 1時間あたり報酬額ランキング")
-                    min_hours_revenue = st.slider("最低架電時間（時間）", 1, 50, 10, key="revenue_hour_filter")
-                    revenue_hour_filtered = staff_hours_summary[staff_hours_summary['total_hours'] >= min_hours_revenue]
-                    if not revenue_hour_filtered.empty:
-                        display_ranking_with_ties(
-                            revenue_hour_filtered, 
-                            'revenue_per_hour', 
-                            ['revenue_per_hour', 'total_revenue'], 
-                            max_rank=10, 
-                            branch_colors=BRANCH_COLORS
-                        )
-                    else:
-                        st.info("条件に該当するデータがありません")
+                    display_filtered_ranking(
+                        staff_hours_summary, 
+                        'total_hours', 
+                        "最低架電時間（時間）", 1, 50, 10, 
+                        'revenue_hour_filter', 
+                        'revenue_per_hour', 
+                        ['revenue_per_hour', 'total_revenue'], 
+                        branch_colors=BRANCH_COLORS
+                    )
             else:
                 st.warning("⚠️ 架電時間データが利用できないため、時間当たり効率性ランキングを表示できません。")
                 st.info("💡 GASのJSON生成時に架電時間データが含まれているか確認してください。")
         
         with eff_tab3:
             if working_days_available:
-                
-                # 稼働日当たり効率の計算
-                staff_summary['calls_per_working_day'] = (
-                    staff_summary['total_calls'] / staff_summary['working_days']
-                ).fillna(0).round(1)
-                
-                staff_summary['appointments_per_working_day'] = (
-                    staff_summary['appointments'] / staff_summary['working_days']
-                ).fillna(0).round(1)
-                
-                staff_summary['deals_per_working_day'] = (
-                    staff_summary['taaan_deals'] / staff_summary['working_days']
-                ).fillna(0).round(1)
-                
-                staff_summary['approved_per_working_day'] = (
-                    staff_summary['approved_deals'] / staff_summary['working_days']
-                ).fillna(0).round(1)
-                
-                staff_summary['revenue_per_working_day'] = (
-                    staff_summary['total_revenue'] / staff_summary['working_days']
-                ).fillna(0).round(0)
-                
                 # 稼働日当たり効率性ランキング表示
                 col1, col2 = st.columns(2)
                 
                 with col1:
                     # 1稼働日あたり架電数ランキング
                     st.markdown("##### 📞 1稼働日あたり架電数ランキング")
-                    min_working_days_calls = st.slider("最低稼働日数", 1, 30, 5, key="calls_day_filter")
-                    calls_day_filtered = staff_summary[staff_summary['working_days'] >= min_working_days_calls]
-                    if not calls_day_filtered.empty:
-                        display_ranking_with_ties(
-                            calls_day_filtered, 
-                            'calls_per_working_day', 
-                            ['calls_per_working_day', 'working_days'], 
-                            max_rank=10, 
-                            branch_colors=BRANCH_COLORS
-                        )
-                    else:
-                        st.info("条件に該当するデータがありません")
+                    display_filtered_ranking(
+                        staff_summary, 
+                        'working_days', 
+                        "最低稼働日数", 1, 30, 5, 
+                        'calls_day_filter', 
+                        'calls_per_working_day', 
+                        ['calls_per_working_day', 'working_days'], 
+                        branch_colors=BRANCH_COLORS
+                    )
                     
                     st.markdown("---")
                     
                     # 1稼働日あたりアポ獲得数ランキング
                     st.markdown("##### 🎯 1稼働日あたりアポ獲得数ランキング")
-                    min_working_days_appt = st.slider("最低稼働日数", 1, 30, 5, key="appt_day_filter")
-                    appt_day_filtered = staff_summary[staff_summary['working_days'] >= min_working_days_appt]
-                    if not appt_day_filtered.empty:
-                        display_ranking_with_ties(
-                            appt_day_filtered, 
-                            'appointments_per_working_day', 
-                            ['appointments_per_working_day', 'appointments'], 
-                            max_rank=10, 
-                            branch_colors=BRANCH_COLORS
-                        )
-                    else:
-                        st.info("条件に該当するデータがありません")
+                    display_filtered_ranking(
+                        staff_summary, 
+                        'working_days', 
+                        "最低稼働日数", 1, 30, 5, 
+                        'appt_day_filter', 
+                        'appointments_per_working_day', 
+                        ['appointments_per_working_day', 'appointments'], 
+                        branch_colors=BRANCH_COLORS
+                    )
                     
                     st.markdown("---")
                     
                     # 1稼働日あたりTAAAN商談数ランキング
                     st.markdown("##### 💼 1稼働日あたりTAAAN商談数ランキング")
-                    min_working_days_deals = st.slider("最低稼働日数", 1, 30, 5, key="deals_day_filter")
-                    deals_day_filtered = staff_summary[staff_summary['working_days'] >= min_working_days_deals]
-                    if not deals_day_filtered.empty:
-                        display_ranking_with_ties(
-                            deals_day_filtered, 
-                            'deals_per_working_day', 
-                            ['deals_per_working_day', 'taaan_deals'], 
-                            max_rank=10, 
-                            branch_colors=BRANCH_COLORS
-                        )
-                    else:
-                        st.info("条件に該当するデータがありません")
+                    display_filtered_ranking(
+                        staff_summary, 
+                        'working_days', 
+                        "最低稼働日数", 1, 30, 5, 
+                        'deals_day_filter', 
+                        'deals_per_working_day', 
+                        ['deals_per_working_day', 'taaan_deals'], 
+                        branch_colors=BRANCH_COLORS
+                    )
                 
                 with col2:
                     # 1稼働日あたり承認数ランキング
                     st.markdown("##### ✅ 1稼働日あたり承認数ランキング")
-                    min_working_days_approved = st.slider("最低稼働日数", 1, 30, 5, key="approved_day_filter")
-                    approved_day_filtered = staff_summary[staff_summary['working_days'] >= min_working_days_approved]
-                    if not approved_day_filtered.empty:
-                        display_ranking_with_ties(
-                            approved_day_filtered, 
-                            'approved_per_working_day', 
-                            ['approved_per_working_day', 'approved_deals'], 
-                            max_rank=10, 
-                            branch_colors=BRANCH_COLORS
-                        )
-                    else:
-                        st.info("条件に該当するデータがありません")
+                    display_filtered_ranking(
+                        staff_summary, 
+                        'working_days', 
+                        "最低稼働日数", 1, 30, 5, 
+                        'approved_day_filter', 
+                        'approved_per_working_day', 
+                        ['approved_per_working_day', 'approved_deals'], 
+                        branch_colors=BRANCH_COLORS
+                    )
                     
                     st.markdown("---")
                     
                     # 1稼働日あたり報酬額ランキング
                     st.markdown("##### 💰 1稼働日あたり報酬額ランキング")
-                    min_working_days_revenue = st.slider("最低稼働日数", 1, 30, 5, key="revenue_day_filter")
-                    revenue_day_filtered = staff_summary[staff_summary['working_days'] >= min_working_days_revenue]
-                    if not revenue_day_filtered.empty:
-                        display_ranking_with_ties(
-                            revenue_day_filtered, 
-                            'revenue_per_working_day', 
-                            ['revenue_per_working_day', 'total_revenue'], 
-                            max_rank=10, 
-                            branch_colors=BRANCH_COLORS
-                        )
-                    else:
-                        st.info("条件に該当するデータがありません")
+                    display_filtered_ranking(
+                        staff_summary, 
+                        'working_days', 
+                        "最低稼働日数", 1, 30, 5, 
+                        'revenue_day_filter', 
+                        'revenue_per_working_day', 
+                        ['revenue_per_working_day', 'total_revenue'], 
+                        branch_colors=BRANCH_COLORS
+                    )
             else:
                 st.warning("⚠️ 稼働日数データが利用できないため、稼働日当たり効率性ランキングを表示できません。")
                 st.info("💡 **理由**: 日別の架電データまたは`daily_activity`データが不足している可能性があります。")
                 st.info("🔧 **解決方法**: GASのJSON生成時に、スタッフの日別活動データ（`daily_activity`）が正しく含まれているか確認してください。")
     
-    with staff_subtab4:
+    if active_staff_subtab == "trend":
         st.subheader("📈 月別推移(3ヶ月)")
         
         # 過去3ヶ月のデータを取得
@@ -1776,7 +2265,10 @@ def render_staff_analysis_tab(df_basic, basic_data, summary_data, selected_month
         
         # 月別データを読み込み
         with st.spinner("📊 過去3ヶ月のデータを読み込み中..."):
-            monthly_data = load_multi_month_data(json_data, target_months)
+            monthly_data = get_derived_cache(json_data).get_or_build(
+                ('multi_month_data', tuple(target_months)),
+                lambda: load_multi_month_data(json_data, target_months)
+            )
         
         if not monthly_data:
             st.warning("⚠️ 3ヶ月推移に必要なデータが不足しています。")
@@ -1784,287 +2276,310 @@ def render_staff_analysis_tab(df_basic, basic_data, summary_data, selected_month
         else:
             st.success(f"✅ 対象月: {', '.join(sorted(monthly_data.keys()))}")
             
-            # 分析タイプ選択（ラジオボタンで改善）
-            st.markdown("### 📊 比較タイプ")
-            comparison_type = st.radio(
-                "比較タイプ",
-                ["🌐 全スタッフ比較", "🏢 支部内比較"],
-                horizontal=True,
-                key="trend_comparison_type",
-                label_visibility="collapsed"
-            )
-            
-            st.markdown("---")
-            
-            # 分析指標選択（カテゴリ別タブで改善）
-            st.markdown("### 📈 分析指標選択")
-            
-            metric_tab1, metric_tab2, metric_tab3 = st.tabs(["📊 実数指標", "⚡ 時間効率", "📅 日別効率"])
-            
-            # 実数指標
-            with metric_tab1:
-                metric_cols1 = st.columns(3)
-                with metric_cols1[0]:
-                    if st.button("📞 架電数", use_container_width=True, key="btn_calls"):
-                        st.session_state.selected_metric_key = "total_calls"
-                        st.session_state.selected_metric_name = "📞 架電数 (日報)"
-                    if st.button("💼 TAAAN商談数", use_container_width=True, key="btn_deals"):
-                        st.session_state.selected_metric_key = "taaan_deals"
-                        st.session_state.selected_metric_name = "💼 TAAAN商談数 (TAAAN)"
-                with metric_cols1[1]:
-                    if st.button("🔗 担当コネクト数", use_container_width=True, key="btn_connects"):
-                        st.session_state.selected_metric_key = "charge_connected"
-                        st.session_state.selected_metric_name = "🔗 担当コネクト数 (日報)"
-                    if st.button("✅ TAAAN承認数", use_container_width=True, key="btn_approved_1"):
-                        st.session_state.selected_metric_key = "approved_deals"
-                        st.session_state.selected_metric_name = "✅ TAAAN承認数 (TAAAN)"
-                with metric_cols1[2]:
-                    if st.button("🎯 アポ獲得数", use_container_width=True, key="btn_appointments"):
-                        st.session_state.selected_metric_key = "appointments"
-                        st.session_state.selected_metric_name = "🎯 アポ獲得数 (日報)"
-                    if st.button("💰 TAAAN報酬額", use_container_width=True, key="btn_revenue_1"):
-                        st.session_state.selected_metric_key = "total_revenue"
-                        st.session_state.selected_metric_name = "💰 TAAAN報酬額 (TAAAN)"
-            
-            # 時間効率指標
-            with metric_tab2:
-                metric_cols2 = st.columns(2)
-                with metric_cols2[0]:
-                    if st.button("📞 1時間あたり架電数", use_container_width=True, key="btn_calls_hour"):
-                        st.session_state.selected_metric_key = "calls_per_hour"
-                        st.session_state.selected_metric_name = "📞 1時間あたり架電数"
-                    if st.button("💼 1時間あたりTAAAN商談数", use_container_width=True, key="btn_deals_hour"):
-                        st.session_state.selected_metric_key = "deals_per_hour"
-                        st.session_state.selected_metric_name = "💼 1時間あたりTAAAN商談数"
-                with metric_cols2[1]:
-                    if st.button("🎯 1時間あたりアポ獲得数", use_container_width=True, key="btn_appt_hour"):
-                        st.session_state.selected_metric_key = "appointments_per_hour"
-                        st.session_state.selected_metric_name = "🎯 1時間あたりアポ獲得数"
-                    if st.button("💰 1時間あたり報酬額", use_container_width=True, key="btn_rev_hour"):
-                        st.session_state.selected_metric_key = "revenue_per_hour"
-                        st.session_state.selected_metric_name = "💰 1時間あたり報酬額"
-            
-            # 日別効率指標
-            with metric_tab3:
-                metric_cols3 = st.columns(3)
-                with metric_cols3[0]:
-                    if st.button("📞 1稼働日あたり架電数", use_container_width=True, key="btn_calls_day"):
-                        st.session_state.selected_metric_key = "calls_per_working_day"
-                        st.session_state.selected_metric_name = "📞 1稼働日あたり架電数"
-                    if st.button("✅ 1稼働日あたり承認数", use_container_width=True, key="btn_appr_day"):
-                        st.session_state.selected_metric_key = "approved_per_working_day"
-                        st.session_state.selected_metric_name = "✅ 1稼働日あたり承認数"
-                with metric_cols3[1]:
-                    if st.button("🎯 1稼働日あたりアポ獲得数", use_container_width=True, key="btn_appt_day"):
-                        st.session_state.selected_metric_key = "appointments_per_working_day"
-                        st.session_state.selected_metric_name = "🎯 1稼働日あたりアポ獲得数"
-                    if st.button("💰 1稼働日あたり報酬額", use_container_width=True, key="btn_rev_day"):
-                        st.session_state.selected_metric_key = "revenue_per_working_day"
-                        st.session_state.selected_metric_name = "💰 1稼働日あたり報酬額"
-                with metric_cols3[2]:
-                    if st.button("💼 1稼働日あたりTAAAN商談数", use_container_width=True, key="btn_deals_day"):
-                        st.session_state.selected_metric_key = "deals_per_working_day"
-                        st.session_state.selected_metric_name = "💼 1稼働日あたりTAAAN商談数"
-            
-            # デフォルト選択
-            if 'selected_metric_key' not in st.session_state:
-                st.session_state.selected_metric_key = "appointments"
-                st.session_state.selected_metric_name = "🎯 アポ獲得数 (日報)"
-            
-            selected_metric = st.session_state.selected_metric_key
-            selected_metric_name = st.session_state.selected_metric_name
-            
-            # 現在選択中の指標を表示
-            st.info(f"📊 **現在選択中**: {selected_metric_name}")
-            
-            st.markdown("---")
-            
-            # 支部内比較の場合は支部選択
-            staff_filter = None
-            if comparison_type == "🏢 支部内比較":
-                # 利用可能な支部を取得
-                all_branches = set()
-                for month_df in monthly_data.values():
-                    all_branches.update(month_df['branch'].unique())
-                available_branches = sorted([b for b in all_branches if pd.notna(b) and b != ''])
-                
-                if available_branches:
-                    selected_branch_trend = st.selectbox(
-                        "🏢 分析対象支部",
-                        available_branches,
-                        key="trend_branch"
-                    )
-                    
-                    # 選択支部のスタッフを取得
-                    branch_staff = set()
-                    for month_df in monthly_data.values():
-                        branch_df = month_df[month_df['branch'] == selected_branch_trend]
-                        branch_staff.update(branch_df['staff_name'].tolist())
-                    staff_filter = list(branch_staff)
-                    
-                    st.info(f"📍 **{selected_branch_trend}支部** の {len(staff_filter)}名のスタッフを分析対象とします")
-                else:
-                    st.warning("⚠️ 支部情報が見つかりません。")
-            else:
-                # 全スタッフ表示用の情報
-                total_staff = set()
-                for month_df in monthly_data.values():
-                    total_staff.update(month_df['staff_name'].tolist())
-                st.info(f"🌐 **全スタッフ** {len(total_staff)}名を分析対象とします")
-            
-            # チャート表示
-            st.subheader("📊 推移チャート", help="**推移チャートの見方**:\n\n• **折れ線**: 各スタッフの3ヶ月間の指標の変化\n• **色分け**: スタッフごとに異なる色で表示\n• **凡例**: スタッフ名（支部名）を表示\n• **ホバー**: 線上にマウスを置くと、そのスタッフの詳細データを表示")
-            
-            try:
-                chart = create_trend_chart(
-                    monthly_data, 
-                    selected_metric, 
-                    selected_metric_name,
-                    staff_filter, 
-                    BRANCH_COLORS
-                )
-                st.plotly_chart(chart, use_container_width=True)
-                
-                # ヒストグラム表示
-                st.subheader("📊 月別分布", help="**ヒストグラムの見方**:\n\n• **横軸**: 指標の値の範囲\n• **縦軸**: 頻度（その値を持つスタッフの人数）\n• **n**: 各月のデータがあるスタッフの総数\n• **分布の比較**: 月ごとの色で、同じ指標の分布の変化を確認できます")
-                hist_chart = create_monthly_histogram(
-                    monthly_data,
-                    selected_metric,
-                    selected_metric_name,
-                    staff_filter
-                )
-                st.plotly_chart(hist_chart, use_container_width=True)
-                
-            except Exception as e:
-                st.error(f"❌ チャート生成エラー: {str(e)}")
-            
-            # 基本的なデータテーブル表示
-            st.subheader("📋 詳細データ")
-            
-            # 月別比較テーブル作成
-            comparison_data = []
-            months = sorted(monthly_data.keys())
-            
-            # 全スタッフのデータを取得
-            all_staff = set()
-            for month_df in monthly_data.values():
-                if staff_filter:
-                    month_df = month_df[month_df['staff_name'].isin(staff_filter)]
-                all_staff.update(month_df['staff_name'].tolist())
-            
-            for staff_name in sorted(all_staff):
-                row_data = {'スタッフ名': staff_name}
-                
-                # 支部情報を取得
-                staff_branch = '未設定'
-                for month_df in monthly_data.values():
-                    staff_row = month_df[month_df['staff_name'] == staff_name]
-                    if not staff_row.empty:
-                        staff_branch = staff_row.iloc[0]['branch']
-                        break
-                row_data['支部'] = staff_branch
-                
-                # 各月のデータを追加
-                for month in months:
-                    if month in monthly_data:
-                        month_df = monthly_data[month]
-                        staff_row = month_df[month_df['staff_name'] == staff_name]
-                        if not staff_row.empty and selected_metric in staff_row.columns:
-                            value = staff_row.iloc[0][selected_metric]
-                            # フォーマット
-                            if selected_metric == 'total_revenue':
-                                formatted_value = f"¥{value:,.0f}"
-                            elif 'per_hour' in selected_metric:
-                                formatted_value = f"{value:.1f}"
-                            elif 'per_working_day' in selected_metric:
-                                formatted_value = f"{value:.1f}"
-                            else:
-                                formatted_value = f"{value:.0f}"
-                            row_data[month] = formatted_value
-                        else:
-                            row_data[month] = "-"
-                    else:
-                        row_data[month] = "-"
-                
-                comparison_data.append(row_data)
-            
-            if comparison_data:
-                comparison_df = pd.DataFrame(comparison_data)
-                st.dataframe(comparison_df, use_container_width=True, height=400)
-                
-                # 統計情報
-                st.subheader("📊 統計サマリー")
-                
-                stats_cols = st.columns(len(months))
-                for i, month in enumerate(months):
-                    with stats_cols[i]:
-                        month_values = []
-                        for _, row in comparison_df.iterrows():
-                            val_str = row[month]
-                            if val_str != "-":
-                                # 数値を抽出（¥記号などを除去）
-                                val_clean = val_str.replace('¥', '').replace(',', '')
-                                try:
-                                    month_values.append(float(val_clean))
-                                except:
-                                    pass
-                        
-                        if month_values:
-                            avg_val = sum(month_values) / len(month_values)
-                            max_val = max(month_values)
-                            min_val = min(month_values)
-                            
-                            st.markdown(f"**{month}月**")
-                            if selected_metric == 'total_revenue':
-                                st.metric("平均", f"¥{avg_val:,.0f}")
-                                st.metric("最大", f"¥{max_val:,.0f}")
-                                st.metric("最小", f"¥{min_val:,.0f}")
-                            else:
-                                st.metric("平均", f"{avg_val:.1f}")
-                                st.metric("最大", f"{max_val:.1f}")
-                                st.metric("最小", f"{min_val:.1f}")
-                        else:
-                            st.markdown(f"**{month}月**")
-                            st.info("データなし")
+            render_staff_trend_section(monthly_data, json_data)
 
 # 商材別分析機能は pages/monthly_detail/product_analysis.py に移動されました
 
-def render_detail_data_tab(df_basic, selected_month):
+def render_detail_data_tab(df_basic, selected_month, json_data=None):
     """詳細データタブをレンダリング"""
     st.subheader("詳細データ")
     
+    scope_options = ["選択月のみ"]
+    if json_data is not None and len(st.session_state.get('available_months', [])) > 1:
+        scope_options.append("全月")
+    
+    ctrl_col1, ctrl_col2 = st.columns(2)
+    with ctrl_col1:
+        detail_scope = st.radio("対象期間", scope_options, horizontal=True, key="detail_scope")
+    with ctrl_col2:
+        paginate = st.toggle("ページ表示", value=True, key="detail_paginate",
+                             help="オフにすると全件を一度に表示します（件数が多いと表示が遅くなります）")
+    
+    # 表示用テーブルと支部・スタッフの行インデックス（派生データキャッシュに保持）
+    if detail_scope == "全月":
+        months = sorted(st.session_state.get('available_months', [selected_month]))
+        table_key = ('detail_table', 'all', tuple(months))
+        build_table = lambda: build_detail_table(pd.concat(
+            list(iter_month_activity_frames(json_data, months)), ignore_index=True
+        ))
+    else:
+        months = [selected_month]
+        table_key = ('detail_table', selected_month)
+        build_table = lambda: build_detail_table(df_basic)
+    
+    cache = get_derived_cache(json_data) if json_data is not None else None
+    detail_table = cache.get_or_build(table_key, build_table) if cache is not None else build_table()
+    df_table = detail_table['df']
+    
     # フィルター機能
     col1, col2 = st.columns(2)
     
     with col1:
         selected_branch = st.selectbox(
             "支部でフィルター",
-            ['全て'] + list(df_basic['branch'].unique())
+            ['全て'] + detail_table['options']['branch']
         )
     
     with col2:
         selected_staff = st.selectbox(
             "スタッフでフィルター",
-            ['全て'] + list(df_basic['staff_name'].unique())
+            ['全て'] + detail_table['options']['staff_name']
         )
     
-    # フィルター適用
-    filtered_df = df_basic.copy()
+    if paginate:
+        render_paginated_detail_table(detail_table, table_key, selected_branch, selected_staff, cache)
+    else:
+        st.dataframe(filter_detail_data(df_table, selected_branch, selected_staff), use_container_width=True)
     
-    if selected_branch != '全て':
-        filtered_df = filtered_df[filtered_df['branch'] == selected_branch]
+    # エクスポート（ダウンロード時のみファイルを作成）
+    render_detail_export_section(
+        lambda: filter_detail_data(df_basic, selected_branch, selected_staff),
+        selected_month, months, detail_scope, selected_branch, selected_staff, json_data
+    )
+
+@timed(rows=lambda table: len(table['df']))
+def build_detail_table(df):
+    """
+    詳細データテーブル用のデータと行インデックスを作成
+    
+    文字列カラムをカテゴリ型に変換し、支部・スタッフごとの行位置と
+    フィルターの選択肢を事前に計算しておく。
+    
+    Args:
+        df: 日報データのDataFrame
+    
+    Returns:
+        dict: df（カテゴリ型に変換したDataFrame）、positions（カラム→値→行位置）、options（カラム→選択肢）
+    """
+    df = df.reset_index(drop=True)
+    df = df.astype({
+        col: 'category' for col in ['month', 'date', 'product', 'staff_name', 'branch', 'join_date', 'product_type']
+        if col in df.columns
+    })
     
+    positions = {}
+    options = {}
+    for col in ['branch', 'staff_name']:
+        if col not in df.columns:
+            positions[col] = {}
+            options[col] = []
+            continue
+        positions[col] = df.groupby(col, observed=True, sort=False).indices
+        # 選択肢は出現順（従来のunique()と同じ並び）
+        options[col] = [value for value in pd.unique(df[col]) if pd.notna(value)]
+    
+    return {'df': df, 'positions': positions, 'options': options}
+
+def get_detail_sort_order(detail_table, table_key, sort_column, ascending, cache=None):
+    """
+    指定カラムで並べた行位置を取得（並び順はテーブル・カラムごとにキャッシュ）
+    
+    Args:
+        detail_table: build_detail_tableの戻り値
+        table_key: テーブルのキャッシュキー
+        sort_column: 並び替えるカラム
+        ascending: 昇順の場合True
+        cache: 派生データキャッシュ（Noneの場合は毎回計算）
+    
+    Returns:
+        np.ndarray: 並び替え後の行位置（欠損値は末尾）
+    """
+    def build():
+        column = detail_table['df'][sort_column]
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            # カテゴリは値の文字列順で並べる
+            column = column.astype(object)
+        return column.sort_values(ascending=ascending, kind='stable', na_position='last').index.to_numpy()
+    
+    if cache is None:
+        return build()
+    return cache.get_or_build(('detail_sort', table_key, sort_column, ascending), build)
+
+def render_paginated_detail_table(detail_table, table_key, selected_branch, selected_staff, cache=None):
+    """
+    詳細データをページ単位で表示
+    
+    フィルター・並び替えは行位置の配列で行い、表示するページの行だけを
+    DataFrameとして取り出して送信する。
+    
+    Args:
+        detail_table: build_detail_tableの戻り値
+        table_key: テーブルのキャッシュキー
+        selected_branch: 支部フィルター
+        selected_staff: スタッフフィルター
+        cache: 派生データキャッシュ
+    """
+    df_table = detail_table['df']
+    n_rows = len(df_table)
+    
+    # フィルター（支部・スタッフの行位置から該当行のマスクを作成）
+    mask = None
+    for col, value in [('branch', selected_branch), ('staff_name', selected_staff)]:
+        if value == '全て':
+            continue
+        col_mask = np.zeros(n_rows, dtype=bool)
+        col_mask[detail_table['positions'][col].get(value, [])] = True
+        mask = col_mask if mask is None else (mask & col_mask)
+    
+    sort_col1, sort_col2, sort_col3 = st.columns([2, 1, 1])
+    with sort_col1:
+        sort_column = st.selectbox(
+            "並び替え",
+            ['（並び替えなし）'] + list(df_table.columns),
+            key="detail_sort_column"
+        )
+    with sort_col2:
+        sort_descending = st.toggle("降順", value=False, key="detail_sort_desc")
+    with sort_col3:
+        page_size = st.selectbox(
+            "表示件数",
+            DETAIL_PAGE_SIZE_OPTIONS,
+            index=DETAIL_PAGE_SIZE_OPTIONS.index(DEFAULT_DETAIL_PAGE_SIZE),
+            key="detail_page_size"
+        )
+    
+    if sort_column == '（並び替えなし）':
+        row_positions = np.flatnonzero(mask) if mask is not None else np.arange(n_rows)
+    else:
+        order = get_detail_sort_order(detail_table, table_key, sort_column, not sort_descending, cache)
+        row_positions = order[mask[order]] if mask is not None else order
+    
+    total = len(row_positions)
+    total_pages = max((total - 1) // page_size + 1, 1)
+    
+    # 条件が変わったら1ページ目に戻す
+    view_signature = (table_key, selected_branch, selected_staff, sort_column, sort_descending, page_size)
+    if st.session_state.get('detail_page_signature') != view_signature:
+        st.session_state['detail_page_signature'] = view_signature
+        st.session_state['detail_page'] = 1
+    
+    page = st.number_input(
+        f"ページ（全{total_pages:,}ページ）",
+        min_value=1,
+        max_value=total_pages,
+        step=1,
+        key="detail_page"
+    )
+    
+    start = (int(page) - 1) * page_size
+    page_positions = row_positions[start:start + page_size]
+    st.dataframe(df_table.iloc[page_positions], use_container_width=True)
+    if total:
+        st.caption(f"全{total:,}件中 {start + 1:,}〜{start + len(page_positions):,}件を表示")
+    else:
+        st.caption("該当するデータがありません")
+
+def filter_detail_data(df, selected_branch, selected_staff):
+    """
+    詳細データに支部・スタッフのフィルターを適用
+    
+    Args:
+        df: 日報データのDataFrame
+        selected_branch: 支部（'全て'で絞り込みなし）
+        selected_staff: スタッフ名（'全て'で絞り込みなし）
+    
+    Returns:
+        pd.DataFrame: フィルター後のDataFrame
+    """
+    mask = pd.Series(True, index=df.index)
+    if selected_branch != '全て':
+        mask &= df['branch'] == selected_branch
     if selected_staff != '全て':
-        filtered_df = filtered_df[filtered_df['staff_name'] == selected_staff]
+        mask &= df['staff_name'] == selected_staff
+    return df[mask]
+
+def iter_month_activity_frames(json_data, months, selected_branch='全て', selected_staff='全て', cache=None):
+    """
+    月別の日報データを1ヶ月ずつ返す（全月エクスポート用）
+    
+    派生データキャッシュにある月はそれを使い、ない月はその場で作成して
+    キャッシュには残さない（全月分を同時にメモリへ載せない）。
+    cache を渡した場合は st.* を呼び出さないため、ダウンロード時の別スレッドからも使える。
+    
+    Args:
+        json_data: アップロードデータ
+        months: 対象月のリスト
+        selected_branch: 支部フィルター
+        selected_staff: スタッフフィルター
+        cache: 派生データキャッシュ（Noneの場合は現在のセッションのキャッシュ）
+    
+    Yields:
+        pd.DataFrame: 先頭にmonth列を付けた月別の日報データ
+    """
+    if cache is None:
+        cache = get_derived_cache(json_data)
+    for month in months:
+        basic_data, _, _ = load_analysis_data_from_json(json_data, month)
+        if not basic_data or month not in basic_data.get('monthly_analysis', {}):
+            continue
+        
+        staff_dict = basic_data['monthly_analysis'][month]['staff']
+        key = ('month_activity', month)
+        if cache.contains(key):
+            df_month = cache.get_or_build(key, lambda: extract_daily_activity_from_staff(staff_dict))
+        else:
+            df_month = extract_daily_activity_from_staff(staff_dict)
+        if df_month.empty:
+            continue
+        
+        df_month = filter_detail_data(df_month, selected_branch, selected_staff)
+        yield pd.concat([pd.Series(month, index=df_month.index, name='month'), df_month], axis=1)
+
+def render_detail_export_section(build_selected_df, selected_month, months, export_scope, selected_branch, selected_staff, json_data=None):
+    """
+    詳細データのエクスポートセクションを表示
+    
+    ファイルはダウンロードボタンを押したときに（再実行とは別のスレッドで）
+    分割書き込みで作成し、セッションには保持しない。全月を選んだ場合は月ごとに読み込んで追記する。
+    
+    Args:
+        build_selected_df: フィルター後の選択月データを返す関数
+        selected_month: 選択月
+        months: エクスポート対象の月リスト
+        export_scope: 対象期間（"選択月のみ" または "全月"）
+        selected_branch: 支部フィルター
+        selected_staff: スタッフフィルター
+        json_data: アップロードデータ（全月エクスポート用）
+    """
+    st.markdown("#### 📥 エクスポート")
+    available_formats, unavailable_formats = get_available_export_formats()
+    
+    export_format = st.selectbox(
+        "出力形式",
+        available_formats,
+        format_func=lambda fmt: EXPORT_FORMATS[fmt]['label'],
+        key="detail_export_format"
+    )
     
-    # 詳細データ表示
-    st.dataframe(filtered_df, use_container_width=True)
+    if unavailable_formats:
+        missing = ', '.join(
+            f"{EXPORT_FORMATS[fmt]['label']}（{EXPORT_FORMATS[fmt]['module']}）" for fmt in unavailable_formats
+        )
+        st.caption(f"未インストールのパッケージが必要な形式: {missing}")
+    
+    period_label = f"{months[0]}_{months[-1]}" if len(months) > 1 else selected_month
     
-    # CSVダウンロード機能
-    csv = filtered_df.to_csv(index=False, encoding='utf-8-sig')
+    # ダウンロード時の処理は別スレッドで実行されるため、キャッシュと対象月はこの再実行で確定させる
+    # （取り込み中に月が増えた場合は、次の再実行で作り直すボタンに反映される）
+    if export_scope == "全月":
+        export_months = tuple(months)
+        cache = get_derived_cache(json_data)
+        make_frames = lambda: iter_month_activity_frames(
+            json_data, export_months, selected_branch, selected_staff, cache
+        )
+    else:
+        make_frames = lambda: [build_selected_df()]
+    
+    def write_export():
+        # ダウンロードのたびに作成し、読み出した後は一時ファイルを破棄する
+        with export_to_spooled_file(make_frames(), export_format, sheet_name=period_label) as export_file:
+            return export_file.read()
+    
+    spec = EXPORT_FORMATS[export_format]
     st.download_button(
-        label="📥 CSVダウンロード",
-        data=csv,
-        file_name=f"詳細データ_{selected_month}.csv",
-        mime="text/csv"
-    ) 
\ No newline at end of file
+        label=f"📥 {spec['label']}ダウンロード",
+        data=write_export,
+        file_name=f"詳細データ_{period_label}{spec['extension']}",
+        mime=spec['mime'],
+        key="detail_export_download"
+    )
@@ -0,0 +1,217 @@
+"""隣接月の先読み
+
+単月詳細データの3ヶ月比較（支部別の実数/単位あたり3ヶ月比較、スタッフ別の月別推移、
+商材別3ヶ月比較）は選択月と過去2ヶ月のデータを必要とする。月が選択されたら、
+これらの集計と、次に選ばれやすい隣の月の集計をバックグラウンドで派生データキャッシュに
+作成しておき、サブタブを開いたときの待ち時間をなくす。
+
+先読みはページ側と同じキャッシュキー・同じ関数で計算するため、結果は同一になる。
+ページ側が計算中のキーを要求した場合は、キャッシュが先読みの完了を待って結果を共有する。
+先読みのスレッドは st.* とセッション状態を使わず、エラーは先読みのジョブに記録する。
+"""
+import threading
+
+import streamlit as st
+
+from utils.data_processor import (
+    load_analysis_data_from_json, load_multi_month_data, load_product_3month_comparison_data
+)
+from utils.derived_cache import get_derived_cache
+from utils.ingestion import INGESTION_JOB_KEY
+# 比較月はページ側と同じキャッシュキーになるよう、ページと同じ関数で求める
+from .main import build_branch_month_summary, get_month_activity_df, get_prev_months
+
+PREFETCH_SESSION_KEY = 'month_prefetch'
+
+
+def get_likely_next_month(selected_month, available_months):
+    """
+    次に選ばれやすい月を推定
+
+    月の選択肢は新しい順に並ぶため、選択中の月の次の項目（1つ前の月）とし、
+    最も古い月を選択中の場合はその前の項目とする。
+
+    Args:
+        selected_month: 選択中の月
+        available_months: 選択肢の月（新しい順）
+
+    Returns:
+        str: 月（推定できない場合はNone）
+    """
+    if selected_month not in available_months:
+        return None
+    index = available_months.index(selected_month)
+    if index + 1 < len(available_months):
+        return available_months[index + 1]
+    if index > 0:
+        return available_months[index - 1]
+    return None
+
+
+def _strict(load):
+    """
+    読み込みエラーを st.warning で表示せず例外として扱う読み込み関数を作成
+
+    一部の月の読み込みに失敗した結果はキャッシュに保持せず、ページ側で同じ計算を行ったときに
+    警告を表示させる。
+
+    Args:
+        load: errors 引数で読み込みエラーを受け取る関数
+
+    Returns:
+        callable: 読み込み関数（エラーがあった場合は RuntimeError）
+    """
+    def wrapper(*args):
+        errors = []
+        result = load(*args, errors=errors)
+        if errors:
+            raise RuntimeError(" / ".join(errors))
+        return result
+    return wrapper
+
+
+def build_prefetch_tasks(json_data, months, cache):
+    """
+    先読みする派生データの一覧を作成
+
+    各月について、過去3ヶ月分の日報DataFrameと支部別集計、スタッフ別の月別推移、
+    商材別3ヶ月比較を対象とする。先読み関数は st.* やセッション状態を参照しない。
+
+    Args:
+        json_data: アップロードデータ
+        months: 基準月のリスト（先頭から順に先読みする）
+        cache: 結果を保持する派生データキャッシュ
+
+    Returns:
+        list: (キャッシュキー, 先読み関数) のリスト（重複なし）。先読み関数は結果をキャッシュに保持する
+    """
+    tasks = {}
+
+    def add(key, builder):
+        tasks.setdefault(key, lambda: cache.get_or_build(key, builder))
+
+    load_multi_month = _strict(load_multi_month_data)
+    load_product_comparison = _strict(load_product_3month_comparison_data)
+    for month in months:
+        compare_months = get_prev_months(month, 3)
+        for m in compare_months:
+            basic_data = load_analysis_data_from_json(json_data, m)[0]
+            if basic_data and m in basic_data.get('monthly_analysis', {}):
+                # get_month_activity_df は自身でキャッシュに保持する
+                tasks.setdefault(('month_activity', m),
+                                 lambda m=m, basic_data=basic_data: get_month_activity_df(json_data, basic_data, m, cache=cache))
+            add(('branch_month_summary', m), lambda m=m: build_branch_month_summary(json_data, m, cache=cache))
+        add(('multi_month_data', tuple(compare_months)),
+            lambda compare_months=compare_months: load_multi_month(json_data, compare_months))
+        add(('product_3month_comparison', month),
+            lambda month=month: load_product_comparison(json_data, month))
+    return list(tasks.items())
+
+
+class _PrefetchJob:
+    """1回の先読み（データセットと基準月の組み合わせ単位）"""
+
+    def __init__(self, plan, months):
+        # (アップロードデータのid, 選択月, 次に選ばれやすい月)
+        self.plan = plan
+        self.months = months
+        self.tasks = []
+        self.completed = 0
+        # (キャッシュキー, エラーメッセージ) のリスト
+        self.errors = []
+        self._cancelled = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='month-prefetch', daemon=True)
+
+    @property
+    def running(self):
+        return self._thread.is_alive()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    @property
+    def failed(self):
+        return len(self.errors)
+
+    def start(self, json_data):
+        """
+        先読みを開始
+
+        派生データキャッシュの取得と先読み対象の決定はスクリプトのスレッドで行い、
+        別スレッドでは結果を計算してキャッシュに保持するだけにする。
+
+        Args:
+            json_data: アップロードデータ
+
+        Returns:
+            bool: 先読みを開始したか（全て計算済みの場合はFalse）
+        """
+        cache = get_derived_cache(json_data)
+        self.tasks = [
+            (key, task) for key, task in build_prefetch_tasks(json_data, self.months, cache)
+            if not cache.contains(key)
+        ]
+        if not self.tasks:
+            return False
+        self._thread.start()
+        return True
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def join(self, timeout=None):
+        if self._thread.ident is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        try:
+            for key, task in self.tasks:
+                # 別の月が選ばれた・データが差し替えられた場合は中止
+                if self._cancelled.is_set():
+                    return
+                try:
+                    task()
+                    self.completed += 1
+                except Exception as e:
+                    # 警告はページ側で同じ計算を行ったときに表示する
+                    self.errors.append((key, str(e)))
+        finally:
+            # 先読み関数が参照するアップロードデータとキャッシュを解放できるようにする
+            self.tasks = []
+
+
+def prefetch_adjacent_months(json_data, selected_month, available_months):
+    """
+    選択月の3ヶ月比較用データと、次に選ばれやすい月のデータをバックグラウンドで作成
+
+    同じデータセット・同じ月の先読みが実行中または完了済みの場合は何もしない。
+    別の月が選ばれた・データが差し替えられた場合は実行中の先読みを中止して新しく開始する。
+    アップロードデータの取り込み中はデータが差し替わるため、実行中の先読みを中止して先読みしない。
+
+    Args:
+        json_data: アップロードデータ
+        selected_month: 選択中の月
+        available_months: 選択肢の月（新しい順）
+
+    Returns:
+        _PrefetchJob: 先読み（開始しなかった場合はNone）
+    """
+    job = st.session_state.get(PREFETCH_SESSION_KEY)
+    if not json_data or not selected_month or INGESTION_JOB_KEY in st.session_state:
+        if job is not None:
+            job.cancel()
+        return None
+    next_month = get_likely_next_month(selected_month, available_months)
+    plan = (id(json_data), selected_month, next_month)
+
+    if job is not None:
+        if job.plan == plan and not job.cancelled:
+            return None
+        job.cancel()
+
+    months = [selected_month] + ([next_month] if next_month else [])
+    job = _PrefetchJob(plan, months)
+    st.session_state[PREFETCH_SESSION_KEY] = job
+    job.start(json_data)
+    return job
@@ -11,30 +11,32 @@ from utils.data_processor import (
     aggregate_product_data_from_basic
 )
 from components.charts import create_bar_chart, create_line_chart
+from components.lazy_tabs import lazy_tab_selector
+from utils.derived_cache import get_derived_cache
 
 
 def render_product_analysis_tab(df_basic, summary_data, json_data, selected_month):
     """商材別分析タブをレンダリング"""
     st.subheader("商材別分析")
     
-    # 商材別分析のサブタブ
-    subtab1, subtab2, subtab3, subtab4 = st.tabs([
-        "📊 商材別パフォーマンス", 
-        "🔗 支部×商材クロス分析", 
-        "📈 商材別3ヶ月比較", 
-        "📋 商材別詳細"
-    ])
+    # 商材別分析のサブタブ（選択中のサブタブのみ実行）
+    active_subtab = lazy_tab_selector([
+        ("performance", "📊 商材別パフォーマンス"),
+        ("cross", "🔗 支部×商材クロス分析"),
+        ("comparison_3m", "📈 商材別3ヶ月比較"),
+        ("detail", "📋 商材別詳細")
+    ], key="product_subtab")
     
-    with subtab1:
+    if active_subtab == "performance":
         render_product_performance_subtab(df_basic, summary_data)
     
-    with subtab2:
+    elif active_subtab == "cross":
         render_branch_product_cross_subtab(summary_data)
     
-    with subtab3:
+    elif active_subtab == "comparison_3m":
         render_product_3month_comparison_subtab(json_data, selected_month)
     
-    with subtab4:
+    elif active_subtab == "detail":
         render_product_detail_subtab(df_basic)
 
 
@@ -106,6 +108,7 @@ def render_product_performance_subtab(df_basic, summary_data):
         st.warning("⚠️ **TAAANデータが見つかりません**: 商材別分析ではTAAAN関連の指標を表示できません")
 
 
+@st.fragment
 def render_branch_product_cross_subtab(summary_data):
     """支部×商材クロス分析サブタブをレンダリング"""
     st.subheader("支部×商材クロス分析")
@@ -277,7 +280,10 @@ def render_product_3month_comparison_subtab(json_data, selected_month):
     target_months = get_prev_months(selected_month, 3)
     
     # 過去3ヶ月のTAAANデータを読み込み
-    all_taaan_data = load_product_3month_comparison_data(json_data, selected_month)
+    all_taaan_data = get_derived_cache(json_data).get_or_build(
+        ('product_3month_comparison', selected_month),
+        lambda: load_product_3month_comparison_data(json_data, selected_month)
+    )
     
     # デバッグ情報
     st.info(f"🔍 **対象月**: {', '.join(target_months)}")
@@ -289,6 +295,19 @@ def render_product_3month_comparison_subtab(json_data, selected_month):
     st.markdown("### 💼 TAAANデータ（TAAAN商談数、承認数、確定売上）の3ヶ月推移")
     st.info("📊 **データソース**: この分析ではTAAANシステムからの商談データ（total_deals、total_approved、total_revenue）のみを使用しています。日報データ（total_calls、total_hours、total_appointments）は含まれていません。")
     
+    render_product_3month_comparison_section(all_taaan_data)
+
+
+@st.fragment
+def render_product_3month_comparison_section(all_taaan_data):
+    """
+    商材別3ヶ月比較の指標選択・推移グラフ・比較テーブルを表示
+    
+    指標ボタンや商材選択の操作時はこのセクションのみ再実行される。
+    
+    Args:
+        all_taaan_data: 過去3ヶ月の商材別TAAANデータ
+    """
     # 指標選択ボタン
     st.markdown("#### 比較指標")
     taaan_metric_options = ["TAAAN商談数", "承認数", "確定売上"]
@@ -0,0 +1,6 @@
+"""
+SQLクエリ分析パッケージ
+ファクトテーブルに対するアドホックなSQL集計
+"""
+
+from .main import render_query_analysis_page
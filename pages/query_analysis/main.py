@@ -0,0 +1,87 @@
+"""SQLクエリ分析ページ"""
+import time
+import streamlit as st
+from utils.query_engine import (
+    QUERY_BACKENDS,
+    SAMPLE_QUERIES,
+    QueryError,
+    get_available_backends,
+    get_query_engine
+)
+
+# 結果表示の最大行数（全件はCSVでダウンロード）
+QUERY_DISPLAY_ROWS = 1000
+
+def _apply_sample_query():
+    """サンプル選択時にクエリ入力欄へ反映"""
+    sample = st.session_state.get('query_sample')
+    if sample in SAMPLE_QUERIES:
+        st.session_state['query_sql'] = SAMPLE_QUERIES[sample]
+
+def render_query_analysis_page(json_data):
+    """SQLクエリ分析ページをレンダリング"""
+    st.header("🔎 SQLクエリ分析")
+    st.caption("日次活動・TAAAN・コンバージョン・定着率のテーブルにSQL（SELECT文）で集計できます")
+    
+    backends = get_available_backends()
+    col1, col2 = st.columns([1, 2])
+    with col1:
+        backend = st.selectbox(
+            "エンジン",
+            backends,
+            format_func=lambda name: QUERY_BACKENDS[name]['class'].label,
+            key="query_backend"
+        )
+    with col2:
+        st.selectbox(
+            "サンプルクエリ",
+            ['（選択してください）'] + list(SAMPLE_QUERIES.keys()),
+            key="query_sample",
+            on_change=_apply_sample_query
+        )
+    
+    try:
+        with st.spinner("テーブルを準備中..."):
+            engine = get_query_engine(json_data, backend)
+    except Exception as e:
+        st.error(f"テーブルの準備に失敗しました: {e}")
+        return
+    
+    with st.expander("📋 テーブル定義", expanded=False):
+        for table, schema in engine.schemas.items():
+            st.markdown(f"**{table}**（{schema['rows']:,}行）: `{'`, `'.join(schema['columns'])}`")
+    
+    if 'query_sql' not in st.session_state:
+        st.session_state['query_sql'] = next(iter(SAMPLE_QUERIES.values()))
+    sql = st.text_area("SQL", key="query_sql", height=200)
+    
+    if st.button("▶️ 実行", type="primary", key="query_run"):
+        st.session_state['query_last_sql'] = sql
+    
+    last_sql = st.session_state.get('query_last_sql')
+    if not last_sql:
+        st.info("SQLを入力して「実行」を押してください")
+        return
+    
+    # 同じクエリは結果キャッシュから返るため、再実行時も再計算しない
+    started = time.perf_counter()
+    try:
+        result, from_cache = engine.execute(last_sql)
+    except QueryError as e:
+        st.error(f"❌ クエリエラー: {e}")
+        return
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    
+    source = "キャッシュ" if from_cache else QUERY_BACKENDS[backend]['class'].label
+    st.caption(f"{len(result):,}行 ・ {elapsed_ms:.1f}ms（{source}）")
+    if len(result) > QUERY_DISPLAY_ROWS:
+        st.warning(f"⚠️ 先頭{QUERY_DISPLAY_ROWS:,}行のみ表示しています。全件はCSVでダウンロードしてください")
+    st.dataframe(result.head(QUERY_DISPLAY_ROWS), use_container_width=True)
+    
+    st.download_button(
+        label="📥 CSVダウンロード",
+        data=result.to_csv(index=False, encoding='utf-8-sig'),
+        file_name="query_result.csv",
+        mime="text/csv",
+        key="query_download"
+    )
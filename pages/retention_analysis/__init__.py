@@ -0,0 +1,7 @@
+"""
+定着率分析パッケージ
+定着率・リスクスコアの再計算に基づく分析ビュー
+"""
+
+from .cohort import render_cohort_retention
+from .simulator import render_risk_simulator
@@ -0,0 +1,94 @@
+"""入社月コホート別の定着率
+
+入社月ごとのスタッフ集団（コホート）が、各活動月にどれだけ活動していたかを
+ヒートマップと表で表示する。集計は派生データキャッシュに1回だけ作成する。
+"""
+import plotly.graph_objects as go
+import streamlit as st
+
+from utils.retention_engine import get_cohort_retention
+
+# ヒートマップのセル内に値を表示する最大セル数（超える場合はホバーのみ）
+COHORT_LABEL_MAX_CELLS = 400
+COHORT_VALUE_OPTIONS = {
+    'rates': '定着率(%)',
+    'active': 'アクティブ人数'
+}
+
+
+def create_cohort_heatmap(values, value_label):
+    """
+    コホート×活動月のヒートマップを作成
+
+    Args:
+        values: コホートが行、活動月が列のDataFrame（入社前の月は欠損）
+        value_label: 値の表示名
+
+    Returns:
+        go.Figure: ヒートマップ
+    """
+    is_rate = value_label == COHORT_VALUE_OPTIONS['rates']
+    show_labels = values.size <= COHORT_LABEL_MAX_CELLS
+    fig = go.Figure(go.Heatmap(
+        z=values.to_numpy(dtype=float),
+        x=[str(month) for month in values.columns],
+        y=[str(cohort) for cohort in values.index],
+        colorscale='Blues',
+        zmin=0,
+        zmax=100 if is_rate else None,
+        colorbar=dict(title=value_label),
+        texttemplate=('%{z:.1f}' if is_rate else '%{z:.0f}') if show_labels else None,
+        hovertemplate=f"入社月: %{{y}}<br>活動月: %{{x}}<br>{value_label}: %{{z:.1f}}<extra></extra>",
+        hoverongaps=False
+    ))
+    fig.update_layout(
+        xaxis=dict(title='活動月', type='category'),
+        yaxis=dict(title='入社月', type='category', autorange='reversed'),
+        height=max(400, 28 * len(values.index) + 150)
+    )
+    return fig
+
+
+def render_cohort_retention(json_data):
+    """
+    入社月コホート×活動月の定着率をヒートマップと表で表示
+
+    Args:
+        json_data: アップロードデータ
+    """
+    st.subheader("🧩 入社月コホート別定着率")
+    st.caption("入社月ごとのスタッフのうち、各月に活動したスタッフの割合です（入社前の月は空欄）")
+
+    try:
+        with st.spinner("コホート別定着率を集計中..."):
+            cohorts = get_cohort_retention(json_data)
+    except Exception as e:
+        st.error(f"コホート別定着率の集計に失敗しました: {e}")
+        return
+    if cohorts['rates'].empty:
+        st.warning("⚠️ 日次活動データが見つからないため、コホート別定着率を表示できません")
+        return
+
+    value_key = st.radio(
+        "表示する値",
+        list(COHORT_VALUE_OPTIONS),
+        format_func=lambda key: COHORT_VALUE_OPTIONS[key],
+        horizontal=True,
+        key="cohort_value"
+    )
+    values = cohorts[value_key]
+    value_label = COHORT_VALUE_OPTIONS[value_key]
+
+    st.plotly_chart(create_cohort_heatmap(values, value_label), use_container_width=True)
+
+    table = values.round(1) if value_key == 'rates' else values.astype('Int64')
+    table = table.rename(columns=str)
+    table.insert(0, 'コホート人数', cohorts['sizes'])
+    st.dataframe(table, use_container_width=True)
+    st.download_button(
+        label="📥 CSVダウンロード",
+        data=table.to_csv(encoding='utf-8-sig'),
+        file_name=f"cohort_{value_key}.csv",
+        mime="text/csv",
+        key="cohort_download"
+    )
@@ -0,0 +1,207 @@
+"""リスクスコア シミュレーター
+
+config.js の risk_scoring（重み・リスクレベル閾値・リスク要因の判定基準）をスライダーで変更し、
+全スタッフのリスクスコアとリスクレベルがどう変わるかをその場で確認する。
+
+スタッフ別の特徴量は派生データキャッシュに1回だけ作成し、スライダー操作時は
+リスク要因の判定・重み付き合計・レベル判定だけを再計算する。
+"""
+import json
+import time
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import streamlit as st
+
+from utils.config import RISK_FACTORS, RISK_THRESHOLDS, RISK_WEIGHTS
+from utils.perf import perf_stage
+from utils.retention_engine import RISK_LEVELS, compute_risk_flags, get_retention_features, score_risk
+
+RISK_LEVEL_LABELS = {'high': '高リスク', 'medium': '中リスク', 'low': '低リスク'}
+RISK_LEVEL_COLORS = {'high': '#ff6b6b', 'medium': '#feca57', 'low': '#96ceb4'}
+
+# スライダーの設定（表示ラベル, 最小値, 最大値, 刻み）
+WEIGHT_SLIDERS = {
+    'low_activity_rate': ('活動率が低い', 0, 100, 5),
+    'recent_inactivity': ('最近の活動が少ない', 0, 100, 5),
+    'low_performance': ('成果が低い', 0, 100, 5),
+    'short_tenure_low_activity': ('在籍期間が短く活動が少ない', 0, 100, 5),
+    'unstable_activity': ('活動の安定性が低い', 0, 100, 5)
+}
+THRESHOLD_SLIDERS = {
+    'high_risk': ('高リスク判定閾値', 0, 200, 5),
+    'medium_risk': ('中リスク判定閾値', 0, 200, 5)
+}
+FACTOR_SLIDERS = {
+    'activity_rate_threshold': ('活動率警告閾値（%）', 0, 100, 5),
+    'recent_activity_days_threshold': ('最近3ヶ月の最小活動日数', 0, 60, 1),
+    'appointment_rate_threshold': ('アポ獲得率警告閾値（%）', 0.0, 10.0, 0.5),
+    'short_tenure_months': ('短期在籍の定義（ヶ月）', 0, 12, 1),
+    'min_activity_days_short_tenure': ('短期在籍者の最小活動日数', 0, 60, 1),
+    'activity_variance_threshold': ('活動ばらつき警告閾値', 0, 100, 1)
+}
+# スライダー群 -> (既定値, スライダー設定)
+SLIDER_GROUPS = {
+    'weights': (RISK_WEIGHTS, WEIGHT_SLIDERS),
+    'thresholds': (RISK_THRESHOLDS, THRESHOLD_SLIDERS),
+    'factors': (RISK_FACTORS, FACTOR_SLIDERS)
+}
+
+
+def _slider_key(group, name):
+    return f"risk_sim_{group}_{name}"
+
+
+def _default_value(group, name):
+    """スライダーの既定値（スライダーの型に合わせる）"""
+    defaults, sliders = SLIDER_GROUPS[group]
+    return type(sliders[name][1])(defaults[name])
+
+
+def _reset_sliders():
+    """スライダーを config.js の既定値に戻す"""
+    for group, (_, sliders) in SLIDER_GROUPS.items():
+        for name in sliders:
+            st.session_state[_slider_key(group, name)] = _default_value(group, name)
+
+
+def _render_sliders(group, title):
+    """スライダー群を表示し、選択値の辞書を返す"""
+    st.markdown(f"**{title}**")
+    values = {}
+    for name, (label, min_value, max_value, step) in SLIDER_GROUPS[group][1].items():
+        key = _slider_key(group, name)
+        if key not in st.session_state:
+            st.session_state[key] = _default_value(group, name)
+        values[name] = st.slider(label, min_value, max_value, step=step, key=key)
+    return values
+
+
+def _factor_labels(flags):
+    """該当したリスク要因の表示名をスタッフごとに連結"""
+    labels = pd.Series('', index=flags.index)
+    for factor in flags.columns:
+        hit = flags[factor].to_numpy()
+        labels = labels.where(~hit, labels + np.where(labels == '', '', '、') + WEIGHT_SLIDERS[factor][0])
+    return labels
+
+
+def _create_bucket_chart(baseline_counts, simulated_counts):
+    """リスクレベル別人数の既定値とシミュレーション結果を比較するグラフ"""
+    labels = [RISK_LEVEL_LABELS[level] for level in RISK_LEVELS]
+    fig = go.Figure()
+    fig.add_trace(go.Bar(
+        x=labels, y=[baseline_counts[level] for level in RISK_LEVELS], name='既定（config.js）',
+        marker_color='#bdc3c7'
+    ))
+    fig.add_trace(go.Bar(
+        x=labels, y=[simulated_counts[level] for level in RISK_LEVELS], name='シミュレーション',
+        marker_color=[RISK_LEVEL_COLORS[level] for level in RISK_LEVELS]
+    ))
+    fig.update_layout(barmode='group', yaxis_title='人数', height=350, legend=dict(orientation='h'))
+    return fig
+
+
+@st.fragment
+def render_risk_simulator(json_data):
+    """
+    リスクスコアの重み・閾値を変更して全スタッフを再スコアリングするビューを表示
+
+    スライダーの操作時はこのセクションのみ再実行される。
+
+    Args:
+        json_data: アップロードデータ
+    """
+    st.subheader("🎛️ リスクスコア シミュレーター")
+    st.caption("config.js の risk_scoring を変更した場合に、各スタッフのリスクレベルがどう変わるかを確認できます")
+
+    try:
+        with st.spinner("スタッフ別の特徴量を準備中..."):
+            features, _ = get_retention_features(json_data)
+    except Exception as e:
+        st.error(f"スタッフ別の特徴量の作成に失敗しました: {e}")
+        return
+    if features.empty:
+        st.warning("⚠️ 日次活動データが見つからないため、シミュレーションできません")
+        return
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        weights = _render_sliders('weights', "⚖️ リスク要因の重み")
+    with col2:
+        factors = _render_sliders('factors', "📏 リスク要因の判定基準")
+    with col3:
+        thresholds = _render_sliders('thresholds', "🚦 リスクレベル判定閾値")
+        st.button("↩️ 既定値に戻す", on_click=_reset_sliders, key="risk_sim_reset")
+    if thresholds['medium_risk'] > thresholds['high_risk']:
+        st.warning("⚠️ 中リスク判定閾値が高リスク判定閾値を超えているため、中リスクに該当するスタッフはいません")
+
+    # 特徴量はキャッシュ済みのため、判定・重み付き合計・レベル判定のみ再計算する
+    started = time.perf_counter()
+    with perf_stage('score_risk') as stage:
+        baseline_scores, baseline_levels = score_risk(compute_risk_flags(features))
+        flags = compute_risk_flags(features, factors)
+        scores, levels = score_risk(flags, weights, thresholds)
+        stage.rows = len(features)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    st.caption(f"⚡ {len(features):,}名を {elapsed_ms:.1f} ms で再スコアリングしました")
+
+    baseline_counts = baseline_levels.value_counts().reindex(RISK_LEVELS, fill_value=0)
+    simulated_counts = levels.value_counts().reindex(RISK_LEVELS, fill_value=0)
+    metric_cols = st.columns(len(RISK_LEVELS))
+    for col, level in zip(metric_cols, RISK_LEVELS):
+        col.metric(
+            RISK_LEVEL_LABELS[level],
+            f"{simulated_counts[level]:,}人",
+            delta=f"{simulated_counts[level] - baseline_counts[level]:+,}人",
+            # 高・中リスクは増加が悪化
+            delta_color='normal' if level == 'low' else 'inverse'
+        )
+
+    col1, col2 = st.columns(2)
+    with col1:
+        st.plotly_chart(_create_bucket_chart(baseline_counts, simulated_counts), use_container_width=True)
+    with col2:
+        st.markdown("**リスクレベルの移動（行: 既定、列: シミュレーション）**")
+        transitions = pd.crosstab(
+            pd.Categorical(baseline_levels, categories=RISK_LEVELS),
+            pd.Categorical(levels, categories=RISK_LEVELS),
+            dropna=False
+        )
+        transitions.index = [RISK_LEVEL_LABELS[level] for level in transitions.index]
+        transitions.columns = [RISK_LEVEL_LABELS[level] for level in transitions.columns]
+        st.dataframe(transitions, use_container_width=True)
+
+    changed = (levels != baseline_levels).to_numpy()
+    st.markdown(f"**リスクレベルが変わるスタッフ（{int(changed.sum()):,}名）**")
+    if changed.any():
+        changed_staff = pd.DataFrame({
+            '支部': features['branch'].fillna('未分類'),
+            '既定スコア': baseline_scores,
+            '既定レベル': baseline_levels.map(RISK_LEVEL_LABELS),
+            'スコア': scores,
+            'レベル': levels.map(RISK_LEVEL_LABELS),
+            '該当するリスク要因': _factor_labels(flags)
+        })[changed].sort_values('スコア', ascending=False)
+        st.dataframe(changed_staff, use_container_width=True)
+
+    with st.expander("📝 config.js に反映する設定", expanded=False):
+        # generateJson.js は設定値を `値 || 既定値` で読むため、0 は既定値に置き換わる
+        selected = {'weights': weights, 'thresholds': thresholds, 'factors': factors}
+        zero_labels = [
+            SLIDER_GROUPS[group][1][name][0]
+            for group, values in selected.items()
+            for name, value in values.items() if value == 0
+        ]
+        if zero_labels:
+            st.warning(
+                f"⚠️ {'、'.join(zero_labels)} が0です。generateJson.js は0を未設定として既定値を使うため、"
+                "以下の内容を反映してもこの結果は再現されません"
+            )
+        else:
+            st.caption("risk_scoring を以下の内容に変更して再生成すると、この結果と同じリスクレベルになります")
+        st.code(json.dumps(
+            {'risk_scoring': selected},
+            ensure_ascii=False, indent=2
+        ), language='json')
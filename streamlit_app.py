@@ -8,8 +8,16 @@ import streamlit as st
 from utils.config import PAGE_CONFIG
 from auth.authentication import handle_authentication, display_auth_sidebar, show_auth_error
 from components.file_upload import render_upload_section, render_analysis_selection, render_usage_guide
-from pages.monthly_detail import render_monthly_detail_page
+from components.lazy_tabs import lazy_tab_selector
+from components.memory_panel import render_memory_panel
+from components.perf_panel import can_view_perf_panel, render_perf_panel
+from pages.monthly_detail import render_monthly_detail_page, prefetch_adjacent_months
+from pages.query_analysis import render_query_analysis_page
+from pages.retention_analysis import render_cohort_retention, render_risk_simulator
 from utils.data_processor import load_analysis_data_from_json, load_retention_data_from_json
+from utils.memory import apply_eviction_request, enforce_memory_budget, pop_eviction_notice
+from utils.retention_engine import get_retention_analysis
+from utils.perf import start_perf_rerun
 import pandas as pd
 import plotly.graph_objects as go
 
@@ -119,8 +127,27 @@ def render_retention_analysis_page(json_data, selected_month):
     st.header("📈 定着率分析")
     st.caption("全期間の定着率推移データを表示します")
     
+    # 選択中のビューのみ実行
+    active_tab = lazy_tab_selector([
+        ("trend", "📊 定着率推移"),
+        ("cohort", "🧩 コホート別定着率"),
+        ("simulator", "🎛️ リスクスコア シミュレーター")
+    ], key="retention_tab")
+    if active_tab == "cohort":
+        render_cohort_retention(json_data)
+        return
+    if active_tab == "simulator":
+        render_risk_simulator(json_data)
+        return
+    
     if selected_month:
         retention_data = load_retention_data_from_json(json_data, selected_month)
+        if not retention_data or not retention_data.get('monthly_retention_rates'):
+            # 定着率分析ファイルがない場合は日次活動から全期間の定着率を再計算
+            recomputed = get_retention_analysis(json_data)['monthly_retention_rates']
+            if recomputed:
+                retention_data = {'monthly_retention_rates': recomputed}
+                st.info("ℹ️ 定着率分析ファイルがないため、日次活動データから定着率を再計算しています")
         
         if retention_data:
             # 定着率推移グラフ
@@ -172,6 +199,9 @@ def render_retention_analysis_page(json_data, selected_month):
 
 def main():
     """メインアプリケーション"""
+    # 処理時間の計測を再実行単位で開始
+    start_perf_rerun()
+    
     # 認証処理
     authenticator, authentication_status, name, username = handle_authentication()
     
@@ -184,9 +214,17 @@ def main():
         # 認証後のメインアプリ
         st.success(f"ようこそ {name} さん")
         
+        # 他のセッションから依頼された解放を適用し、メモリ予算の超過でデータを解放した場合は通知
+        apply_eviction_request(st.session_state)
+        eviction_notice = pop_eviction_notice(st.session_state)
+        if eviction_notice:
+            st.warning(f"⚠️ {eviction_notice}")
+        
         # サイドバーに認証情報表示
         with st.sidebar:
             display_auth_sidebar(authenticator, name)
+            # 計測パネルは全処理の完了後に描画するため、表示位置だけ確保する
+            perf_panel = st.container() if can_view_perf_panel(username) else None
             st.divider()
             
             # ファイルアップロードセクション
@@ -204,9 +242,21 @@ def main():
             elif selected_analysis == "retention_analysis":
                 render_retention_analysis_page(json_data, selected_month)
             elif selected_analysis == "monthly_detail":
+                # 3ヶ月比較で使う過去月と次に選ばれやすい月の集計をバックグラウンドで先読み
+                prefetch_adjacent_months(json_data, selected_month, st.session_state.get('available_months', []))
                 render_monthly_detail_page(json_data, selected_month)
+            elif selected_analysis == "query_analysis":
+                render_query_analysis_page(json_data)
         else:
             render_usage_guide()
+        
+        # 描画で作成した派生データも含めてメモリ予算を適用
+        memory_report = enforce_memory_budget()
+        
+        if perf_panel is not None:
+            with perf_panel:
+                render_perf_panel()
+                render_memory_panel(memory_report)
 
 # フッター
     st.divider()
@@ -0,0 +1,72 @@
+"""日次トレンドの間引き表示のテスト
+
+24ヶ月分の合成データ（500日超）で、日次トレンドが間引き処理を通ることを確認する。
+"""
+import pytest
+
+from analysis_dashboard import build_daily_history, create_daily_trend_chart
+from pages.monthly_detail.main import (
+    build_daily_trend_history,
+    iter_month_activity_frames,
+    select_daily_trend_points,
+)
+from utils.derived_cache import DerivedCache
+from utils.downsampling import DEFAULT_MAX_POINTS
+from utils.synthetic_data import generate_dataset
+
+MONTH_COUNT = 24
+
+
+@pytest.fixture(scope='module')
+def json_data():
+    return generate_dataset(staff_count=8, month_count=MONTH_COUNT)
+
+
+@pytest.fixture(scope='module')
+def months(json_data):
+    prefix = '基本分析_'
+    return sorted(name[len(prefix):-len('.json')] for name in json_data if name.startswith(prefix))
+
+
+@pytest.mark.parametrize('method', ['minmax', 'lttb'])
+def test_daily_trend_history_is_downsampled(json_data, months, method):
+    daily_trend = build_daily_trend_history(
+        iter_month_activity_frames(json_data, months, cache=DerivedCache())
+    )
+    assert len(daily_trend) > DEFAULT_MAX_POINTS
+
+    shown, dropped_points, displayed_points = select_daily_trend_points(daily_trend, method=method)
+
+    assert displayed_points == len(daily_trend)
+    assert dropped_points > 0
+    assert len(shown) == displayed_points - dropped_points
+    assert len(shown) <= DEFAULT_MAX_POINTS
+    # 両端の日付は残る
+    assert shown['date'].iloc[0] == daily_trend['date'].iloc[0]
+    assert shown['date'].iloc[-1] == daily_trend['date'].iloc[-1]
+
+
+def test_daily_trend_without_downsampling_keeps_range(json_data, months):
+    daily_trend = build_daily_trend_history(
+        iter_month_activity_frames(json_data, months, cache=DerivedCache())
+    )
+    display_range = (daily_trend['date'].iloc[10], daily_trend['date'].iloc[40])
+
+    shown, dropped_points, displayed_points = select_daily_trend_points(daily_trend, display_range, method='none')
+
+    assert dropped_points == 0
+    assert displayed_points == len(shown) == 31
+
+
+def test_dashboard_daily_trend_chart_is_downsampled(json_data, months):
+    target_month = months[-1]
+    basic_data = json_data[f'基本分析_{target_month}.json']
+    daily_stats = build_daily_history(basic_data['monthly_analysis'], target_month)
+    assert len(daily_stats) > DEFAULT_MAX_POINTS
+
+    fig = create_daily_trend_chart(daily_stats)
+
+    assert fig is not None
+    for trace in fig.data:
+        assert len(trace.x) <= DEFAULT_MAX_POINTS
+    assert '間引' in fig.layout.title.text
@@ -65,4 +65,31 @@ CARD_STYLE = """
     </div>
     <div style=\"font-size: 0.9em; color: #888; margin-top: 10px;\">{desc}</div>
 </div>
-""" 
\ No newline at end of file
+""" 
+# 詳細データテーブルのページサイズ
+DETAIL_PAGE_SIZE_OPTIONS = [50, 100, 200, 500, 1000]
+DEFAULT_DETAIL_PAGE_SIZE = 100
+
+# パフォーマンス計測パネルを表示するユーザー
+PERF_PANEL_USERS = ['admin']
+
+# 定着率分析のリスクスコア（config.js の既定値）
+# リスク要因ごとの加点
+RISK_WEIGHTS = {
+    'low_activity_rate': 50,
+    'recent_inactivity': 10,
+    'low_performance': 40,
+    'short_tenure_low_activity': 15,
+    'unstable_activity': 10
+}
+# リスク要因の判定基準
+RISK_FACTORS = {
+    'activity_rate_threshold': 50,
+    'recent_activity_days_threshold': 5,
+    'appointment_rate_threshold': 2,
+    'short_tenure_months': 3,
+    'min_activity_days_short_tenure': 10,
+    'activity_variance_threshold': 10
+}
+# リスクレベルの閾値（スコアがこれ以上で高/中リスク）
+RISK_THRESHOLDS = {'high_risk': 50, 'medium_risk': 30}
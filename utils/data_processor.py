@@ -6,6 +6,8 @@ import zipfile
 import os
 from datetime import datetime, timedelta
 import streamlit as st
+from utils.month_store import MonthPartitionedStore
+from utils.perf import perf_stage, timed
 
 def extract_zip_data(uploaded_file):
     """ZipファイルからJSONデータを抽出"""
@@ -14,20 +16,24 @@ def extract_zip_data(uploaded_file):
             # 一時ディレクトリを作成
             with tempfile.TemporaryDirectory() as temp_dir:
                 # Zipファイルを展開
-                zip_ref.extractall(temp_dir)
+                with perf_stage('zip_extract', 'loader') as stage:
+                    zip_ref.extractall(temp_dir)
+                    stage.rows = len(zip_ref.namelist())
                 
                 # JSONファイルを検索
                 json_files = {}
-                for root, dirs, files in os.walk(temp_dir):
-                    for file in files:
-                        if file.endswith('.json'):
-                            file_path = os.path.join(root, file)
-                            try:
-                                with open(file_path, 'r', encoding='utf-8') as f:
-                                    data = json.load(f)
-                                    json_files[file] = data
-                            except Exception as e:
-                                st.error(f"JSONファイル読み込みエラー {file}: {e}")
+                with perf_stage('json_decode', 'loader') as stage:
+                    for root, dirs, files in os.walk(temp_dir):
+                        for file in files:
+                            if file.endswith('.json'):
+                                file_path = os.path.join(root, file)
+                                try:
+                                    with open(file_path, 'r', encoding='utf-8') as f:
+                                        data = json.load(f)
+                                        json_files[file] = data
+                                except Exception as e:
+                                    st.error(f"JSONファイル読み込みエラー {file}: {e}")
+                    stage.rows = len(json_files)
                 
                 return json_files
     except Exception as e:
@@ -36,6 +42,8 @@ def extract_zip_data(uploaded_file):
 
 def get_available_months_from_data(json_data):
     """JSONデータから利用可能な月を抽出"""
+    if isinstance(json_data, MonthPartitionedStore):
+        return json_data.available_months()
     months = set()
     for filename, data in json_data.items():
         # ファイル名から月を抽出（例: 基本分析_2024-09.json）
@@ -49,6 +57,12 @@ def get_available_months_from_data(json_data):
 
 def load_analysis_data_from_json(json_data, month):
     """指定月の分析データをJSONデータから読み込み"""
+    if isinstance(json_data, MonthPartitionedStore):
+        return (
+            json_data.get_document('基本分析', month),
+            json_data.get_document('詳細分析', month),
+            json_data.get_document('月次サマリー', month)
+        )
     basic_data = None
     detail_data = None
     summary_data = None
@@ -65,72 +79,123 @@ def load_analysis_data_from_json(json_data, month):
 
 def load_retention_data_from_json(json_data, month):
     """指定月の定着率分析データをJSONデータから読み込み"""
+    if isinstance(json_data, MonthPartitionedStore):
+        return json_data.get_document('定着率分析', month)
     for filename, data in json_data.items():
         if f'定着率分析_{month}.json' in filename:
             return data
     return None
 
+# daily_activityの商材別指標カラム
+ACTIVITY_METRIC_COLUMNS = [
+    "call_hours", "call_count", "reception_bk", "no_one_in_charge", "disconnect",
+    "charge_connected", "charge_bk", "get_appointment"
+]
+ACTIVITY_COLUMNS = (
+    ["date", "product"] + ACTIVITY_METRIC_COLUMNS
+    + ["staff_name", "branch", "join_date", "product_type"]
+)
+# ファクトテーブルでカテゴリ型にする繰り返しの多い文字列カラム
+ACTIVITY_CATEGORY_COLUMNS = ["product", "staff_name", "branch", "join_date", "product_type"]
+
+def _to_jst_date_string(value):
+    """UTC日時文字列をJSTの日付文字列に変換（変換できない場合はそのまま返す）"""
+    try:
+        return str(pd.to_datetime(value, utc=True).tz_convert('Asia/Tokyo').date())
+    except Exception:
+        return value
+
+def _convert_dates_to_jst(dates):
+    """
+    日付リストをまとめてUTC→JSTの日付文字列に変換
+
+    同じ日付はスタッフ・商材をまたいで繰り返し現れるため、ユニーク値だけを
+    一括変換して全行に対応付ける。
+
+    Args:
+        dates: 日付（UTC日時文字列）のリスト
+
+    Returns:
+        list: JST日付文字列のリスト（変換できない値は元の値のまま）
+    """
+    unique_dates = pd.unique(pd.Series([d for d in dates if d], dtype=object))
+    if len(unique_dates) == 0:
+        return dates
+    
+    converted = pd.to_datetime(pd.Series(unique_dates), utc=True, errors='coerce', format='ISO8601')
+    jst_strings = converted.dt.tz_convert('Asia/Tokyo').dt.strftime('%Y-%m-%d')
+    mapping = {}
+    for original, parsed, jst in zip(unique_dates, converted, jst_strings):
+        # 一括変換できなかった形式のみ個別に変換
+        mapping[original] = jst if not pd.isna(parsed) else _to_jst_date_string(original)
+    return [mapping.get(d, d) if d else d for d in dates]
+
+@timed()
 def extract_daily_activity_from_staff(staff_dict):
     """スタッフごとのdaily_activityをフラットなDataFrameに変換（メイン商材とサブ商材を含む）"""
-    records = []
+    columns = {col: [] for col in ACTIVITY_COLUMNS}
+    
+    def append_product(activity_date, product, staff_name, branch, join_date, product_type):
+        columns["date"].append(activity_date)
+        columns["product"].append(product.get("product"))
+        for col in ACTIVITY_METRIC_COLUMNS:
+            columns[col].append(product.get(col))
+        columns["staff_name"].append(staff_name)
+        columns["branch"].append(branch)
+        columns["join_date"].append(join_date)
+        columns["product_type"].append(product_type)
+    
     for staff_name, staff_data in staff_dict.items():
         branch = staff_data.get("branch")
         join_date = staff_data.get("join_date")
         for activity in staff_data.get("daily_activity", []):
-            # 日付をUTC→JST変換
             activity_date = activity.get("date")
-            if activity_date:
-                try:
-                    # UTC→JST変換
-                    date_jst = pd.to_datetime(activity_date, utc=True).tz_convert('Asia/Tokyo').date()
-                    activity_date = str(date_jst)
-                except:
-                    # 変換に失敗した場合はそのまま使用
-                    pass
             
             # メイン商材の処理
             main = activity.get("main_product", {})
             if main.get("call_count", 0) > 0:  # 架電数が0より大きい場合のみ追加
-                record = {
-                    "date": activity_date,
-                    "product": main.get("product"),
-                    "call_hours": main.get("call_hours"),
-                    "call_count": main.get("call_count"),
-                    "reception_bk": main.get("reception_bk"),
-                    "no_one_in_charge": main.get("no_one_in_charge"),
-                    "disconnect": main.get("disconnect"),
-                    "charge_connected": main.get("charge_connected"),
-                    "charge_bk": main.get("charge_bk"),
-                    "get_appointment": main.get("get_appointment"),
-                    "staff_name": staff_name,
-                    "branch": branch,
-                    "join_date": join_date,
-                    "product_type": "メイン商材"
-                }
-                records.append(record)
+                append_product(activity_date, main, staff_name, branch, join_date, "メイン商材")
             
             # サブ商材の処理
-            sub_products = activity.get("sub_products", [])
-            for sub in sub_products:
+            for sub in activity.get("sub_products", []):
                 if sub.get("call_count", 0) > 0:  # 架電数が0より大きい場合のみ追加
-                    record = {
-                        "date": activity_date,
-                        "product": sub.get("product"),
-                        "call_hours": sub.get("call_hours"),
-                        "call_count": sub.get("call_count"),
-                        "reception_bk": sub.get("reception_bk"),
-                        "no_one_in_charge": sub.get("no_one_in_charge"),
-                        "disconnect": sub.get("disconnect"),
-                        "charge_connected": sub.get("charge_connected"),
-                        "charge_bk": sub.get("charge_bk"),
-                        "get_appointment": sub.get("get_appointment"),
-                        "staff_name": staff_name,
-                        "branch": branch,
-                        "join_date": join_date,
-                        "product_type": "サブ商材"
-                    }
-                    records.append(record)
-    return pd.DataFrame(records)
+                    append_product(activity_date, sub, staff_name, branch, join_date, "サブ商材")
+    
+    if not columns["date"]:
+        return pd.DataFrame()
+    
+    # 日付をUTC→JST変換（ユニーク値のみ一括変換）
+    columns["date"] = _convert_dates_to_jst(columns["date"])
+    return pd.DataFrame(columns)
+
+@timed()
+def build_activity_fact_table(staff_dict):
+    """
+    daily_activityを型付きのファクトテーブルに変換
+
+    extract_daily_activity_from_staffと同じ行・カラムを持ち、日付をdatetime型、
+    指標を数値型（欠損は0）、繰り返しの多い文字列をカテゴリ型にして
+    メモリ使用量を抑える。HTML生成など一括集計向け。
+
+    Args:
+        staff_dict: 月次データのスタッフ辞書
+
+    Returns:
+        pd.DataFrame: 型付きの日次活動データ（データがない場合は空のDataFrame）
+    """
+    df = extract_daily_activity_from_staff(staff_dict)
+    if df.empty:
+        return df
+    
+    df["date"] = pd.to_datetime(df["date"], errors='coerce')
+    for col in ACTIVITY_METRIC_COLUMNS:
+        values = pd.to_numeric(df[col], errors='coerce').fillna(0)
+        # 件数カラムは整数値のみの場合に整数型へ
+        is_count = col != "call_hours" and (values % 1 == 0).all()
+        df[col] = values.astype('int32') if is_count else values.astype('float32')
+    for col in ACTIVITY_CATEGORY_COLUMNS:
+        df[col] = df[col].astype('category')
+    return df
 
 def get_prev_months(month_str, n=3):
     """
@@ -168,13 +233,15 @@ def get_prev_months(month_str, n=3):
         st.error(f"月リスト生成エラー: {e}")
         return []
 
-def load_multi_month_data(json_data, target_months):
+@timed()
+def load_multi_month_data(json_data, target_months, errors=None):
     """
     複数月のデータを読み込んで統合
     
     Args:
         json_data: JSONデータ
         target_months: 対象月のリスト
+        errors: 読み込みエラーの追加先リスト（Noneの場合はst.warningで表示）
         
     Returns:
         dict: 月別データ辞書
@@ -284,7 +351,11 @@ def load_multi_month_data(json_data, target_months):
                         monthly_data[month] = staff_summary
                         
         except Exception as e:
-            st.warning(f"⚠️ {month}のデータ読み込みに失敗: {str(e)}")
+            message = f"⚠️ {month}のデータ読み込みに失敗: {str(e)}"
+            if errors is None:
+                st.warning(message)
+            else:
+                errors.append(message)
             continue
     
     return monthly_data 
@@ -435,13 +506,14 @@ def generate_branch_product_cross_data(summary_data, metric_type="taaan_deals"):
     
     return pd.DataFrame()
 
-def load_product_3month_comparison_data(json_data, selected_month):
+def load_product_3month_comparison_data(json_data, selected_month, errors=None):
     """
     商材別3ヶ月比較データを読み込み
     
     Args:
         json_data: JSONデータ
         selected_month: 基準月
+        errors: 読み込みエラーの追加先リスト（Noneの場合はst.warningで表示）
         
     Returns:
         pd.DataFrame: 3ヶ月分の商材別TAAANデータ
@@ -460,7 +532,11 @@ def load_product_3month_comparison_data(json_data, selected_month):
                     monthly_taaan_data[month] = taaan_product_df
                     
         except Exception as e:
-            st.warning(f"⚠️ {month}のデータ読み込みに失敗: {str(e)}")
+            message = f"⚠️ {month}のデータ読み込みに失敗: {str(e)}"
+            if errors is None:
+                st.warning(message)
+            else:
+                errors.append(message)
             continue
     
     if monthly_taaan_data:
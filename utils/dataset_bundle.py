@@ -0,0 +1,527 @@
+"""データセットバンドル（バイナリ形式）の読み書き
+
+アップロード用Zip（整形済みJSON）の代わりに使えるコンパクトな単一ファイル形式。
+中身はnumpyの圧縮アーカイブ（.npz、allow_pickle=False）で、以下の配列を持つ。
+
+- 文字列辞書: スタッフ名・支部名・商材名・キー名・日付などを一度だけ保持し、
+  他の配列からは整数コードで参照する
+- daily_activity テーブル: 日次活動（1日1行）と商材別指標（1商材1行）の列形式テーブル
+- ノードテーブル: サマリー系など残りのJSON構造を親子関係付きの表として保持し、
+  同一内容のサブツリー（各月ファイルで重複する過去月データなど）は1回だけ格納する
+
+読み込み時はJSONをパースせず、配列から元の辞書構造（ファイル名→データ）を復元する。
+
+変換CLI:
+    python -m utils.dataset_bundle 分析データ.zip -o 分析データ.isbundle
+"""
+import argparse
+import hashlib
+import io
+import json
+import os
+import zipfile
+
+import numpy as np
+
+BUNDLE_EXTENSION = '.isbundle'
+BUNDLE_FORMAT_VERSION = 1
+_VERSION_MEMBER = 'bundle_version.npy'
+
+# daily_activity の商材別指標（generateJson.js の main_product / sub_products と同じ並び）
+PRODUCT_METRIC_KEYS = [
+    'call_hours', 'call_count', 'reception_bk', 'no_one_in_charge', 'disconnect',
+    'charge_connected', 'charge_bk', 'get_appointment'
+]
+_PRODUCT_KEYS = ['product'] + PRODUCT_METRIC_KEYS
+_ACTIVITY_KEYS = ['date', 'main_product', 'sub_products']
+
+# ノード種別
+_DICT, _LIST, _INT, _FLOAT, _STR, _TRUE, _FALSE, _NULL, _REF, _ACTIVITY = range(10)
+
+# 指標値の型コード
+_MISSING, _VALUE_INT, _VALUE_FLOAT, _VALUE_NULL = range(4)
+
+# 文字列コードの特殊値
+_NULL_CODE = -1
+_MISSING_CODE = -2
+
+_INT64_MIN, _INT64_MAX = -(2 ** 63), 2 ** 63 - 1
+
+
+class _StringTable:
+    """文字列辞書（辞書エンコーディング用）"""
+
+    def __init__(self):
+        self._codes = {}
+        self.values = []
+
+    def code(self, value):
+        if value is None:
+            return _NULL_CODE
+        code = self._codes.get(value)
+        if code is None:
+            code = len(self.values)
+            self._codes[value] = code
+            self.values.append(value)
+        return code
+
+    def to_arrays(self):
+        encoded = [value.encode('utf-8') for value in self.values]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(value) for value in encoded])
+        data = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+        return data, offsets
+
+
+def _decode_strings(data, offsets):
+    """文字列辞書の配列をPythonの文字列リストに戻す"""
+    blob = data.tobytes()
+    bounds = offsets.tolist()
+    return [blob[bounds[i]:bounds[i + 1]].decode('utf-8') for i in range(len(bounds) - 1)]
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _is_product_record(product):
+    """列形式テーブルに格納できる商材レコードか判定"""
+    if not isinstance(product, dict) or not set(product) <= set(_PRODUCT_KEYS):
+        return False
+    name = product.get('product')
+    if name is not None and not isinstance(name, str):
+        return False
+    for key in PRODUCT_METRIC_KEYS:
+        value = product.get(key)
+        if value is None:
+            continue
+        if not _is_number(value):
+            return False
+        if isinstance(value, int) and not _INT64_MIN <= value <= _INT64_MAX:
+            return False
+    return True
+
+
+def _is_activity_list(value):
+    """daily_activity のリストとして列形式テーブルに格納できるか判定"""
+    if not isinstance(value, list):
+        return False
+    for entry in value:
+        if not isinstance(entry, dict) or list(entry) != _ACTIVITY_KEYS:
+            return False
+        if entry['date'] is not None and not isinstance(entry['date'], str):
+            return False
+        if not _is_product_record(entry['main_product']):
+            return False
+        subs = entry['sub_products']
+        if not isinstance(subs, list) or not all(_is_product_record(sub) for sub in subs):
+            return False
+    return True
+
+
+class _BundleWriter:
+    """JSONデータを配列群に分解する"""
+
+    def __init__(self):
+        self.strings = _StringTable()
+        # ノードテーブル
+        self.node_parent = []
+        self.node_key = []
+        self.node_kind = []
+        self.node_ival = []
+        self.node_fval = []
+        # daily_activity テーブル（1日1行）
+        self.entry_block = []
+        self.entry_date = []
+        # 商材テーブル（1商材1行）
+        self.product_entry = []
+        self.product_slot = []
+        self.product_name = []
+        self.product_values = []
+        self.product_types = []
+        self.block_count = 0
+        # 重複サブツリーの参照先
+        self._node_by_digest = {}
+        self._block_by_digest = {}
+        self._digest_cache = {}
+
+    # --- 内容ハッシュ ---
+    def _digest(self, value):
+        """サブツリーの内容ハッシュ（型も区別する）"""
+        if isinstance(value, (dict, list)):
+            # 書き込み中は元データが保持されるため、オブジェクトIDで計算結果を使い回す
+            cached = self._digest_cache.get(id(value))
+            if cached is not None:
+                return cached
+        hasher = hashlib.blake2b(digest_size=16)
+        if isinstance(value, dict):
+            hasher.update(b'd')
+            for key, child in value.items():
+                hasher.update(key.encode('utf-8') + b'\x00')
+                hasher.update(self._digest(child))
+        elif isinstance(value, list):
+            hasher.update(b'l')
+            for child in value:
+                hasher.update(self._digest(child))
+        else:
+            hasher.update(type(value).__name__.encode('ascii') + b'\x00' + repr(value).encode('utf-8'))
+        digest = hasher.digest()
+        if isinstance(value, (dict, list)):
+            self._digest_cache[id(value)] = digest
+        return digest
+
+    # --- daily_activity ---
+    def _add_product(self, entry_index, slot, product):
+        self.product_entry.append(entry_index)
+        self.product_slot.append(slot)
+        self.product_name.append(
+            self.strings.code(product['product']) if 'product' in product else _MISSING_CODE
+        )
+        values = []
+        types = []
+        for key in PRODUCT_METRIC_KEYS:
+            if key not in product:
+                values.append(0.0)
+                types.append(_MISSING)
+            elif product[key] is None:
+                values.append(0.0)
+                types.append(_VALUE_NULL)
+            else:
+                values.append(float(product[key]))
+                types.append(_VALUE_INT if isinstance(product[key], int) else _VALUE_FLOAT)
+        self.product_values.append(values)
+        self.product_types.append(types)
+
+    def _add_activity_block(self, activity):
+        block = self.block_count
+        self.block_count += 1
+        for entry in activity:
+            entry_index = len(self.entry_block)
+            self.entry_block.append(block)
+            self.entry_date.append(self.strings.code(entry['date']))
+            self._add_product(entry_index, 0, entry['main_product'])
+            for slot, sub in enumerate(entry['sub_products'], start=1):
+                self._add_product(entry_index, slot, sub)
+        return block
+
+    # --- ノード ---
+    def _append_node(self, parent, key, kind, ival=0, fval=0.0):
+        self.node_parent.append(parent)
+        self.node_key.append(key)
+        self.node_kind.append(kind)
+        self.node_ival.append(ival)
+        self.node_fval.append(fval)
+        return len(self.node_kind) - 1
+
+    def add(self, value, parent=-1, key=_NULL_CODE):
+        """値をノードテーブルに追加し、ノードIDを返す"""
+        if isinstance(value, (dict, list)):
+            digest = self._digest(value)
+            if digest in self._node_by_digest:
+                return self._append_node(parent, key, _REF, ival=self._node_by_digest[digest])
+
+            if value and _is_activity_list(value):
+                block = self._block_by_digest.get(digest)
+                if block is None:
+                    block = self._add_activity_block(value)
+                    self._block_by_digest[digest] = block
+                return self._append_node(parent, key, _ACTIVITY, ival=block)
+
+            kind = _DICT if isinstance(value, dict) else _LIST
+            node = self._append_node(parent, key, kind)
+            if kind == _DICT:
+                for child_key, child in value.items():
+                    self.add(child, node, self.strings.code(child_key))
+            else:
+                for child in value:
+                    self.add(child, node)
+            self._node_by_digest[digest] = node
+            return node
+
+        if value is None:
+            return self._append_node(parent, key, _NULL)
+        if value is True:
+            return self._append_node(parent, key, _TRUE)
+        if value is False:
+            return self._append_node(parent, key, _FALSE)
+        if isinstance(value, int) and _INT64_MIN <= value <= _INT64_MAX:
+            return self._append_node(parent, key, _INT, ival=value)
+        if _is_number(value):
+            return self._append_node(parent, key, _FLOAT, fval=float(value))
+        if isinstance(value, str):
+            return self._append_node(parent, key, _STR, ival=self.strings.code(value))
+        raise TypeError(f"バンドルに格納できない値です: {type(value).__name__}")
+
+    def to_arrays(self, file_names, file_roots):
+        string_data, string_offsets = self.strings.to_arrays()
+        n_products = len(self.product_entry)
+        return {
+            'bundle_version': np.array([BUNDLE_FORMAT_VERSION], dtype=np.int32),
+            'string_data': string_data,
+            'string_offsets': string_offsets,
+            'file_names': np.array(file_names, dtype=np.int32),
+            'file_roots': np.array(file_roots, dtype=np.int32),
+            'node_parent': np.array(self.node_parent, dtype=np.int32),
+            'node_key': np.array(self.node_key, dtype=np.int32),
+            'node_kind': np.array(self.node_kind, dtype=np.uint8),
+            'node_ival': np.array(self.node_ival, dtype=np.int64),
+            'node_fval': np.array(self.node_fval, dtype=np.float64),
+            'block_count': np.array([self.block_count], dtype=np.int32),
+            'entry_block': np.array(self.entry_block, dtype=np.int32),
+            'entry_date': np.array(self.entry_date, dtype=np.int32),
+            'product_entry': np.array(self.product_entry, dtype=np.int32),
+            'product_slot': np.array(self.product_slot, dtype=np.int16),
+            'product_name': np.array(self.product_name, dtype=np.int32),
+            'product_values': np.array(self.product_values, dtype=np.float64).reshape(n_products, len(PRODUCT_METRIC_KEYS)),
+            'product_types': np.array(self.product_types, dtype=np.uint8).reshape(n_products, len(PRODUCT_METRIC_KEYS)),
+        }
+
+
+def write_bundle(json_data, output):
+    """
+    JSONデータ（ファイル名→データ）をバンドル形式で書き出す
+
+    Args:
+        json_data: ファイル名をキーとするJSONデータの辞書
+        output: 出力先のパスまたはバイナリファイルオブジェクト
+    """
+    writer = _BundleWriter()
+    file_names = []
+    file_roots = []
+    for filename, data in json_data.items():
+        file_names.append(writer.strings.code(filename))
+        file_roots.append(writer.add(data))
+    np.savez_compressed(output, **writer.to_arrays(file_names, file_roots))
+
+
+def _decode_metric_columns(values, types):
+    """商材指標の配列を列ごとのPython値リストに戻す（欠損キーは_MISSINGのまま）"""
+    columns = []
+    int_values = values.astype(np.int64)
+    for j in range(values.shape[1]):
+        column_types = types[:, j]
+        if (column_types == _VALUE_INT).all():
+            columns.append(int_values[:, j].tolist())
+            continue
+        if (column_types == _VALUE_FLOAT).all():
+            columns.append(values[:, j].tolist())
+            continue
+        ints = int_values[:, j].tolist()
+        floats = values[:, j].tolist()
+        column = []
+        for t, i, f in zip(column_types.tolist(), ints, floats):
+            if t == _VALUE_INT:
+                column.append(i)
+            elif t == _VALUE_FLOAT:
+                column.append(f)
+            elif t == _VALUE_NULL:
+                column.append(None)
+            else:
+                column.append(_MISSING)
+        columns.append(column)
+    return columns
+
+
+def _decode_activity_blocks(arrays, strings):
+    """daily_activity テーブルからブロックごとの日次活動リストを復元"""
+    block_count = int(arrays['block_count'][0])
+    blocks = [[] for _ in range(block_count)]
+    entries = []
+    for block, date_code in zip(arrays['entry_block'].tolist(), arrays['entry_date'].tolist()):
+        entry = {
+            'date': strings[date_code] if date_code >= 0 else None,
+            'main_product': None,
+            'sub_products': []
+        }
+        entries.append(entry)
+        blocks[block].append(entry)
+
+    metric_columns = _decode_metric_columns(arrays['product_values'], arrays['product_types'])
+    has_missing = (arrays['product_types'] == _MISSING).any() or (arrays['product_name'] == _MISSING_CODE).any()
+    rows = zip(
+        arrays['product_entry'].tolist(),
+        arrays['product_slot'].tolist(),
+        arrays['product_name'].tolist(),
+        *metric_columns
+    )
+    for entry_index, slot, name_code, *metrics in rows:
+        product = dict(zip(
+            _PRODUCT_KEYS,
+            [strings[name_code] if name_code >= 0 else (None if name_code == _NULL_CODE else _MISSING)] + metrics
+        ))
+        if has_missing:
+            product = {key: value for key, value in product.items() if value is not _MISSING}
+        if slot == 0:
+            entries[entry_index]['main_product'] = product
+        else:
+            entries[entry_index]['sub_products'].append(product)
+    return blocks
+
+
+def _decode_nodes(arrays, strings, blocks):
+    """ノードテーブルから各ノードの値を復元"""
+    parents = arrays['node_parent'].tolist()
+    keys = arrays['node_key'].tolist()
+    kinds = arrays['node_kind'].tolist()
+    ivals = arrays['node_ival'].tolist()
+    fvals = arrays['node_fval'].tolist()
+
+    values = [None] * len(kinds)
+    for node, (parent, key, kind, ival, fval) in enumerate(zip(parents, keys, kinds, ivals, fvals)):
+        if kind == _DICT:
+            value = {}
+        elif kind == _LIST:
+            value = []
+        elif kind == _INT:
+            value = ival
+        elif kind == _FLOAT:
+            value = fval
+        elif kind == _STR:
+            value = strings[ival]
+        elif kind == _TRUE:
+            value = True
+        elif kind == _FALSE:
+            value = False
+        elif kind == _NULL:
+            value = None
+        elif kind == _REF:
+            value = values[ival]
+        elif kind == _ACTIVITY:
+            value = blocks[ival]
+        else:
+            raise ValueError(f"不明なノード種別です: {kind}")
+        values[node] = value
+
+        if parent >= 0:
+            container = values[parent]
+            if isinstance(container, dict):
+                container[strings[key]] = value
+            else:
+                container.append(value)
+    return values
+
+
+def read_bundle(source):
+    """
+    バンドルを読み込み、JSONデータ（ファイル名→データ）を復元する
+
+    重複していたサブツリーは復元後も同じオブジェクトを共有する。
+
+    Args:
+        source: バンドルのパスまたはバイナリファイルオブジェクト
+
+    Returns:
+        dict: ファイル名をキーとするJSONデータ
+    """
+    with np.load(source, allow_pickle=False) as archive:
+        arrays = {name: archive[name] for name in archive.files}
+
+    version = int(arrays['bundle_version'][0])
+    if version != BUNDLE_FORMAT_VERSION:
+        raise ValueError(f"未対応のバンドル形式バージョンです: {version}")
+
+    strings = _decode_strings(arrays['string_data'], arrays['string_offsets'])
+    blocks = _decode_activity_blocks(arrays, strings)
+    values = _decode_nodes(arrays, strings, blocks)
+    return {
+        strings[name]: values[root]
+        for name, root in zip(arrays['file_names'].tolist(), arrays['file_roots'].tolist())
+    }
+
+
+def is_bundle(source):
+    """
+    ファイルがバンドル形式か判定（Zip形式のアップロードと区別する）
+
+    Args:
+        source: パスまたはシーク可能なバイナリファイルオブジェクト
+
+    Returns:
+        bool: バンドル形式の場合True
+    """
+    position = source.tell() if hasattr(source, 'tell') else None
+    try:
+        with zipfile.ZipFile(source) as archive:
+            return _VERSION_MEMBER in archive.namelist()
+    except (zipfile.BadZipFile, OSError):
+        return False
+    finally:
+        if position is not None:
+            source.seek(position)
+
+
+def read_json_zip(zip_path):
+    """
+    アップロード用Zipから分析JSONを読み込む（ファイル名はディレクトリを除いた名前）
+
+    Args:
+        zip_path: Zipファイルのパス
+
+    Returns:
+        dict: ファイル名をキーとするJSONデータ
+    """
+    json_data = {}
+    with zipfile.ZipFile(zip_path) as archive:
+        for name in archive.namelist():
+            if name.endswith('.json'):
+                json_data[os.path.basename(name)] = json.loads(archive.read(name).decode('utf-8'))
+    return json_data
+
+
+def convert_zip_to_bundle(zip_path, output_path):
+    """
+    分析JSONのZipをバンドルに変換
+
+    Args:
+        zip_path: 変換元Zipのパス
+        output_path: 出力するバンドルのパス
+
+    Returns:
+        dict: 読み込んだJSONデータ（検証用）
+    """
+    json_data = read_json_zip(zip_path)
+    if not json_data:
+        raise ValueError(f"JSONファイルが見つかりませんでした: {zip_path}")
+
+    # 書き込み途中のファイルを残さないよう一時ファイル経由で置き換える
+    tmp_path = f"{output_path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        write_bundle(json_data, f)
+    os.replace(tmp_path, output_path)
+    return json_data
+
+
+def main(argv=None):
+    """コマンドライン実行"""
+    parser = argparse.ArgumentParser(
+        description='分析JSONのZipをコンパクトなバイナリバンドルに変換します'
+    )
+    parser.add_argument('zip', help='基本分析/詳細分析/月次サマリー/定着率分析のJSONを含むZipファイル')
+    parser.add_argument('-o', '--output', help=f'出力先（省略時はZipと同じ場所に{BUNDLE_EXTENSION}で出力）')
+    parser.add_argument('--verify', action='store_true', help='変換後に読み戻して元データと一致するか確認')
+    args = parser.parse_args(argv)
+
+    output_path = args.output or os.path.splitext(args.zip)[0] + BUNDLE_EXTENSION
+    try:
+        json_data = convert_zip_to_bundle(args.zip, output_path)
+    except (OSError, ValueError, zipfile.BadZipFile) as e:
+        print(f"❌ 変換に失敗しました: {e}")
+        return 1
+
+    zip_size = os.path.getsize(args.zip)
+    bundle_size = os.path.getsize(output_path)
+    print(f"✅ {len(json_data)}個のJSONファイルを変換しました → {output_path}")
+    print(f"📦 {zip_size:,} bytes → {bundle_size:,} bytes（{zip_size / max(bundle_size, 1):.1f}分の1）")
+
+    if args.verify:
+        with open(output_path, 'rb') as f:
+            restored = read_bundle(io.BytesIO(f.read()))
+        if restored != json_data:
+            print("❌ 読み戻したデータが元データと一致しません")
+            return 1
+        print("✅ 読み戻したデータが元データと一致しました")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,123 @@
+"""派生データキャッシュ
+
+アップロードデータから計算した集計結果（月別DataFrame、3ヶ月比較用の
+集計など）をセッション単位で保持し、タブ切り替えや再実行時の再計算を避ける
+"""
+import threading
+import streamlit as st
+
+DERIVED_CACHE_SESSION_KEY = 'derived_cache'
+
+
+class DerivedCache:
+    """データセット単位の派生データキャッシュ"""
+
+    def __init__(self, dataset_token=None):
+        self.dataset_token = dataset_token
+        self._entries = {}
+        # キー -> 推定メモリ使用量（バイト）。entry_sizes で計測したものを保持
+        self._sizes = {}
+        # キー -> 計算中であることを示すイベント（同じキーを複数スレッドで重複計算しない）
+        self._building = {}
+        self._lock = threading.RLock()
+
+    def get_or_build(self, key, builder):
+        """
+        キャッシュ済みの値を返し、未計算であればbuilderで計算して保持する
+
+        他のスレッド（先読み）が同じキーを計算中の場合は、その完了を待って結果を使う。
+
+        Args:
+            key: キャッシュキー（ハッシュ可能な値）
+            builder: 値を計算する引数なし関数
+
+        Returns:
+            キャッシュされた値
+        """
+        while True:
+            with self._lock:
+                if key in self._entries:
+                    return self._entries[key]
+                building = self._building.get(key)
+                if building is None:
+                    building = self._building[key] = threading.Event()
+                    break
+            # 計算中のスレッドが失敗した場合は、このスレッドで計算し直す
+            building.wait()
+        try:
+            value = builder()
+            with self._lock:
+                self._entries.setdefault(key, value)
+                return self._entries[key]
+        finally:
+            with self._lock:
+                self._building.pop(key, None)
+            building.set()
+
+    def contains(self, key):
+        """キーが計算済みか判定"""
+        with self._lock:
+            return key in self._entries
+
+    def discard(self, key):
+        """指定キーの値を破棄（未計算の場合は何もしない）"""
+        with self._lock:
+            self._entries.pop(key, None)
+            self._sizes.pop(key, None)
+
+    def entry_sizes(self, sizer):
+        """
+        各エントリの推定メモリ使用量を取得
+
+        値は変更されない前提で、一度計測したエントリは再計測しない。
+
+        Args:
+            sizer: 値からバイト数を求める関数
+
+        Returns:
+            dict: キー -> バイト数
+        """
+        with self._lock:
+            entries = dict(self._entries)
+            missing = [key for key in entries if key not in self._sizes]
+        measured = {key: sizer(entries[key]) for key in missing}
+        with self._lock:
+            for key, size in measured.items():
+                if self._entries.get(key) is entries[key]:
+                    self._sizes[key] = size
+            return {key: self._sizes[key] for key in self._entries if key in self._sizes}
+
+    def clear(self):
+        """キャッシュを全て破棄"""
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+
+def _dataset_token(json_data):
+    """アップロードデータを識別するトークンを生成"""
+    return (st.session_state.get('uploaded_file_name'), id(json_data))
+
+
+def get_derived_cache(json_data):
+    """
+    セッションの派生データキャッシュを取得
+
+    アップロードデータが差し替えられた場合はキャッシュを作り直す。
+
+    Args:
+        json_data: アップロードされたJSONデータ
+
+    Returns:
+        DerivedCache: 派生データキャッシュ
+    """
+    token = _dataset_token(json_data)
+    cache = st.session_state.get(DERIVED_CACHE_SESSION_KEY)
+    if cache is None or cache.dataset_token != token:
+        cache = DerivedCache(token)
+        st.session_state[DERIVED_CACHE_SESSION_KEY] = cache
+    return cache
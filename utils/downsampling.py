@@ -0,0 +1,155 @@
+"""時系列データの間引き（ダウンサンプリング）処理
+
+日次推移などの長い時系列を、チャートの表示幅に見合う点数まで間引く。
+min/max 方式と LTTB（Largest-Triangle-Three-Buckets）方式に対応し、
+いずれも区間内のピークと谷を残す。
+"""
+import numpy as np
+import pandas as pd
+
+# チャート1枚あたりの最大描画点数
+DEFAULT_MAX_POINTS = 500
+
+DOWNSAMPLE_METHODS = {
+    'minmax': 'min/max',
+    'lttb': 'LTTB'
+}
+
+
+def _to_numeric_axis(values):
+    """X軸の値（日時または数値）を距離計算用のfloat配列に変換"""
+    series = pd.Series(values)
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series.astype('int64').to_numpy(dtype=float)
+    return pd.to_numeric(series, errors='coerce').fillna(0).to_numpy(dtype=float)
+
+
+def _minmax_indices(y, n_out):
+    """
+    区間ごとに最小値・最大値の点を残すインデックスを算出
+
+    Args:
+        y: Y値の配列
+        n_out: 出力点数の上限
+
+    Returns:
+        np.ndarray: 残す点のインデックス（昇順）
+    """
+    n = len(y)
+    n_buckets = max((n_out - 2) // 2, 1)
+    edges = np.linspace(1, n - 1, n_buckets + 1).astype(int)
+
+    indices = [0, n - 1]
+    for start, end in zip(edges[:-1], edges[1:]):
+        if end <= start:
+            continue
+        bucket = y[start:end]
+        indices.append(start + int(np.argmin(bucket)))
+        indices.append(start + int(np.argmax(bucket)))
+    return np.unique(indices)
+
+
+def _lttb_indices(x, y, n_out):
+    """
+    LTTB法で残す点のインデックスを算出
+
+    Args:
+        x: X値の配列（float）
+        y: Y値の配列
+        n_out: 出力点数
+
+    Returns:
+        np.ndarray: 残す点のインデックス（昇順）
+    """
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    every = (n - 2) / (n_out - 2)
+    indices = np.empty(n_out, dtype=int)
+    indices[0] = 0
+    indices[-1] = n - 1
+
+    a = 0
+    for i in range(n_out - 2):
+        start = int(np.floor(i * every)) + 1
+        end = int(np.floor((i + 1) * every)) + 1
+
+        # 次の区間の平均点（最後の区間は終点）
+        next_start = end
+        next_end = min(int(np.floor((i + 2) * every)) + 1, n)
+        if next_start >= next_end:
+            avg_x, avg_y = x[n - 1], y[n - 1]
+        else:
+            avg_x = x[next_start:next_end].mean()
+            avg_y = y[next_start:next_end].mean()
+
+        # 直前に選んだ点・次区間の平均点と作る三角形の面積が最大の点を選ぶ
+        area = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(np.argmax(area))
+        indices[i + 1] = a
+
+    return indices
+
+
+def downsample_time_series(df, x_col, y_cols, max_points=DEFAULT_MAX_POINTS, method='minmax'):
+    """
+    時系列DataFrameを表示用に間引く
+
+    複数のY列を指定した場合は列ごとにピーク・谷を残す点を選び、その和集合を返す
+    （全列で同じX位置を共有する）。表示期間で絞り込んでから渡すことで、
+    期間を狭めるほど元の解像度に近づく。
+
+    Args:
+        df: X列でソート済みのDataFrame
+        x_col: X軸の列名
+        y_cols: 間引き判定に使うY列名のリスト
+        max_points: 出力点数の上限
+        method: 'minmax' または 'lttb'
+
+    Returns:
+        tuple: (間引き後のDataFrame, 間引いた点数)
+    """
+    if method not in DOWNSAMPLE_METHODS:
+        raise ValueError(f"未対応の間引き方式です: {method}")
+
+    if df is None or df.empty:
+        return df, 0
+
+    n = len(df)
+    if n <= max_points or not y_cols:
+        return df, 0
+
+    # 列ごとの点数枠（和集合がmax_pointsを超えないように按分）
+    per_column = max(max_points // len(y_cols), 3)
+    x = _to_numeric_axis(df[x_col])
+
+    keep = set()
+    for col in y_cols:
+        y = pd.to_numeric(df[col], errors='coerce').fillna(0).to_numpy(dtype=float)
+        if method == 'lttb':
+            keep.update(_lttb_indices(x, y, per_column).tolist())
+        else:
+            keep.update(_minmax_indices(y, per_column).tolist())
+
+    result = df.iloc[sorted(keep)]
+    return result, n - len(result)
+
+
+def format_downsample_note(dropped, total):
+    """
+    間引き結果の説明文を作成
+
+    Args:
+        dropped: 間引いた点数
+        total: 間引き前の点数
+
+    Returns:
+        str: 説明文（間引きなしの場合は空文字）
+    """
+    if not dropped:
+        return ""
+    return f"表示点数を {total - dropped:,}/{total:,} 点に間引いています（{dropped:,}点を省略、ピーク・谷は保持）"
@@ -0,0 +1,191 @@
+"""データエクスポート処理
+
+DataFrameをCSV（UTF-8 BOM付き）・Parquet・Excelに分割書き込みで出力する。
+月別のDataFrameなど複数のフレームを順に受け取り、一定行数ごとに書き込むため、
+全期間分を1つのDataFrameや文字列に結合せずに出力できる。
+Parquetはpyarrow、Excelはopenpyxlがインストールされている場合のみ利用できる。
+"""
+import importlib.util
+import io
+import tempfile
+
+import pandas as pd
+
+# 1回の書き込みで扱う行数
+EXPORT_CHUNK_ROWS = 50_000
+# これを超える出力は一時ファイル（ディスク）に書き出す
+SPOOL_MAX_BYTES = 16 * 1024 * 1024
+# Excelの1シートあたりの最大行数（見出し行を除く）
+EXCEL_MAX_ROWS = 1_048_575
+
+EXPORT_FORMATS = {
+    'csv': {
+        'label': 'CSV',
+        'extension': '.csv',
+        'mime': 'text/csv',
+        'module': None
+    },
+    'parquet': {
+        'label': 'Parquet',
+        'extension': '.parquet',
+        'mime': 'application/vnd.apache.parquet',
+        'module': 'pyarrow'
+    },
+    'xlsx': {
+        'label': 'Excel',
+        'extension': '.xlsx',
+        'mime': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        'module': 'openpyxl'
+    }
+}
+
+
+def get_available_export_formats():
+    """
+    利用可能なエクスポート形式を取得
+
+    Returns:
+        tuple: (利用可能な形式のリスト, 依存パッケージ不足で利用できない形式のリスト)
+    """
+    available = []
+    unavailable = []
+    for fmt, spec in EXPORT_FORMATS.items():
+        module = spec['module']
+        if module is None or importlib.util.find_spec(module) is not None:
+            available.append(fmt)
+        else:
+            unavailable.append(fmt)
+    return available, unavailable
+
+
+def iter_chunks(frames, chunk_rows=EXPORT_CHUNK_ROWS):
+    """
+    DataFrameの列を一定行数ごとのチャンクに分けて返す
+
+    Args:
+        frames: DataFrameのイテラブル（ジェネレーター可）
+        chunk_rows: 1チャンクの最大行数
+
+    Yields:
+        pd.DataFrame: チャンク（列は最初のフレームに揃える）
+    """
+    columns = None
+    for frame in frames:
+        if frame is None or frame.empty:
+            continue
+        if columns is None:
+            columns = list(frame.columns)
+        elif list(frame.columns) != columns:
+            frame = frame.reindex(columns=columns)
+        for start in range(0, len(frame), chunk_rows):
+            yield frame.iloc[start:start + chunk_rows]
+
+
+def _write_csv(chunks, output):
+    """CSV（UTF-8 BOM付き）を書き込み"""
+    text = io.TextIOWrapper(output, encoding='utf-8-sig', newline='')
+    try:
+        for i, chunk in enumerate(chunks):
+            chunk.to_csv(text, index=False, header=(i == 0))
+        text.flush()
+    finally:
+        # 書き込み先を閉じないよう切り離す
+        text.detach()
+
+
+def _write_parquet(chunks, output):
+    """Parquetを書き込み（チャンクごとに1行グループ）"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    writer = None
+    try:
+        for chunk in chunks:
+            # カテゴリ型は月ごとにカテゴリが異なるため文字列として書き出す
+            chunk = chunk.astype({
+                col: 'object' for col in chunk.columns
+                if isinstance(chunk[col].dtype, pd.CategoricalDtype)
+            })
+            if writer is None:
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                writer = pq.ParquetWriter(output, table.schema)
+            else:
+                table = pa.Table.from_pandas(chunk, schema=writer.schema, preserve_index=False)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def _write_xlsx(chunks, output, sheet_name):
+    """Excelを書き込み（書き込み専用モードで行単位に出力し、上限行数で次のシートへ）"""
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = None
+    sheet_rows = 0
+    sheet_count = 0
+    columns = None
+    for chunk in chunks:
+        if columns is None:
+            columns = list(chunk.columns)
+        values = chunk.astype(object).where(chunk.notna(), None).itertuples(index=False, name=None)
+        for row in values:
+            if sheet is None or sheet_rows >= EXCEL_MAX_ROWS:
+                sheet_count += 1
+                title = sheet_name if sheet_count == 1 else f"{sheet_name}_{sheet_count}"
+                sheet = workbook.create_sheet(title=title[:31])
+                sheet.append(columns)
+                sheet_rows = 0
+            sheet.append(list(row))
+            sheet_rows += 1
+    if sheet is None:
+        workbook.create_sheet(title=sheet_name[:31])
+    workbook.save(output)
+
+
+def write_export(frames, fmt, output, sheet_name='data', chunk_rows=EXPORT_CHUNK_ROWS):
+    """
+    DataFrame群を指定形式で書き込む
+
+    Args:
+        frames: DataFrameのイテラブル（月別のジェネレーターなど）
+        fmt: 出力形式（'csv' / 'parquet' / 'xlsx'）
+        output: 書き込み先のバイナリファイルオブジェクト
+        sheet_name: Excelのシート名
+        chunk_rows: 1回の書き込みで扱う行数
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"未対応のエクスポート形式です: {fmt}")
+
+    chunks = iter_chunks(frames, chunk_rows)
+    if fmt == 'csv':
+        _write_csv(chunks, output)
+    elif fmt == 'parquet':
+        _write_parquet(chunks, output)
+    else:
+        _write_xlsx(chunks, output, sheet_name)
+
+
+def export_to_spooled_file(frames, fmt, sheet_name='data'):
+    """
+    DataFrame群を一時ファイルに書き出す
+
+    小さい出力はメモリ上に、SPOOL_MAX_BYTESを超える出力はディスク上に置かれる。
+
+    Args:
+        frames: DataFrameのイテラブル
+        fmt: 出力形式（'csv' / 'parquet' / 'xlsx'）
+        sheet_name: Excelのシート名
+
+    Returns:
+        tempfile.SpooledTemporaryFile: 先頭にシーク済みの出力ファイル
+    """
+    output = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES, mode='w+b')
+    try:
+        write_export(frames, fmt, output, sheet_name=sheet_name)
+    except Exception:
+        output.close()
+        raise
+    output.seek(0)
+    return output
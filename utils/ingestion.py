@@ -0,0 +1,204 @@
+"""アップロードデータのバックグラウンド取り込み
+
+アップロードされたZip/バンドルファイルの展開・JSONデコード・月別パーティションへの正規化を
+ワーカースレッドで実行する。Zipのメンバーは月ごとにまとめて新しい月から順に処理し、
+1ヶ月分を取り込むたびに月別パーティションストアのスナップショットを公開するため、
+画面側は取り込み済みの月から先に表示できる。
+
+ワーカースレッドではStreamlitの描画APIを呼び出さず、エラーは記録して画面側で表示する。
+"""
+import io
+import json
+import os
+import threading
+import time
+import zipfile
+
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+from utils.dataset_bundle import is_bundle, read_bundle
+from utils.month_store import MonthPartitionedStore, _month_from_filename
+from utils.perf import perf_stage
+
+INGESTION_JOB_KEY = 'ingestion_job'
+# 取り込み完了後に1回だけ表示する結果
+INGESTION_SUMMARY_KEY = 'ingestion_summary'
+
+
+class IngestionJob:
+    """1ファイル分のバックグラウンド取り込み"""
+
+    def __init__(self, file_name, content):
+        self.file_name = file_name
+        self._content = content
+        self.total_files = 0
+        self.done_files = 0
+        self.total_bytes = len(content)
+        self.done_bytes = 0
+        self.started = time.perf_counter()
+        self.finished_at = None
+        self.errors = []
+        # 公開済みのスナップショットと、その版数（取り込んだ月が増えるたびに増える）
+        self.store = None
+        self.version = 0
+        self._store = MonthPartitionedStore()
+        self._cancelled = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def finished(self):
+        return self.finished_at is not None
+
+    def start(self):
+        """ワーカースレッドを開始（Streamlitの実行中であれば計測記録のためにコンテキストを引き継ぐ）"""
+        self._thread = threading.Thread(
+            target=self._run, name=f'ingestion-{self.file_name}', daemon=True
+        )
+        ctx = get_script_run_ctx(suppress_warning=True)
+        if ctx is not None:
+            add_script_run_ctx(self._thread, ctx)
+        self._thread.start()
+
+    def cancel(self):
+        """取り込みを中止（処理中のメンバーの完了後に停止する）"""
+        self._cancelled.set()
+
+    def join(self, timeout=None):
+        """ワーカースレッドの終了を待つ"""
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def progress(self):
+        """
+        進捗を取得
+
+        Returns:
+            dict: 処理済み/全ファイル数、処理済み/全バイト数、経過秒数、残り時間の推定（秒）
+        """
+        with self._lock:
+            elapsed = (self.finished_at or time.perf_counter()) - self.started
+            eta = None
+            if 0 < self.done_bytes < self.total_bytes:
+                eta = elapsed * (self.total_bytes - self.done_bytes) / self.done_bytes
+            return {
+                'done_files': self.done_files,
+                'total_files': self.total_files,
+                'done_bytes': self.done_bytes,
+                'total_bytes': self.total_bytes,
+                'elapsed_seconds': elapsed,
+                'eta_seconds': eta,
+                'ready_months': self.store.available_months() if self.store is not None else []
+            }
+
+    def _advance(self, files, size):
+        with self._lock:
+            self.done_files += files
+            self.done_bytes += size
+
+    def _publish(self):
+        """取り込み済みの内容をスナップショットとして公開"""
+        snapshot = self._store.snapshot()
+        with self._lock:
+            self.store = snapshot
+            self.version += 1
+
+    def _run(self):
+        try:
+            if is_bundle(io.BytesIO(self._content)):
+                self._ingest_bundle()
+            else:
+                self._ingest_zip()
+        except Exception as e:
+            self.errors.append(f"ファイル処理エラー: {e}")
+        finally:
+            # 取り込み後は元ファイルの内容を保持しない
+            self._content = None
+            self._store = None
+            with self._lock:
+                self.finished_at = time.perf_counter()
+
+    def _ingest_batch(self, batch):
+        """1ヶ月分のJSONデータを月別パーティションに取り込んで公開"""
+        if not batch or self._cancelled.is_set():
+            return
+        # 循環importを避けるためここで読み込む（utils.memory は取り込み中のジョブを参照する）
+        from utils.memory import deep_sizeof
+        with perf_stage('build_month_store', 'loader') as stage:
+            self._store.ingest(batch)
+            stage.rows = len(self._store.partitions)
+        # メモリ予算の判定で画面側のスレッドがデータ全体をたどらないよう、取り込んだ分をここで計測する
+        with perf_stage('measure_month_store', 'loader'):
+            self._store.measure_memory(deep_sizeof)
+        self._publish()
+
+    def _ingest_zip(self):
+        with zipfile.ZipFile(io.BytesIO(self._content)) as zip_ref:
+            members = [
+                info for info in zip_ref.infolist()
+                if not info.is_dir() and info.filename.endswith('.json')
+            ]
+            with self._lock:
+                self.total_files = len(members)
+                # 進捗はZip内の圧縮後サイズで数える（ディレクトリ等は最初から処理済み）
+                self.total_bytes = sum(info.compress_size for info in members) or 1
+
+            for month, group in _group_members_by_month(members):
+                if self._cancelled.is_set():
+                    return
+                batch = {}
+                with perf_stage('json_decode', 'loader') as stage:
+                    for info in group:
+                        file_name = os.path.basename(info.filename)
+                        try:
+                            batch[file_name] = json.loads(zip_ref.read(info).decode('utf-8'))
+                        except Exception as e:
+                            self.errors.append(f"JSONファイル読み込みエラー {file_name}: {e}")
+                        self._advance(1, info.compress_size)
+                    stage.rows = len(batch)
+                self._ingest_batch(batch)
+
+    def _ingest_bundle(self):
+        with perf_stage('read_bundle', 'loader') as stage:
+            json_data = read_bundle(io.BytesIO(self._content))
+            stage.rows = len(json_data)
+        with self._lock:
+            self.total_files = len(json_data)
+        self._advance(0, self.total_bytes)
+        groups = {}
+        for file_name, data in json_data.items():
+            groups.setdefault(_month_from_filename(file_name), {})[file_name] = data
+        for month in _newest_first(groups):
+            self._ingest_batch(groups[month])
+            self._advance(len(groups[month]), 0)
+
+
+def _newest_first(months):
+    """月の新しい順（月のないファイルは最後）"""
+    ordered = sorted((month for month in months if month is not None), reverse=True)
+    return ordered + [None] if None in months else ordered
+
+
+def _group_members_by_month(members):
+    """Zipのメンバーを月ごとにまとめ、新しい月から順に返す"""
+    groups = {}
+    for info in members:
+        groups.setdefault(_month_from_filename(os.path.basename(info.filename)), []).append(info)
+    return [(month, groups[month]) for month in _newest_first(groups)]
+
+
+def start_ingestion(file_name, content):
+    """
+    バックグラウンド取り込みを開始
+
+    Args:
+        file_name: アップロードファイル名
+        content: ファイルの内容（バイト列）
+
+    Returns:
+        IngestionJob: 開始した取り込み
+    """
+    job = IngestionJob(file_name, content)
+    job.start()
+    return job
+
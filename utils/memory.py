@@ -0,0 +1,443 @@
+"""メモリ使用量の計測と予算管理
+
+各セッションが保持するデータを階層（tier）ごとに計測し、設定された予算を超えた場合に解放する。
+
+- raw: アップロードデータ（session_state['json_data']）
+- derived: 派生データキャッシュ
+
+予算超過時は、まず派生データ（再計算できるもの）を、それでも足りない場合に
+アップロードデータ（アップロード済みファイルから再読み込みできるもの）を解放する。
+セッションあたりの予算は各セッション自身のデータに、全体の予算はプロセス内の
+全セッションの合計に適用する。管理者向けにtracemallocのスナップショットも取得できる。
+"""
+import os
+import sqlite3
+import sys
+import threading
+import time
+import tracemalloc
+import types
+import weakref
+
+import numpy as np
+import pandas as pd
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from config import get_config
+from utils.derived_cache import DERIVED_CACHE_SESSION_KEY
+from utils.ingestion import INGESTION_JOB_KEY
+
+RAW_DATA_KEY = 'json_data'
+# 解放したことを次回の再実行で利用者に知らせるためのキー
+EVICTION_NOTICE_KEY = 'memory_eviction_notice'
+# 単独で予算を超えるため読み込みを取り消したアップロードファイル名
+REJECTED_UPLOAD_KEY = 'memory_rejected_upload'
+# 階層と表示名
+MEMORY_TIERS = {
+    'raw': 'アップロードデータ',
+    'derived': '派生データ'
+}
+# 計測時に中身をたどらない型（モジュールやクラスなどプロセス内で共有されるもの）
+_SHARED_TYPES = (
+    type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType,
+    types.MethodType, weakref.ref
+)
+
+
+def deep_sizeof(obj):
+    """
+    オブジェクトが参照する全体の推定メモリ使用量を取得
+
+    DataFrame/Seriesは memory_usage(deep=True)、numpy配列は nbytes、
+    SQLite接続はページ数×ページサイズで見積もる。同じオブジェクトは1回だけ数える。
+
+    Args:
+        obj: 計測対象
+
+    Returns:
+        int: バイト数
+    """
+    seen = set()
+    stack = [obj]
+    total = 0
+    while stack:
+        item = stack.pop()
+        if id(item) in seen or isinstance(item, _SHARED_TYPES):
+            continue
+        seen.add(id(item))
+
+        if isinstance(item, pd.DataFrame):
+            total += int(item.memory_usage(index=True, deep=True).sum())
+        elif isinstance(item, (pd.Series, pd.Index)):
+            total += int(item.memory_usage(deep=True))
+        elif isinstance(item, (np.ndarray, str, bytes, bytearray, int, float, bool)) or item is None:
+            # numpy配列は自身がデータを持つ場合のみ getsizeof にデータ部分が含まれる
+            total += sys.getsizeof(item)
+        elif isinstance(item, dict):
+            total += sys.getsizeof(item)
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset)):
+            total += sys.getsizeof(item)
+            stack.extend(item)
+        elif isinstance(item, sqlite3.Connection):
+            total += _sqlite_size(item)
+        else:
+            total += sys.getsizeof(item)
+            to_plotly_json = getattr(item, 'to_plotly_json', None)
+            if callable(to_plotly_json):
+                stack.append(to_plotly_json())
+                continue
+            attributes = getattr(item, '__dict__', None)
+            if isinstance(attributes, dict):
+                stack.append(attributes)
+            for slot in getattr(type(item), '__slots__', ()):
+                if hasattr(item, slot):
+                    stack.append(getattr(item, slot))
+    return total
+
+
+def _sqlite_size(conn):
+    """SQLiteデータベースのサイズ（ページ数×ページサイズ）"""
+    try:
+        page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        return page_count * page_size
+    except sqlite3.Error:
+        return 0
+
+
+def get_process_rss():
+    """
+    プロセスの現在の常駐メモリ（RSS）を取得
+
+    Returns:
+        int: バイト数（取得できない環境ではNone）
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+        # Linux以外ではピーク値（macOSはバイト単位）しか取得できない
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+    except (ImportError, OSError):
+        return None
+
+
+class _SessionEntry:
+    """プロセス内で追跡しているセッション"""
+
+    def __init__(self, session_id, state):
+        self.session_id = session_id
+        self.state_ref = weakref.ref(state)
+        self.last_seen = time.time()
+        # (アップロードデータのid, ファイル名, バイト数)。同じデータは再計測しない
+        self.raw_size = None
+        # 他のセッションの再実行から依頼された解放（{'tier', 'bytes', 'notice'}）。
+        # セッション状態は所有するセッションの再実行中にしか変更しないため、次回の再実行で自身に適用する
+        self.eviction_request = None
+
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def _state_get(state, key):
+    """セッション状態から値を取得（ない場合はNone）"""
+    try:
+        return state[key] if key in state else None
+    except KeyError:
+        return None
+
+
+def _state_pop(state, key):
+    """セッション状態から値を取り除いて返す"""
+    try:
+        if key in state:
+            value = state[key]
+            del state[key]
+            return value
+    except KeyError:
+        pass
+    return None
+
+
+def register_current_session():
+    """
+    現在のセッションを追跡対象に登録
+
+    Returns:
+        _SessionEntry: 登録情報（Streamlitの実行コンテキスト外ではNone）
+    """
+    ctx = get_script_run_ctx(suppress_warning=True)
+    if ctx is None:
+        return None
+    with _sessions_lock:
+        entry = _sessions.get(ctx.session_id)
+        if entry is None or entry.state_ref() is not ctx.session_state:
+            entry = _SessionEntry(ctx.session_id, ctx.session_state)
+            _sessions[ctx.session_id] = entry
+        entry.last_seen = time.time()
+        return entry
+
+
+def _live_sessions():
+    """終了していないセッションの一覧（終了済みは登録から外す）"""
+    with _sessions_lock:
+        for session_id in [sid for sid, entry in _sessions.items() if entry.state_ref() is None]:
+            del _sessions[session_id]
+        return [(entry, entry.state_ref()) for entry in _sessions.values() if entry.state_ref() is not None]
+
+
+def measure_session(entry, state):
+    """
+    セッションのメモリ使用量を階層ごとに計測
+
+    Args:
+        entry: セッションの登録情報
+        state: セッション状態
+
+    Returns:
+        dict: 階層 -> バイト数
+    """
+    # 取り込み中はセッションに反映する前の最新のスナップショットも保持されている
+    # （スナップショット同士は内容を共有するため、新しい方だけを数える）
+    job = _state_get(state, INGESTION_JOB_KEY)
+    raw = job.store if job is not None and job.store is not None else _state_get(state, RAW_DATA_KEY)
+    raw_bytes = 0
+    if getattr(raw, 'nbytes', None) is not None:
+        # 月別パーティションストアは取り込み時に計測済み
+        raw_bytes = raw.nbytes
+    elif raw is not None:
+        token = (id(raw), _state_get(state, 'uploaded_file_name'))
+        if entry.raw_size is None or entry.raw_size[:2] != token:
+            entry.raw_size = token + (deep_sizeof(raw),)
+        raw_bytes = entry.raw_size[2]
+
+    derived_bytes = 0
+    cache = _state_get(state, DERIVED_CACHE_SESSION_KEY)
+    if cache is not None:
+        derived_bytes = sum(cache.entry_sizes(deep_sizeof).values())
+    return {'raw': raw_bytes, 'derived': derived_bytes}
+
+
+def _evict_derived(state, bytes_needed):
+    """
+    派生データを大きいものから解放
+
+    Returns:
+        int: 解放したバイト数
+    """
+    freed = 0
+    cache = _state_get(state, DERIVED_CACHE_SESSION_KEY)
+    if cache is None:
+        return freed
+    for key, size in sorted(cache.entry_sizes(deep_sizeof).items(), key=lambda item: -item[1]):
+        if freed >= bytes_needed:
+            break
+        cache.discard(key)
+        freed += size
+    return freed
+
+
+def _evict_raw(entry, state, notice):
+    """アップロードデータと派生データを解放（取り込み中の場合は取り込みも中止）"""
+    _evict_derived(state, float('inf'))
+    job = _state_pop(state, INGESTION_JOB_KEY)
+    if job is not None:
+        job.cancel()
+    _state_pop(state, RAW_DATA_KEY)
+    entry.raw_size = None
+    state[EVICTION_NOTICE_KEY] = notice
+
+
+def _request_eviction(entry, tier, bytes_needed, notice=None):
+    """
+    他のセッションに解放を依頼（次回の再実行の開始時に apply_eviction_request で適用される）
+
+    依頼済みの場合は、アップロードデータの解放を優先し、派生データは必要量の大きい方を残す。
+    """
+    with _sessions_lock:
+        request = entry.eviction_request
+        if request is not None and request['tier'] == 'raw':
+            return
+        if tier == 'derived' and request is not None:
+            bytes_needed = max(bytes_needed, request['bytes'])
+        entry.eviction_request = {'tier': tier, 'bytes': bytes_needed, 'notice': notice}
+
+
+def apply_eviction_request(state):
+    """
+    他のセッションから依頼された解放を現在のセッションに適用
+
+    再実行の開始時（データを参照する前）に呼び出す。
+
+    Args:
+        state: セッション状態（st.session_state）
+    """
+    entry = register_current_session()
+    if entry is None:
+        return
+    with _sessions_lock:
+        request, entry.eviction_request = entry.eviction_request, None
+    if request is None:
+        return
+    if request['tier'] == 'raw':
+        _evict_raw(entry, state, request['notice'])
+    else:
+        _evict_derived(state, request['bytes'])
+
+
+def enforce_memory_budget():
+    """
+    現在のセッションと全セッションのメモリ予算を適用
+
+    セッション予算を超えた場合は現在のセッションの派生データを解放し、
+    アップロードデータ単独で予算を超える場合はその読み込みを取り消す。
+    全体予算を超えた場合は、最後に使われた時刻が古いセッションから派生データを解放し、
+    それでも足りなければ現在以外のセッションのアップロードデータを解放する
+    （解放されたセッションは次回の再実行でアップロード済みファイルから再読み込みされる）。
+    他のセッションの状態は再実行中に変更しうるため直接は解放せず、解放を依頼して
+    そのセッションの次回の再実行で適用する（依頼分は解放されたものとして合計から差し引く）。
+
+    Returns:
+        dict: 計測結果と解放の記録（Streamlitの実行コンテキスト外ではNone）
+    """
+    current = register_current_session()
+    if current is None:
+        return None
+    config = get_config()
+    evictions = []
+
+    sessions = _live_sessions()
+    usage = {entry.session_id: measure_session(entry, state) for entry, state in sessions}
+    current_state = current.state_ref()
+
+    # 1) セッション予算
+    own = usage[current.session_id]
+    over = sum(own.values()) - config.SESSION_MEMORY_BUDGET
+    if over > 0 and own['derived'] > 0:
+        freed = _evict_derived(current_state, over)
+        evictions.append({'session_id': current.session_id, 'tier': 'derived', 'bytes': freed, 'pending': False})
+        own = usage[current.session_id] = measure_session(current, current_state)
+    if own['raw'] > config.SESSION_MEMORY_BUDGET:
+        file_name = _state_get(current_state, 'uploaded_file_name')
+        current_state[REJECTED_UPLOAD_KEY] = file_name
+        _evict_raw(current, current_state, (
+            f"アップロードデータ（{own['raw'] / 1024 / 1024:,.0f}MB）がセッションあたりのメモリ予算"
+            f"（{config.SESSION_MEMORY_BUDGET / 1024 / 1024:,.0f}MB）を超えるため読み込みを取り消しました"
+        ))
+        evictions.append({'session_id': current.session_id, 'tier': 'raw', 'bytes': own['raw'], 'pending': False})
+        own = usage[current.session_id] = measure_session(current, current_state)
+
+    # 2) 全体予算（古いセッションから、派生データ→アップロードデータの順）
+    total = sum(sum(tiers.values()) for tiers in usage.values())
+    by_age = sorted(sessions, key=lambda item: (item[0] is current, item[0].last_seen))
+    for entry, state in by_age:
+        if total <= config.GLOBAL_MEMORY_BUDGET:
+            break
+        derived_bytes = usage[entry.session_id]['derived']
+        if derived_bytes > 0:
+            bytes_needed = total - config.GLOBAL_MEMORY_BUDGET
+            if entry is current:
+                freed = _evict_derived(state, bytes_needed)
+                usage[entry.session_id] = measure_session(entry, state)
+            else:
+                _request_eviction(entry, 'derived', bytes_needed)
+                freed = min(derived_bytes, bytes_needed)
+            evictions.append({
+                'session_id': entry.session_id, 'tier': 'derived', 'bytes': freed, 'pending': entry is not current
+            })
+            total -= freed
+    for entry, state in by_age:
+        if total <= config.GLOBAL_MEMORY_BUDGET or entry is current:
+            break
+        raw_bytes = usage[entry.session_id]['raw']
+        if raw_bytes > 0:
+            _request_eviction(
+                entry, 'raw', raw_bytes, "サーバー全体のメモリ予算を超えたため、アップロードデータを再読み込みしました"
+            )
+            evictions.append({'session_id': entry.session_id, 'tier': 'raw', 'bytes': raw_bytes, 'pending': True})
+            total -= raw_bytes
+
+    return {
+        'current_session_id': current.session_id,
+        'sessions': [
+            {
+                'session_id': entry.session_id,
+                'last_seen': entry.last_seen,
+                **usage[entry.session_id]
+            }
+            for entry, _ in sessions
+        ],
+        'total_bytes': total,
+        'session_budget': config.SESSION_MEMORY_BUDGET,
+        'global_budget': config.GLOBAL_MEMORY_BUDGET,
+        'evictions': evictions
+    }
+
+
+def pop_eviction_notice(state):
+    """
+    解放の通知を取り出す（表示後は消える）
+
+    Args:
+        state: セッション状態（st.session_state）
+
+    Returns:
+        str: 通知メッセージ（ない場合はNone）
+    """
+    return _state_pop(state, EVICTION_NOTICE_KEY)
+
+
+def start_tracemalloc(frames=1):
+    """tracemallocによる割り当て追跡を開始"""
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(frames)
+
+
+def stop_tracemalloc():
+    """tracemallocによる割り当て追跡を停止"""
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+def take_memory_snapshot(previous=None, limit=20, key_type='lineno'):
+    """
+    tracemallocのスナップショットを取得し、割り当ての多い箇所を集計
+
+    Args:
+        previous: 比較する以前のスナップショット（Noneの場合は差分なし）
+        limit: 表示する件数
+        key_type: 集計単位（'lineno' / 'filename' / 'traceback'）
+
+    Returns:
+        tuple: (スナップショット, 上位の割り当て箇所のDataFrame)。追跡していない場合は (None, None)
+    """
+    if not tracemalloc.is_tracing():
+        return None, None
+    snapshot = tracemalloc.take_snapshot().filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap>')
+    ])
+    if previous is not None:
+        rows = [
+            {
+                'location': str(stat.traceback),
+                'size_kb': round(stat.size / 1024, 1),
+                'diff_kb': round(stat.size_diff / 1024, 1),
+                'count': stat.count
+            }
+            for stat in snapshot.compare_to(previous, key_type)[:limit]
+        ]
+    else:
+        rows = [
+            {'location': str(stat.traceback), 'size_kb': round(stat.size / 1024, 1), 'count': stat.count}
+            for stat in snapshot.statistics(key_type)[:limit]
+        ]
+    return snapshot, pd.DataFrame(rows)
@@ -0,0 +1,369 @@
+"""月別パーティションストア
+
+月次レポートの各ファイル（基本分析_YYYY-MM.json など）は生成時点の全期間データを
+丸ごと含むため、Nヶ月分のアーカイブには約N²ヶ月分のデータが重複して含まれる。
+アップロード時にこれを月別パーティションへ正規化し、同一内容は1回だけ保持する。
+
+- activity: 月別のスタッフ日次活動（monthly_analysis[月]）
+- conversion: 月別のコンバージョン（monthly_conversion[月]）
+- retention: 月別の定着率（monthly_retention_rates[月]）
+- taaan: 月別のTAAAN実績（月次サマリー_月.json）
+- detail: 月別の詳細分析（詳細分析_月.json）
+
+各ファイルの内容はパーティションを参照するビューとして復元できるため、
+ページ側の読み込み処理はこれまでと同じ辞書構造で扱える。
+"""
+import argparse
+import re
+import sys
+import zipfile
+
+# 月次レポートのファイル種別
+DOCUMENT_TYPES = ['基本分析', '詳細分析', '月次サマリー', '定着率分析']
+_DOCUMENT_PATTERN = re.compile(r'(基本分析|詳細分析|月次サマリー|定着率分析)_(\d{4}-\d{2})\.json$')
+
+# 全期間分を月別に持つセクションと、その正規化先パーティション
+ALL_PERIOD_SECTIONS = {
+    'monthly_analysis': 'activity',
+    'monthly_conversion': 'conversion',
+    'monthly_retention_rates': 'retention'
+}
+# パーティション名 -> 全期間セクション名
+_PARTITION_SECTIONS = {name: key for key, name in ALL_PERIOD_SECTIONS.items()}
+# ファイル単位で月別パーティションに格納する種別
+_MONTHLY_DOCUMENTS = {
+    '月次サマリー': 'taaan',
+    '詳細分析': 'detail'
+}
+
+
+def parse_document_name(filename):
+    """
+    ファイル名から種別と月を取得
+
+    Args:
+        filename: JSONファイル名（例: 基本分析_2024-09.json）
+
+    Returns:
+        tuple: (種別, 月)。月次レポートでない場合は (None, None)
+    """
+    match = _DOCUMENT_PATTERN.search(filename)
+    if not match:
+        return None, None
+    return match.group(1), match.group(2)
+
+
+def _month_from_filename(filename):
+    """ファイル名末尾のYYYY-MMを取得（get_available_months_from_dataと同じ判定）"""
+    if '_' in filename and '.json' in filename:
+        month_part = filename.split('_')[-1].replace('.json', '')
+        if len(month_part) == 7 and month_part[4] == '-':
+            return month_part
+    return None
+
+
+class MonthPartitionedStore:
+    """月別パーティションに正規化したアップロードデータ"""
+
+    def __init__(self):
+        # 月 -> {'activity', 'conversion', 'retention', 'taaan', 'detail'}
+        self.partitions = {}
+        # (種別, 月) -> パーティションを参照するファイル内容のビュー
+        self._documents = {}
+        # パーティション以外のセクションの重複排除用（キー -> 内容の異なる値のリスト）
+        self._section_pool = {}
+        self._months = set()
+        # (パーティション名, 月) -> 値の取得元ファイルの月（分割して取り込む場合も優先順位を保つ）
+        self._sources = {}
+        self.source_file_count = 0
+        # 推定メモリ使用量（measure_memory で計測するまではNone）と、計測済みの値の id -> (値, バイト数)
+        self.nbytes = None
+        self._object_sizes = {}
+
+    def __bool__(self):
+        return bool(self._documents)
+
+    def _intern_section(self, key, value):
+        """同じ内容のセクションが既にあればそのオブジェクトを使う"""
+        candidates = self._section_pool.setdefault(key, [])
+        for candidate in candidates:
+            if candidate is value or candidate == value:
+                return candidate
+        candidates.append(value)
+        return value
+
+    def _intern_all_period(self, key, section):
+        """全期間セクションの各月をパーティションの値に置き換える（内容が異なる月はそのまま）"""
+        partition_name = ALL_PERIOD_SECTIONS[key]
+        interned = {}
+        for month, value in section.items():
+            shared = self.partitions.get(month, {}).get(partition_name)
+            if shared is not None and (shared is value or shared == value):
+                interned[month] = shared
+            else:
+                interned[month] = self._intern_section((key, month), value)
+        return interned
+
+    def _set_partition(self, month, name, value):
+        """
+        パーティションの値を設定
+
+        分割して取り込む場合、置き換える値は取り込み済みのファイルのビューが参照している。
+        同じ内容であれば既存のオブジェクトをそのまま使い、内容が異なる場合は置き換える値を
+        重複排除用のプールに移して、後から取り込むファイルのビューと共有できるようにする。
+        """
+        partition = self.partitions.setdefault(month, {})
+        existing = partition.get(name)
+        if existing is None or existing is value:
+            partition[name] = value
+            return
+        if existing == value:
+            return
+        section_key = _PARTITION_SECTIONS.get(name)
+        if section_key is not None:
+            candidates = self._section_pool.setdefault((section_key, month), [])
+            if not any(candidate is existing for candidate in candidates):
+                candidates.append(existing)
+        partition[name] = value
+
+    def ingest(self, json_data):
+        """
+        アップロードされたJSONデータを月別パーティションに取り込む
+
+        全期間セクションの各月は、その月自身のファイルの内容を優先し、
+        無い場合は最も新しい月のファイルの内容を使う。月ごとに分割して複数回取り込んだ
+        場合も、全てを1回で取り込んだ場合と同じ内容・同じオブジェクトの共有になる
+        （verify_incremental_ingest で確認できる）。
+
+        Args:
+            json_data: ファイル名をキーとするJSONデータ
+        """
+        documents = []
+        for filename, data in json_data.items():
+            self.source_file_count += 1
+            month = _month_from_filename(filename)
+            if month:
+                self._months.add(month)
+            doc_type, doc_month = parse_document_name(filename)
+            if doc_type and isinstance(data, dict):
+                documents.append((doc_month, doc_type, data))
+        # 月の昇順（同じ月は基本分析を最後）に並べ、後から処理したファイルを優先する
+        documents.sort(key=lambda item: (item[0], -DOCUMENT_TYPES.index(item[1])))
+
+        # 1) 全期間セクションから各月のパーティションを決定
+        sources = self._sources
+        for doc_month, doc_type, data in documents:
+            for key, partition_name in ALL_PERIOD_SECTIONS.items():
+                section = data.get(key)
+                if not isinstance(section, dict):
+                    continue
+                for month, value in section.items():
+                    source = sources.get((partition_name, month))
+                    # その月自身のファイルの内容を他の月のファイルで上書きせず、
+                    # 他の月のファイル同士では新しい月のファイルを優先する
+                    if month == doc_month or (source != month and (source is None or doc_month >= source)):
+                        self._set_partition(month, partition_name, value)
+                        sources[(partition_name, month)] = doc_month
+
+        # 2) 月単位のファイルをパーティションに格納し、各ファイルをビューに置き換える
+        for doc_month, doc_type, data in documents:
+            view = {}
+            for key, value in data.items():
+                if key in ALL_PERIOD_SECTIONS and isinstance(value, dict):
+                    view[key] = self._intern_all_period(key, value)
+                else:
+                    view[key] = self._intern_section(key, value)
+            self._documents[(doc_type, doc_month)] = view
+            if doc_type in _MONTHLY_DOCUMENTS:
+                self._set_partition(doc_month, _MONTHLY_DOCUMENTS[doc_type], view)
+
+    def snapshot(self):
+        """
+        現時点の内容を参照する読み取り用のストアを作成
+
+        パーティションとファイル内容の値は共有し、辞書・集合だけを複製するため、
+        バックグラウンドで取り込みを続けても作成済みのスナップショットは変化しない。
+
+        Returns:
+            MonthPartitionedStore: スナップショット
+        """
+        store = MonthPartitionedStore()
+        store.partitions = {month: dict(partition) for month, partition in self.partitions.items()}
+        store._documents = dict(self._documents)
+        store._months = set(self._months)
+        store.source_file_count = self.source_file_count
+        store.nbytes = self.nbytes
+        return store
+
+    def measure_memory(self, sizer):
+        """
+        保持している内容の推定メモリ使用量を計測
+
+        パーティションと重複排除用のプールの値ごとにサイズを記録し、計測済みの値は再計測しない。
+        月ごとに取り込む場合は、取り込んだ月の分だけを計測すればよい。
+        スナップショットは作成時点の計測結果（nbytes）を引き継ぐ。
+
+        Args:
+            sizer: オブジェクトのバイト数を返す関数（utils.memory.deep_sizeof など）
+
+        Returns:
+            int: バイト数
+        """
+        values = {}
+        for partition in self.partitions.values():
+            for name, value in partition.items():
+                # 月単位のファイルのパーティションはビュー（値はプールに含まれる）
+                if name not in _MONTHLY_DOCUMENTS.values():
+                    values[id(value)] = value
+        for candidates in self._section_pool.values():
+            for value in candidates:
+                values[id(value)] = value
+
+        sizes = {}
+        for key, value in values.items():
+            measured = self._object_sizes.get(key)
+            sizes[key] = measured if measured is not None and measured[0] is value else (value, sizer(value))
+        self._object_sizes = sizes
+
+        # ビューは値を参照するだけなので、辞書自体の大きさのみ数える
+        views = 0
+        for view in self._documents.values():
+            views += sys.getsizeof(view)
+            for key in ALL_PERIOD_SECTIONS:
+                if isinstance(view.get(key), dict):
+                    views += sys.getsizeof(view[key])
+        self.nbytes = views + sum(size for _, size in sizes.values())
+        return self.nbytes
+
+    def get_document(self, doc_type, month):
+        """
+        ファイル単位の内容（パーティションを参照するビュー）を取得
+
+        Args:
+            doc_type: 種別（基本分析/詳細分析/月次サマリー/定着率分析）
+            month: 月（YYYY-MM形式）
+
+        Returns:
+            dict: ファイルの内容（ファイルがない場合はNone）
+        """
+        return self._documents.get((doc_type, month))
+
+    def get_partition(self, month):
+        """
+        指定月のパーティションを取得
+
+        Args:
+            month: 月（YYYY-MM形式）
+
+        Returns:
+            dict: activity/conversion/retention/taaan/detail のうち存在するもの
+        """
+        return self.partitions.get(month, {})
+
+    def available_months(self):
+        """ファイル名に含まれる月の一覧（新しい順）"""
+        return sorted(self._months, reverse=True)
+
+
+def build_month_store(json_data):
+    """
+    アップロードデータから月別パーティションストアを作成
+
+    Args:
+        json_data: ファイル名をキーとするJSONデータ
+
+    Returns:
+        MonthPartitionedStore: 正規化済みのストア
+    """
+    store = MonthPartitionedStore()
+    store.ingest(json_data)
+    return store
+
+
+def _reference_groups(store):
+    """
+    ストア内で同じオブジェクトを参照している箇所の組を取得
+
+    Returns:
+        set: 同じオブジェクトを参照する箇所（パーティション/ファイルのセクション）の集合の集合
+    """
+    locations = {}
+
+    def add(obj, location):
+        locations.setdefault(id(obj), (obj, set()))[1].add(location)
+
+    for month, partition in store.partitions.items():
+        for name, value in partition.items():
+            add(value, ('partition', month, name))
+    for (doc_type, doc_month), view in store._documents.items():
+        for key, value in view.items():
+            if key in ALL_PERIOD_SECTIONS and isinstance(value, dict):
+                for month, month_value in value.items():
+                    add(month_value, ('document', doc_type, doc_month, key, month))
+            else:
+                add(value, ('document', doc_type, doc_month, key))
+    return {frozenset(refs) for _, refs in locations.values()}
+
+
+def verify_incremental_ingest(json_data):
+    """
+    月ごとに分割して取り込んだストアが、1回で取り込んだストアと同じになるか確認
+
+    バックグラウンド取り込みと同じく新しい月から順に1ヶ月分ずつ取り込み、
+    ファイル内容が一致することに加えて、オブジェクトの共有（重複排除）も一致することを確認する。
+
+    Args:
+        json_data: ファイル名をキーとするJSONデータ
+
+    Returns:
+        list: 不一致の内容（一致した場合は空のリスト）
+    """
+    single = build_month_store(json_data)
+    incremental = MonthPartitionedStore()
+    batches = {}
+    for filename, data in json_data.items():
+        batches.setdefault(_month_from_filename(filename) or '', {})[filename] = data
+    for month in sorted(batches, reverse=True):
+        incremental.ingest(batches[month])
+
+    problems = []
+    if single.available_months() != incremental.available_months():
+        problems.append("月の一覧が一致しません")
+    for key in sorted(set(single._documents) | set(incremental._documents)):
+        if single.get_document(*key) != incremental.get_document(*key):
+            problems.append(f"{key[0]}_{key[1]} の内容が一致しません")
+    single_groups = _reference_groups(single)
+    incremental_groups = _reference_groups(incremental)
+    if single_groups != incremental_groups:
+        problems.append(
+            f"オブジェクトの共有が一致しません（1回: {len(single_groups)}個、分割: {len(incremental_groups)}個）"
+        )
+    return problems
+
+
+def main(argv=None):
+    """コマンドライン実行（分割取り込みの検証）"""
+    parser = argparse.ArgumentParser(
+        description='分析JSONのZipを月別パーティションストアに取り込み、分割取り込みの結果を検証します'
+    )
+    parser.add_argument('zip', help='基本分析/詳細分析/月次サマリー/定着率分析のJSONを含むZipファイル')
+    args = parser.parse_args(argv)
+
+    from utils.dataset_bundle import read_json_zip
+    try:
+        json_data = read_json_zip(args.zip)
+    except (OSError, ValueError, zipfile.BadZipFile) as e:
+        print(f"❌ 読み込みに失敗しました: {e}")
+        return 1
+
+    problems = verify_incremental_ingest(json_data)
+    for problem in problems:
+        print(f"❌ {problem}")
+    if problems:
+        return 1
+    print(f"✅ {len(json_data)}個のJSONファイルで、月ごとの取り込みと一括取り込みの結果が一致しました")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
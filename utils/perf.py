@@ -0,0 +1,237 @@
+"""処理時間の計測
+
+読み込み・データ処理・チャート作成の各関数に付けるデコレーター（timed）と
+コンテキストマネージャー（perf_stage）で、呼び出しごとの所要時間と行数を記録する。
+記録はセッション単位で再実行（rerun）ごとにまとめ、管理者向けのサイドバーパネルで
+確認したり、JSON Lines形式で書き出してオフラインで分析したりできる。
+
+Streamlitの実行コンテキスト外（HTML生成CLIやベンチマーク）では記録せず、
+元の関数をそのまま呼び出す。
+"""
+import functools
+import json
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+import pandas as pd
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+PERF_SESSION_KEY = 'perf_recorder'
+# 保持する再実行の件数（古いものから破棄）
+PERF_HISTORY_RERUNS = 20
+
+
+class PerfRecorder:
+    """セッション単位の計測記録"""
+
+    def __init__(self, max_reruns=PERF_HISTORY_RERUNS):
+        self.max_reruns = max_reruns
+        self.rerun_id = 0
+        self.rerun_started = time.perf_counter()
+        self.rerun_started_at = datetime.now().isoformat(timespec='milliseconds')
+        # 再実行ID -> 記録のリスト
+        self._reruns = {0: []}
+        self._lock = threading.Lock()
+
+    def start_rerun(self):
+        """新しい再実行の記録を開始"""
+        with self._lock:
+            self.rerun_id += 1
+            self.rerun_started = time.perf_counter()
+            self.rerun_started_at = datetime.now().isoformat(timespec='milliseconds')
+            self._reruns[self.rerun_id] = []
+            while len(self._reruns) > self.max_reruns:
+                del self._reruns[min(self._reruns)]
+
+    def record(self, stage, category, started, seconds, rows=None, error=None):
+        """1回の呼び出しを記録"""
+        with self._lock:
+            self._reruns.setdefault(self.rerun_id, []).append({
+                'rerun': self.rerun_id,
+                'rerun_started_at': self.rerun_started_at,
+                'stage': stage,
+                'category': category,
+                'offset_seconds': round(started - self.rerun_started, 6),
+                'seconds': round(seconds, 6),
+                'rows': rows,
+                'error': error,
+                'thread': threading.current_thread().name
+            })
+
+    def get_records(self, rerun_id=None):
+        """
+        記録を取得
+
+        Args:
+            rerun_id: 再実行ID（Noneの場合は保持している全ての記録）
+
+        Returns:
+            list: 記録（辞書）のリスト
+        """
+        with self._lock:
+            if rerun_id is not None:
+                return list(self._reruns.get(rerun_id, []))
+            return [record for rid in sorted(self._reruns) for record in self._reruns[rid]]
+
+    def clear(self):
+        """記録を全て破棄"""
+        with self._lock:
+            self._reruns = {self.rerun_id: []}
+
+
+def get_perf_recorder():
+    """
+    現在のセッションの計測記録を取得
+
+    Returns:
+        PerfRecorder: 計測記録（Streamlitの実行コンテキスト外ではNone）
+    """
+    if get_script_run_ctx(suppress_warning=True) is None:
+        return None
+    recorder = st.session_state.get(PERF_SESSION_KEY)
+    if recorder is None:
+        recorder = PerfRecorder()
+        st.session_state[PERF_SESSION_KEY] = recorder
+    return recorder
+
+
+def start_perf_rerun():
+    """再実行の開始を記録（スクリプトの先頭で呼び出す）"""
+    recorder = get_perf_recorder()
+    if recorder is not None:
+        recorder.start_rerun()
+
+
+def count_rows(result):
+    """
+    戻り値から行数を推定
+
+    DataFrame/Seriesは行数、plotlyのFigureは全トレースの点数、
+    リスト・辞書は要素数、タプルは先頭のDataFrameの行数を返す。
+
+    Args:
+        result: 計測対象の関数の戻り値
+
+    Returns:
+        int: 行数（推定できない場合はNone）
+    """
+    if isinstance(result, (pd.DataFrame, pd.Series)):
+        return len(result)
+    if isinstance(result, (list, dict)):
+        return len(result)
+    if isinstance(result, tuple):
+        for item in result:
+            if isinstance(item, pd.DataFrame):
+                return len(item)
+        return None
+    traces = getattr(result, 'data', None)
+    if isinstance(traces, tuple):
+        return sum(len(trace.x) for trace in traces if getattr(trace, 'x', None) is not None)
+    return None
+
+
+class _Stage:
+    """perf_stage で行数を後から設定するためのハンドル"""
+
+    def __init__(self):
+        self.rows = None
+
+
+@contextmanager
+def perf_stage(stage, category='processor'):
+    """
+    ブロックの所要時間を記録するコンテキストマネージャー
+
+    Args:
+        stage: 段階名
+        category: 分類（loader / processor / chart など）
+
+    Yields:
+        _Stage: rows 属性に行数を設定すると記録に含まれる
+    """
+    recorder = get_perf_recorder()
+    handle = _Stage()
+    if recorder is None:
+        yield handle
+        return
+    started = time.perf_counter()
+    error = None
+    try:
+        yield handle
+    except Exception as e:
+        error = type(e).__name__
+        raise
+    finally:
+        recorder.record(stage, category, started, time.perf_counter() - started, handle.rows, error)
+
+
+def timed(stage=None, category='processor', rows=count_rows):
+    """
+    関数の呼び出しごとに所要時間と行数を記録するデコレーター
+
+    Args:
+        stage: 段階名（省略時は関数名）
+        category: 分類（loader / processor / chart など）
+        rows: 戻り値から行数を求める関数（Noneの場合は記録しない）
+
+    Returns:
+        デコレーター
+    """
+    def decorator(func):
+        name = stage or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            recorder = get_perf_recorder()
+            if recorder is None:
+                return func(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                recorder.record(name, category, started, time.perf_counter() - started, error=type(e).__name__)
+                raise
+            seconds = time.perf_counter() - started
+            recorder.record(name, category, started, seconds, rows(result) if rows else None)
+            return result
+        return wrapper
+    return decorator
+
+
+def records_to_jsonl(records):
+    """
+    計測記録をJSON Lines形式の文字列に変換
+
+    Args:
+        records: 記録（辞書）のリスト
+
+    Returns:
+        str: 1行1記録のJSON
+    """
+    return ''.join(json.dumps(record, ensure_ascii=False) + '\n' for record in records)
+
+
+def summarize_records(records):
+    """
+    段階ごとに呼び出し回数・合計時間・行数を集計
+
+    Args:
+        records: 記録（辞書）のリスト
+
+    Returns:
+        pd.DataFrame: 合計時間の降順に並べた集計
+    """
+    if not records:
+        return pd.DataFrame(columns=['stage', 'category', 'calls', 'total_ms', 'max_ms', 'rows'])
+    df = pd.DataFrame(records)
+    summary = df.groupby(['stage', 'category'], sort=False).agg(
+        calls=('seconds', 'size'),
+        total_ms=('seconds', 'sum'),
+        max_ms=('seconds', 'max'),
+        rows=('rows', 'sum')
+    ).reset_index()
+    summary[['total_ms', 'max_ms']] = (summary[['total_ms', 'max_ms']] * 1000).round(1)
+    return summary.sort_values('total_ms', ascending=False, ignore_index=True)
@@ -0,0 +1,473 @@
+"""SQLクエリエンジン
+
+アップロードデータを日次活動・TAAAN・コンバージョン・定着率のファクトテーブルに
+展開し、インプロセスのSQLエンジンで集計できるようにする。
+バックエンドはSQLite（標準ライブラリ）を既定とし、duckdbがインストールされていれば
+列指向エンジンのDuckDBに切り替えられる。同じクエリの結果はエンジン単位でキャッシュする。
+
+Python APIの例:
+    from utils.query_engine import run_query
+    df = run_query(json_data, "SELECT branch, SUM(call_count) AS calls FROM activity GROUP BY branch")
+"""
+import importlib.util
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+
+from utils.data_processor import (
+    extract_daily_activity_from_staff,
+    get_available_months_from_data,
+    load_analysis_data_from_json,
+    load_retention_data_from_json
+)
+from utils.derived_cache import get_derived_cache
+from utils.perf import timed
+
+DEFAULT_QUERY_BACKEND = 'sqlite'
+# エンジンごとに保持するクエリ結果の件数
+QUERY_CACHE_SIZE = 32
+# 1クエリの制限時間（秒）と結果の最大行数（超えた場合は中止する）
+QUERY_TIMEOUT_SECONDS = 10
+QUERY_MAX_ROWS = 200_000
+# SQLiteの進捗ハンドラーを呼び出す間隔（仮想マシン命令数）
+_PROGRESS_INTERVAL = 10_000
+
+# 各テーブルで索引を張るカラム（SQLite）
+_INDEXED_COLUMNS = ['month', 'staff_name', 'branch', 'product']
+
+# よく使う集計のサンプル
+SAMPLE_QUERIES = {
+    '支部×商材×週の架電・アポ': """SELECT branch, product, week_start,
+       SUM(call_count) AS calls,
+       SUM(get_appointment) AS appointments,
+       ROUND(100.0 * SUM(get_appointment) / NULLIF(SUM(call_count), 0), 2) AS appointment_rate
+FROM activity
+GROUP BY branch, product, week_start
+ORDER BY week_start, branch, product""",
+    '入社四半期別のスタッフ実績': """SELECT join_quarter,
+       COUNT(DISTINCT staff_name) AS staff_count,
+       SUM(call_count) AS calls,
+       SUM(get_appointment) AS appointments
+FROM activity
+GROUP BY join_quarter
+ORDER BY join_quarter""",
+    '月別TAAAN実績（スタッフ上位）': """SELECT month, staff_name, total_deals, total_approved, total_revenue
+FROM taaan_staff
+ORDER BY month DESC, total_revenue DESC
+LIMIT 50""",
+    '高リスクスタッフの直近活動': """SELECT r.staff_name, r.branch, r.risk_score, a.month,
+       SUM(a.call_count) AS calls
+FROM staff_retention r
+LEFT JOIN activity a ON a.staff_name = r.staff_name
+WHERE r.risk_level = 'high'
+GROUP BY r.staff_name, r.branch, r.risk_score, a.month
+ORDER BY r.risk_score DESC, a.month"""
+}
+
+
+# データに含まれない場合も空のテーブルとして作成するカラム（クエリが常に実行できるように）
+TABLE_BASE_COLUMNS = {
+    'activity': ['month', 'date', 'week_start', 'staff_name', 'branch', 'join_date', 'join_quarter',
+                 'product', 'product_type', 'call_hours', 'call_count', 'reception_bk', 'no_one_in_charge',
+                 'disconnect', 'charge_connected', 'charge_bk', 'get_appointment'],
+    'staff': ['month', 'staff_name', 'branch', 'join_date', 'join_quarter',
+              'total_deals', 'total_approved', 'total_revenue', 'total_potential_revenue'],
+    'taaan_staff': ['month', 'staff_name', 'total_deals', 'total_approved', 'total_revenue', 'total_potential_revenue'],
+    'taaan_branch': ['month', 'branch', 'total_deals', 'total_approved', 'total_revenue', 'total_potential_revenue'],
+    'taaan_product': ['month', 'product', 'total_deals', 'total_approved', 'total_revenue', 'total_potential_revenue'],
+    'conversion': ['month', 'type', 'name', 'self_reported_appointments', 'taaan_entries', 'approved_deals',
+                   'taaan_rate', 'approval_rate', 'true_approval_rate'],
+    'retention_monthly': ['month', 'active_staff', 'total_staff', 'retention_rate'],
+    'staff_retention': ['staff_name', 'branch', 'join_date', 'active_months', 'monthly_activity_rate',
+                        'risk_score', 'risk_level']
+}
+
+
+class QueryError(Exception):
+    """クエリの検証・実行エラー"""
+
+
+def _timeout_message(timeout):
+    return f"制限時間（{timeout}秒）を超えたため中止しました。条件や集計で処理する行数を絞ってください"
+
+
+def _row_limit_message(max_rows):
+    return f"結果が{max_rows:,}行を超えたため中止しました。LIMITや集計で行数を絞ってください"
+
+
+def _split_first_statement(sql):
+    """
+    最初の文と残りに分割
+
+    文字列リテラルや識別子、コメント内のセミコロンは文の区切りとして扱わない。
+
+    Returns:
+        tuple: (最初の文, 区切りのセミコロン以降の残り)
+    """
+    for i, char in enumerate(sql):
+        # 先頭からこのセミコロンまでが完結した文であれば、リテラル・コメントの外の区切り
+        if char == ';' and sqlite3.complete_statement(sql[:i + 1]):
+            return sql[:i], sql[i + 1:]
+    return sql, ''
+
+
+def _normalize_query(sql):
+    """
+    クエリを検証して正規化（SELECT/WITHの単一文のみ許可）
+
+    Args:
+        sql: SQL文
+
+    Returns:
+        str: 前後の空白と末尾のセミコロンを除いたSQL
+    """
+    normalized, rest = _split_first_statement((sql or '').strip())
+    normalized = normalized.strip()
+    if not normalized:
+        raise QueryError("クエリが空です")
+    if rest.strip().strip(';').strip():
+        raise QueryError("複数の文は実行できません")
+    first_word = re.match(r'\w+', normalized)
+    if not first_word or first_word.group(0).lower() not in ('select', 'with'):
+        raise QueryError("SELECT文（またはWITH句）のみ実行できます")
+    return normalized
+
+
+def _to_engine_frame(df):
+    """カテゴリ型など、エンジンが扱えない型を変換"""
+    return df.astype({
+        col: 'object' for col in df.columns
+        if isinstance(df[col].dtype, pd.CategoricalDtype)
+    })
+
+
+class SQLiteBackend:
+    """インメモリSQLiteバックエンド"""
+
+    name = 'sqlite'
+    label = 'SQLite'
+
+    def __init__(self):
+        # Streamlitの再実行は別スレッドになりうるため、ロックで直列化して共有する
+        self._conn = sqlite3.connect(':memory:', check_same_thread=False)
+        self._lock = threading.RLock()
+
+    def load_table(self, name, df):
+        with self._lock:
+            _to_engine_frame(df).to_sql(name, self._conn, index=False, if_exists='replace')
+            for col in _INDEXED_COLUMNS:
+                if col in df.columns:
+                    self._conn.execute(f'CREATE INDEX "ix_{name}_{col}" ON "{name}" ("{col}")')
+
+    def freeze(self):
+        """読み込み完了後は書き込みを禁止"""
+        with self._lock:
+            self._conn.execute('PRAGMA query_only = ON')
+
+    def execute(self, sql, timeout, max_rows):
+        deadline = time.perf_counter() + timeout
+        with self._lock:
+            # 制限時間を過ぎると進捗ハンドラーが0以外を返し、実行中のクエリが中断される
+            self._conn.set_progress_handler(lambda: time.perf_counter() > deadline, _PROGRESS_INTERVAL)
+            try:
+                cursor = self._conn.execute(sql)
+                # 結果は必要な行数だけ取り出す（上限を超える分は生成させない）
+                rows = cursor.fetchmany(max_rows + 1)
+                columns = [column[0] for column in cursor.description]
+                cursor.close()
+            except sqlite3.OperationalError as e:
+                if time.perf_counter() > deadline:
+                    raise QueryError(_timeout_message(timeout)) from e
+                raise QueryError(str(e)) from e
+            except sqlite3.Error as e:
+                raise QueryError(str(e)) from e
+            finally:
+                self._conn.set_progress_handler(None, _PROGRESS_INTERVAL)
+        if len(rows) > max_rows:
+            raise QueryError(_row_limit_message(max_rows))
+        return pd.DataFrame.from_records(rows, columns=columns)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class DuckDBBackend:
+    """インメモリDuckDBバックエンド（duckdbが必要）"""
+
+    name = 'duckdb'
+    label = 'DuckDB'
+
+    def __init__(self):
+        import duckdb
+
+        self._duckdb = duckdb
+        self._conn = duckdb.connect(':memory:')
+        self._lock = threading.RLock()
+
+    def load_table(self, name, df):
+        with self._lock:
+            self._conn.register(f'_{name}_frame', _to_engine_frame(df))
+            self._conn.execute(f'CREATE OR REPLACE TABLE "{name}" AS SELECT * FROM "_{name}_frame"')
+            self._conn.unregister(f'_{name}_frame')
+
+    def freeze(self):
+        """読み込み完了後はサーバー上のファイル・外部URL・Pythonの変数を参照できないようにし、設定を固定"""
+        with self._lock:
+            self._conn.execute('SET enable_external_access = false')
+            self._conn.execute('SET python_enable_replacements = false')
+            self._conn.execute('SET lock_configuration = true')
+
+    def execute(self, sql, timeout, max_rows):
+        with self._lock:
+            # 制限時間を過ぎたら別スレッドから実行中のクエリを中断する
+            timer = threading.Timer(timeout, self._conn.interrupt)
+            timer.start()
+            try:
+                # 上限を1行超える分だけを取り出し、結果全体は生成させない
+                result = self._conn.sql(sql).limit(max_rows + 1).df()
+            except self._duckdb.Error as e:
+                if not timer.is_alive():
+                    raise QueryError(_timeout_message(timeout)) from e
+                raise QueryError(str(e)) from e
+            finally:
+                timer.cancel()
+        if len(result) > max_rows:
+            raise QueryError(_row_limit_message(max_rows))
+        return result
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+QUERY_BACKENDS = {
+    'sqlite': {'class': SQLiteBackend, 'module': None},
+    'duckdb': {'class': DuckDBBackend, 'module': 'duckdb'}
+}
+
+
+def get_available_backends():
+    """インストール済みのパッケージで利用できるバックエンド名の一覧"""
+    return [
+        name for name, spec in QUERY_BACKENDS.items()
+        if spec['module'] is None or importlib.util.find_spec(spec['module']) is not None
+    ]
+
+
+class QueryEngine:
+    """ファクトテーブルを読み込んだSQLエンジン（結果キャッシュ付き）"""
+
+    def __init__(self, tables, backend=DEFAULT_QUERY_BACKEND, cache_size=QUERY_CACHE_SIZE,
+                 timeout=QUERY_TIMEOUT_SECONDS, max_rows=QUERY_MAX_ROWS):
+        if backend not in QUERY_BACKENDS:
+            raise QueryError(f"未対応のバックエンドです: {backend}")
+        self.backend_name = backend
+        self._backend = QUERY_BACKENDS[backend]['class']()
+        self._schemas = {}
+        for name, df in tables.items():
+            self._backend.load_table(name, df)
+            self._schemas[name] = {'columns': list(df.columns), 'rows': len(df)}
+        self._backend.freeze()
+
+        self._cache = OrderedDict()
+        self._cache_size = cache_size
+        self.timeout = timeout
+        self.max_rows = max_rows
+        self._lock = threading.RLock()
+
+    @property
+    def schemas(self):
+        """テーブル名 -> {'columns': カラム一覧, 'rows': 行数}"""
+        return self._schemas
+
+    def execute(self, sql):
+        """
+        クエリを実行（同じクエリはキャッシュから返す）
+
+        制限時間（timeout）を超えた場合や、結果が最大行数（max_rows）を超える場合は
+        QueryError で中止する。
+
+        Args:
+            sql: SELECT文
+
+        Returns:
+            tuple: (結果のDataFrame, キャッシュから取得した場合True)
+        """
+        normalized = _normalize_query(sql)
+        with self._lock:
+            if normalized in self._cache:
+                self._cache.move_to_end(normalized)
+                return self._cache[normalized], True
+
+        result = self._backend.execute(normalized, self.timeout, self.max_rows)
+        with self._lock:
+            self._cache[normalized] = result
+            while len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+        return result, False
+
+    def close(self):
+        self._backend.close()
+
+
+def _scalar_columns_frame(records):
+    """辞書のリストからスカラー値のカラムだけでDataFrameを作成し、数値文字列を数値に変換"""
+    df = pd.DataFrame(records)
+    if df.empty:
+        return df
+    keep = [
+        col for col in df.columns
+        if not df[col].map(lambda v: isinstance(v, (dict, list))).any()
+    ]
+    df = df[keep]
+    for col in df.columns:
+        if pd.api.types.is_object_dtype(df[col]) or pd.api.types.is_string_dtype(df[col]):
+            converted = pd.to_numeric(df[col], errors='coerce')
+            # 全ての非欠損値が数値として解釈できる列のみ変換
+            if converted.notna().sum() == df[col].notna().sum() and df[col].notna().any():
+                df[col] = converted
+    return df
+
+
+def _quarter_label(dates):
+    """日付文字列の系列を四半期ラベル（例: 2024-Q3）に変換"""
+    parsed = pd.to_datetime(dates, utc=True, errors='coerce').dt.tz_convert('Asia/Tokyo')
+    labels = parsed.dt.year.astype('Int64').astype(str) + '-Q' + parsed.dt.quarter.astype('Int64').astype(str)
+    return labels.where(parsed.notna(), None)
+
+
+@timed(rows=lambda tables: sum(len(df) for df in tables.values()))
+def build_fact_tables(json_data):
+    """
+    アップロードデータからSQL用のファクトテーブルを作成
+
+    Args:
+        json_data: アップロードデータ（ファイル名→データの辞書、または月別パーティションストア）
+
+    Returns:
+        dict: テーブル名 -> DataFrame
+            activity: 日次活動（1日×スタッフ×商材）
+            staff: 月別スタッフ（支部・入社日・TAAAN実績）
+            taaan_staff / taaan_branch / taaan_product: 月次サマリーの実績
+            conversion: 月別コンバージョン（全体・スタッフ・支部・商材）
+            retention_monthly: 月次定着率
+            staff_retention: スタッフ別定着・リスク分析（最新月）
+    """
+    months = sorted(get_available_months_from_data(json_data))
+    activity_frames = []
+    staff_records = []
+    taaan = {'taaan_staff': [], 'taaan_branch': [], 'taaan_product': []}
+    conversion_records = []
+
+    for month in months:
+        basic_data, _, summary_data = load_analysis_data_from_json(json_data, month)
+        month_data = (basic_data or {}).get('monthly_analysis', {}).get(month)
+        if month_data:
+            staff_dict = month_data.get('staff', {})
+            df_month = extract_daily_activity_from_staff(staff_dict)
+            if not df_month.empty:
+                activity_frames.append(df_month.assign(month=month))
+            for staff_name, staff_data in staff_dict.items():
+                record = {'month': month, 'staff_name': staff_name}
+                record.update({k: v for k, v in staff_data.items() if k not in ('staff_name', 'daily_activity')})
+                staff_records.append(record)
+
+        month_conversion = (basic_data or {}).get('monthly_conversion', {}).get(month)
+        if month_conversion:
+            conversion_records.append({'month': month, 'type': 'total', **month_conversion.get('total', {})})
+            for conv_type, section in [('staff', 'by_staff'), ('branch', 'by_branch'), ('product', 'by_product')]:
+                for name, values in month_conversion.get(section, {}).items():
+                    conversion_records.append({'month': month, 'type': conv_type, 'name': name, **values})
+
+        if summary_data:
+            for table, section, name_col in [
+                ('taaan_staff', 'staff_performance', 'staff_name'),
+                ('taaan_branch', 'branch_performance', 'branch'),
+                ('taaan_product', 'product_performance', 'product')
+            ]:
+                for name, values in summary_data.get(section, {}).items():
+                    if isinstance(values, dict):
+                        taaan[table].append({'month': month, name_col: name, **values})
+
+    tables = {}
+    if activity_frames:
+        activity = pd.concat(activity_frames, ignore_index=True)
+        dates = pd.to_datetime(activity['date'], errors='coerce')
+        activity['week_start'] = (dates - pd.to_timedelta(dates.dt.weekday, unit='D')).dt.strftime('%Y-%m-%d')
+        activity['join_quarter'] = _quarter_label(activity['join_date'])
+        tables['activity'] = activity
+    if staff_records:
+        staff = _scalar_columns_frame(staff_records)
+        if 'join_date' in staff.columns:
+            staff['join_quarter'] = _quarter_label(staff['join_date'])
+        tables['staff'] = staff
+    for table, records in taaan.items():
+        if records:
+            tables[table] = _scalar_columns_frame(records)
+    if conversion_records:
+        tables['conversion'] = _scalar_columns_frame(conversion_records)
+
+    # 定着率は最新月のファイルが全期間分を持つ
+    for month in reversed(months):
+        retention_data = load_retention_data_from_json(json_data, month)
+        if not retention_data:
+            continue
+        rates = retention_data.get('monthly_retention_rates', {})
+        if rates:
+            tables['retention_monthly'] = _scalar_columns_frame(
+                [{'month': m, **{k: v for k, v in r.items() if k != 'month'}} for m, r in rates.items()]
+            )
+        staff_retention = retention_data.get('staff_retention_analysis', {})
+        if staff_retention:
+            tables['staff_retention'] = _scalar_columns_frame(
+                [{'staff_name': name, **{k: v for k, v in r.items() if k != 'staff_name'}}
+                 for name, r in staff_retention.items()]
+            )
+        break
+
+    # データにないテーブル・カラムは空で補う
+    for table, columns in TABLE_BASE_COLUMNS.items():
+        df = tables.get(table, pd.DataFrame())
+        missing = [col for col in columns if col not in df.columns]
+        if missing or table not in tables:
+            tables[table] = df.reindex(columns=list(df.columns) + missing)
+    return tables
+
+
+def get_query_engine(json_data, backend=DEFAULT_QUERY_BACKEND):
+    """
+    アップロードデータのクエリエンジンを取得（派生データキャッシュに保持）
+
+    Args:
+        json_data: アップロードデータ
+        backend: バックエンド名（'sqlite' / 'duckdb'）
+
+    Returns:
+        QueryEngine: ファクトテーブル読み込み済みのエンジン
+    """
+    # テーブルはエンジンに読み込んだ後は保持しない
+    return get_derived_cache(json_data).get_or_build(
+        ('query_engine', backend),
+        lambda: QueryEngine(build_fact_tables(json_data), backend)
+    )
+
+
+def run_query(json_data, sql, backend=DEFAULT_QUERY_BACKEND):
+    """
+    アップロードデータに対してSQLを実行
+
+    Args:
+        json_data: アップロードデータ
+        sql: SELECT文
+        backend: バックエンド名
+
+    Returns:
+        pd.DataFrame: クエリ結果
+    """
+    result, _ = get_query_engine(json_data, backend).execute(sql)
+    return result
@@ -0,0 +1,497 @@
+"""定着率・リスクスコアの計算エンジン
+
+generateJson.js の generateRetentionAnalysisJson と同じ定義で、月別のアクティブ/総スタッフ数、
+スタッフごとの活動率・活動のばらつき・5つのリスク要因とリスクスコアをアップロードデータから再計算する。
+
+日次活動はまず1日1行のフラットなテーブル（メイン商材の指標）に展開し、以降はスタッフ×月の
+活動日数の行列に対する配列演算で集計する。スタッフ数が数千人でも、重み・閾値を変えた
+再計算はミリ秒単位で終わる。
+
+- build_retention_activity_table: 日次活動のフラットなテーブル
+- compute_staff_features: スタッフ別の特徴量（活動率・直近3ヶ月の活動日数・分散など）
+- compute_risk_flags / score_risk: リスク要因の判定と重み付き合計（重みだけを変えた再計算に使う）
+- compute_monthly_retention: 月別の定着率
+- compute_cohort_retention: 入社月コホート×活動月の定着率
+- compute_retention_analysis: 定着率分析ファイルと同じ構造の結果
+"""
+import numpy as np
+import pandas as pd
+
+from utils.config import RISK_FACTORS, RISK_THRESHOLDS, RISK_WEIGHTS
+from utils.data_processor import get_available_months_from_data, load_analysis_data_from_json
+from utils.derived_cache import get_derived_cache
+from utils.month_store import MonthPartitionedStore
+from utils.perf import timed
+
+RETENTION_ACTIVITY_COLUMNS = [
+    'staff_name', 'branch', 'join_date', 'month', 'date', 'call_count', 'call_hours', 'get_appointment'
+]
+# 支部が未登録のスタッフの集計名
+UNASSIGNED_BRANCH = '未分類'
+# 入社日がないスタッフのコホート名（すべての月で在籍扱い）
+UNKNOWN_COHORT = '入社日不明'
+RISK_LEVELS = ['high', 'medium', 'low']
+# 支部別集計でアクティブとみなす活動率（%）
+BRANCH_ACTIVE_RATE = 50
+
+
+def _risk_factor_messages(factors):
+    """リスク要因 -> 定着率分析ファイルの risk_factors に出力する文言"""
+    return {
+        'low_activity_rate': f"活動率が{factors['activity_rate_threshold']}%未満",
+        'recent_inactivity': f"最近3ヶ月の活動日数が{factors['recent_activity_days_threshold']}日未満",
+        'low_performance': f"アポ獲得率が{factors['appointment_rate_threshold']}%未満",
+        'short_tenure_low_activity': (
+            f"入社{factors['short_tenure_months']}ヶ月未満で"
+            f"活動日数が{factors['min_activity_days_short_tenure']}日未満"
+        ),
+        'unstable_activity': f"活動のばらつきが大きい（閾値: {factors['activity_variance_threshold']}）"
+    }
+
+
+def _iter_month_staff(json_data):
+    """(月, スタッフ辞書) を古い月から順に返す"""
+    if isinstance(json_data, MonthPartitionedStore):
+        for month in sorted(json_data.partitions):
+            staff_dict = (json_data.partitions[month].get('activity') or {}).get('staff')
+            if staff_dict:
+                yield month, staff_dict
+        return
+    # 基本分析は生成時点の全期間分を持つため、最新月のファイルを使う
+    for month in get_available_months_from_data(json_data):
+        basic_data = load_analysis_data_from_json(json_data, month)[0]
+        monthly_analysis = (basic_data or {}).get('monthly_analysis')
+        if monthly_analysis:
+            for activity_month in sorted(monthly_analysis):
+                staff_dict = monthly_analysis[activity_month].get('staff')
+                if staff_dict:
+                    yield activity_month, staff_dict
+            return
+
+
+@timed()
+def build_retention_activity_table(json_data):
+    """
+    日次活動を定着率分析用のフラットなテーブルに展開
+
+    generateJson.js と同じく、日報1件を活動1日として数え、指標はメイン商材の値を使う
+    （架電数が0の日も活動日に含める）。
+
+    Args:
+        json_data: アップロードデータ（ファイル名→データの辞書、または月別パーティションストア）
+
+    Returns:
+        pd.DataFrame: 1日×スタッフ1行（RETENTION_ACTIVITY_COLUMNS）。日付はUTCのISO文字列のまま
+    """
+    columns = {col: [] for col in RETENTION_ACTIVITY_COLUMNS}
+    for month, staff_dict in _iter_month_staff(json_data):
+        for staff_name, staff_data in staff_dict.items():
+            activities = staff_data.get('daily_activity') or []
+            if not activities:
+                continue
+            count = len(activities)
+            columns['staff_name'].extend([staff_name] * count)
+            columns['branch'].extend([staff_data.get('branch')] * count)
+            columns['join_date'].extend([staff_data.get('join_date')] * count)
+            columns['month'].extend([month] * count)
+            for activity in activities:
+                main = activity.get('main_product') or {}
+                columns['date'].append(activity.get('date'))
+                columns['call_count'].append(main.get('call_count') or 0)
+                columns['call_hours'].append(main.get('call_hours') or 0)
+                columns['get_appointment'].append(main.get('get_appointment') or 0)
+    table = pd.DataFrame(columns)
+    for col in ['call_count', 'call_hours', 'get_appointment']:
+        table[col] = pd.to_numeric(table[col], errors='coerce').fillna(0)
+    return table
+
+
+def _months_between(start, end):
+    """ISO日付文字列の年月差（generateJson.js の getMonthsBetween 相当、どちらかが空の場合は0）"""
+    start = pd.Series(start, dtype=object)
+    end = pd.Series(end, dtype=object)
+    valid = start.notna() & (start != '') & end.notna() & (end != '')
+    start_ym = pd.to_numeric(start.str[:4], errors='coerce') * 12 + pd.to_numeric(start.str[5:7], errors='coerce')
+    end_ym = pd.to_numeric(end.str[:4], errors='coerce') * 12 + pd.to_numeric(end.str[5:7], errors='coerce')
+    return (end_ym - start_ym).where(valid, 0).fillna(0).astype(int).to_numpy()
+
+
+@timed()
+def compute_staff_features(activity):
+    """
+    スタッフ別の定着率特徴量を計算
+
+    スタッフ×月の活動日数の行列を作り、活動月数・直近3活動月の活動日数・活動月の活動日数の
+    分散（母分散）を行列演算で求める。リスク要因の判定に必要な値はすべてここで求めるため、
+    重み・閾値を変えた再計算ではこの結果を使い回せる。
+
+    Args:
+        activity: build_retention_activity_table の戻り値
+
+    Returns:
+        tuple: (特徴量DataFrame（スタッフ名がインデックス）, 活動日数の行列DataFrame（スタッフ×月）)
+    """
+    if activity.empty:
+        return pd.DataFrame(), pd.DataFrame()
+
+    staff_codes, staff_names = pd.factorize(activity['staff_name'])
+    month_codes, months = pd.factorize(activity['month'], sort=True)
+    n_staff, n_months = len(staff_names), len(months)
+
+    # スタッフ×月の活動日数（日報の件数）
+    days = np.zeros((n_staff, n_months), dtype=np.int64)
+    np.add.at(days, (staff_codes, month_codes), 1)
+    active = days > 0
+    active_months = active.sum(axis=1)
+
+    # 直近3活動月: 右から数えた活動月の順位が3以内
+    rank_from_last = np.cumsum(active[:, ::-1], axis=1)[:, ::-1]
+    recent_days = np.where(active & (rank_from_last <= 3), days, 0).sum(axis=1)
+
+    # 活動月の活動日数の母分散（活動月が1ヶ月以下の場合は0）
+    total_days = days.sum(axis=1)
+    mean_days = total_days / np.maximum(active_months, 1)
+    variance = np.where(active, (days - mean_days[:, None]) ** 2, 0).sum(axis=1) / np.maximum(active_months, 1)
+    variance = np.where(active_months > 1, variance, 0.0)
+
+    # 支部・入社日は最初の日報の値、初回/最終活動日は日付の最小/最大（ISO文字列の順序で比較）
+    first_rows = np.unique(staff_codes, return_index=True)[1]
+    branches = activity['branch'].iloc[first_rows].to_numpy(dtype=object)
+    join_dates = activity['join_date'].iloc[first_rows].to_numpy(dtype=object)
+    date_codes, date_values = pd.factorize(activity['date'], sort=True)
+    valid_dates = date_codes >= 0
+    first_date = np.full(n_staff, len(date_values))
+    last_date = np.full(n_staff, -1)
+    np.minimum.at(first_date, staff_codes[valid_dates], date_codes[valid_dates])
+    np.maximum.at(last_date, staff_codes[valid_dates], date_codes[valid_dates])
+    date_lookup = np.append(np.asarray(date_values, dtype=object), None)
+    first_dates = date_lookup[first_date]
+    last_dates = date_lookup[last_date]
+
+    def staff_sum(column):
+        return np.bincount(staff_codes, weights=activity[column].to_numpy(dtype=float), minlength=n_staff)
+
+    calls = staff_sum('call_count')
+    appointments = staff_sum('get_appointment')
+    activity_rate = active_months / n_months * 100
+    features = pd.DataFrame({
+        'branch': branches,
+        'join_date': join_dates,
+        'first_activity_date': first_dates,
+        'last_activity_date': last_dates,
+        'months_since_join': _months_between(join_dates, last_dates),
+        'months_since_first_activity': _months_between(first_dates, last_dates),
+        'active_months': active_months,
+        'total_activity_days': total_days,
+        # 判定はファイルと同じく小数点以下2桁に丸めた値で行う
+        'monthly_activity_rate': np.round(activity_rate, 2),
+        'avg_monthly_activity_days': total_days / np.maximum(active_months, 1),
+        'total_calls': calls,
+        'total_hours': staff_sum('call_hours'),
+        'total_appointments': appointments,
+        'appointment_rate': np.divide(appointments * 100, calls, out=np.zeros(n_staff, dtype=float), where=calls > 0),
+        'recent_activity_days': recent_days,
+        'activity_variance': variance
+    }, index=pd.Index(staff_names, name='staff_name'))
+    activity_days = pd.DataFrame(days, index=features.index, columns=pd.Index(months, name='month'))
+    return features, activity_days
+
+
+def compute_risk_flags(features, factors=None):
+    """
+    スタッフごとに5つのリスク要因に該当するか判定
+
+    Args:
+        features: compute_staff_features の特徴量DataFrame
+        factors: 判定基準（省略時は RISK_FACTORS）
+
+    Returns:
+        pd.DataFrame: スタッフ×リスク要因（RISK_WEIGHTS のキー）の真偽値
+    """
+    factors = {**RISK_FACTORS, **(factors or {})}
+    return pd.DataFrame({
+        'low_activity_rate': features['monthly_activity_rate'] < factors['activity_rate_threshold'],
+        'recent_inactivity': features['recent_activity_days'] < factors['recent_activity_days_threshold'],
+        'low_performance': features['appointment_rate'] < factors['appointment_rate_threshold'],
+        'short_tenure_low_activity': (
+            (features['months_since_join'] < factors['short_tenure_months'])
+            & (features['total_activity_days'] < factors['min_activity_days_short_tenure'])
+        ),
+        'unstable_activity': features['activity_variance'] > factors['activity_variance_threshold']
+    }, index=features.index)
+
+
+def score_risk(flags, weights=None, thresholds=None):
+    """
+    リスク要因の重み付き合計からリスクスコアとリスクレベルを計算
+
+    Args:
+        flags: compute_risk_flags の戻り値
+        weights: リスク要因ごとの加点（省略時は RISK_WEIGHTS）
+        thresholds: リスクレベルの閾値（省略時は RISK_THRESHOLDS）
+
+    Returns:
+        tuple: (リスクスコアのSeries, リスクレベル（high/medium/low）のSeries)
+    """
+    weights = {**RISK_WEIGHTS, **(weights or {})}
+    thresholds = {**RISK_THRESHOLDS, **(thresholds or {})}
+    weight_vector = np.array([weights[factor] for factor in flags.columns], dtype=float)
+    scores = flags.to_numpy(dtype=float) @ weight_vector
+    levels = np.select(
+        [scores >= thresholds['high_risk'], scores >= thresholds['medium_risk']],
+        ['high', 'medium'], default='low'
+    )
+    return pd.Series(scores, index=flags.index, name='risk_score'), pd.Series(levels, index=flags.index, name='risk_level')
+
+
+def compute_monthly_retention(features, activity_days):
+    """
+    月別のアクティブスタッフ数・総スタッフ数・定着率を計算
+
+    総スタッフ数は入社月がその月以前（入社日がない場合を含む）のスタッフ数、
+    アクティブスタッフ数はそのうちその月に活動したスタッフ数とする。
+
+    Args:
+        features: compute_staff_features の特徴量DataFrame
+        activity_days: compute_staff_features の活動日数の行列
+
+    Returns:
+        pd.DataFrame: month, active_staff, total_staff, retention_rate（%）
+    """
+    if activity_days.empty:
+        return pd.DataFrame(columns=['month', 'active_staff', 'total_staff', 'retention_rate'])
+    months = activity_days.columns.to_numpy(dtype=str)
+    join_months = features['join_date'].fillna('').astype(str).str[:7].to_numpy(dtype=str)
+    # 入社日がない（空文字）スタッフはすべての月で在籍扱いになる
+    enrolled = join_months[:, None] <= months[None, :]
+    active = enrolled & (activity_days.to_numpy() > 0)
+    total_staff = enrolled.sum(axis=0)
+    active_staff = active.sum(axis=0)
+    retention_rate = np.divide(
+        active_staff * 100, total_staff, out=np.zeros(len(months), dtype=float), where=total_staff > 0
+    )
+    return pd.DataFrame({
+        'month': months,
+        'active_staff': active_staff,
+        'total_staff': total_staff,
+        'retention_rate': retention_rate
+    })
+
+
+def compute_cohort_retention(features, activity_days):
+    """
+    入社月コホート×活動月の定着率を計算
+
+    スタッフ×月の活動有無を入社月でまとめて1回のグループ集計で求める。入社月・在籍の判定は
+    compute_monthly_retention と同じ（入社日のUTC文字列の年月）で、コホートの全行を合計すると
+    月別のアクティブ/総スタッフ数に一致する。
+
+    Args:
+        features: compute_staff_features の特徴量DataFrame
+        activity_days: compute_staff_features の活動日数の行列
+
+    Returns:
+        dict: rates（定着率%、入社前の月は欠損）, active（アクティブ人数、入社前の月は欠損）,
+            sizes（コホートの人数）。rates/active はコホートが行、活動月が列のDataFrame
+    """
+    if activity_days.empty:
+        empty = pd.DataFrame()
+        return {'rates': empty, 'active': empty, 'sizes': pd.Series(dtype=int)}
+    join_months = features['join_date'].fillna('').astype(str).str[:7]
+    cohorts = join_months.where(join_months != '', UNKNOWN_COHORT).to_numpy()
+    active = pd.DataFrame(activity_days.to_numpy() > 0, columns=activity_days.columns)
+
+    grouped = active.groupby(cohorts, sort=True)
+    active_counts = grouped.sum()
+    sizes = grouped.size()
+    months = activity_days.columns.to_numpy(dtype=str)
+    cohort_months = active_counts.index.to_numpy(dtype=str)
+    enrolled = (cohort_months[:, None] <= months[None, :]) | (cohort_months == UNKNOWN_COHORT)[:, None]
+
+    active_counts = active_counts.where(enrolled)
+    rates = active_counts.div(sizes, axis=0) * 100
+    active_counts.index.name = rates.index.name = sizes.index.name = 'cohort'
+    return {'rates': rates, 'active': active_counts, 'sizes': sizes.rename('staff_count')}
+
+
+def summarize_branch_risk(features, scores, levels):
+    """
+    支部別のスタッフ数・アクティブ数・リスクレベル別人数・平均活動率・平均リスクスコアを集計
+
+    Args:
+        features: compute_staff_features の特徴量DataFrame
+        scores: score_risk のリスクスコア
+        levels: score_risk のリスクレベル
+
+    Returns:
+        pd.DataFrame: 支部名がインデックスの集計（支部が未登録のスタッフは「未分類」）
+    """
+    frame = pd.DataFrame({
+        'branch': features['branch'].fillna(UNASSIGNED_BRANCH).replace('', UNASSIGNED_BRANCH),
+        'active': features['monthly_activity_rate'] > BRANCH_ACTIVE_RATE,
+        'activity_rate': features['monthly_activity_rate'],
+        'risk_score': scores
+    })
+    for level in RISK_LEVELS:
+        frame[f'{level}_risk_staff'] = levels == level
+    summary = frame.groupby('branch', sort=False).agg(
+        total_staff=('risk_score', 'size'),
+        active_staff=('active', 'sum'),
+        high_risk_staff=('high_risk_staff', 'sum'),
+        medium_risk_staff=('medium_risk_staff', 'sum'),
+        low_risk_staff=('low_risk_staff', 'sum'),
+        avg_activity_rate=('activity_rate', 'mean'),
+        avg_risk_score=('risk_score', 'mean')
+    )
+    summary.index.name = 'branch_name'
+    return summary
+
+
+def get_retention_features(json_data):
+    """
+    アップロードデータのスタッフ別特徴量を取得（派生データキャッシュに保持）
+
+    Args:
+        json_data: アップロードデータ
+
+    Returns:
+        tuple: compute_staff_features の戻り値
+    """
+    return get_derived_cache(json_data).get_or_build(
+        ('retention_features',),
+        lambda: compute_staff_features(build_retention_activity_table(json_data))
+    )
+
+
+def _fixed(value):
+    """JavaScriptの toFixed(2) 相当の文字列"""
+    return f"{value:.2f}"
+
+
+def _optional(value):
+    """欠損値をNoneに変換"""
+    return None if pd.isna(value) else value
+
+
+def _int(value):
+    """整数値であればintに変換（JSONの数値と同じ表現にする）"""
+    value = float(value)
+    return int(value) if value.is_integer() else value
+
+
+@timed(rows=lambda result: len(result['staff_retention_analysis']))
+def compute_retention_analysis(json_data, weights=None, thresholds=None, factors=None, features=None):
+    """
+    定着率分析ファイル（定着率分析_YYYY-MM.json）と同じ構造の結果を再計算
+
+    staff_retention_analysis には月別の日次活動（activity_months）を含めない。
+
+    Args:
+        json_data: アップロードデータ
+        weights: リスク要因ごとの加点（省略時は RISK_WEIGHTS）
+        thresholds: リスクレベルの閾値（省略時は RISK_THRESHOLDS）
+        factors: リスク要因の判定基準（省略時は RISK_FACTORS）
+        features: 計算済みの compute_staff_features の戻り値（省略時はキャッシュから取得）
+
+    Returns:
+        dict: metadata, staff_retention_analysis, monthly_retention_rates,
+            branch_retention_analysis, risk_analysis
+    """
+    staff, activity_days = features if features is not None else get_retention_features(json_data)
+    factors = {**RISK_FACTORS, **(factors or {})}
+    months = [str(month) for month in activity_days.columns]
+
+    staff_analysis = {}
+    risk_analysis = {f'{level}_risk_staff': [] for level in RISK_LEVELS}
+    branch_analysis = {}
+    monthly_retention_rates = {}
+    if not staff.empty:
+        flags = compute_risk_flags(staff, factors)
+        scores, levels = score_risk(flags, weights, thresholds)
+        messages = _risk_factor_messages(factors)
+        flag_values = flags.to_numpy()
+        for i, (staff_name, row) in enumerate(staff.iterrows()):
+            level = levels.iat[i]
+            risk_analysis[f'{level}_risk_staff'].append(staff_name)
+            staff_analysis[staff_name] = {
+                'staff_name': staff_name,
+                'branch': _optional(row['branch']),
+                'join_date': _optional(row['join_date']),
+                'first_activity_date': _optional(row['first_activity_date']),
+                'last_activity_date': _optional(row['last_activity_date']),
+                'months_since_join': int(row['months_since_join']),
+                'months_since_first_activity': int(row['months_since_first_activity']),
+                'active_months': int(row['active_months']),
+                'total_activity_days': int(row['total_activity_days']),
+                'monthly_activity_rate': _fixed(row['monthly_activity_rate']),
+                'avg_monthly_activity_days': _fixed(row['avg_monthly_activity_days']),
+                'total_calls': _int(row['total_calls']),
+                'total_hours': _int(row['total_hours']),
+                'total_appointments': _int(row['total_appointments']),
+                'appointment_rate': _fixed(row['appointment_rate']),
+                'risk_score': _int(scores.iat[i]),
+                'risk_level': level,
+                'risk_factors': [messages[factor] for factor, hit in zip(flags.columns, flag_values[i]) if hit]
+            }
+
+        for record in compute_monthly_retention(staff, activity_days).to_dict('records'):
+            monthly_retention_rates[record['month']] = {
+                'month': record['month'],
+                'active_staff': int(record['active_staff']),
+                'total_staff': int(record['total_staff']),
+                'retention_rate': _fixed(record['retention_rate']) if record['total_staff'] > 0 else 0
+            }
+
+        for branch, record in summarize_branch_risk(staff, scores, levels).iterrows():
+            branch_analysis[branch] = {
+                'branch_name': branch,
+                **{key: int(record[key]) for key in [
+                    'total_staff', 'active_staff', 'high_risk_staff', 'medium_risk_staff', 'low_risk_staff'
+                ]},
+                'avg_activity_rate': _fixed(record['avg_activity_rate']),
+                'avg_risk_score': _fixed(record['avg_risk_score'])
+            }
+
+    return {
+        'metadata': {
+            'analysis_period': {
+                'start_month': months[0] if months else None,
+                'end_month': months[-1] if months else None
+            },
+            'total_months': len(months)
+        },
+        'staff_retention_analysis': staff_analysis,
+        'monthly_retention_rates': monthly_retention_rates,
+        'branch_retention_analysis': branch_analysis,
+        'risk_analysis': risk_analysis
+    }
+
+
+def get_retention_analysis(json_data):
+    """
+    既定の重み・閾値で再計算した定着率分析を取得（派生データキャッシュに保持）
+
+    Args:
+        json_data: アップロードデータ
+
+    Returns:
+        dict: compute_retention_analysis の戻り値
+    """
+    return get_derived_cache(json_data).get_or_build(
+        ('retention_analysis',), lambda: compute_retention_analysis(json_data)
+    )
+
+
+def get_cohort_retention(json_data):
+    """
+    入社月コホート別の定着率を取得（派生データキャッシュに保持）
+
+    Args:
+        json_data: アップロードデータ
+
+    Returns:
+        dict: compute_cohort_retention の戻り値
+    """
+    return get_derived_cache(json_data).get_or_build(
+        ('retention_cohorts',), lambda: compute_cohort_retention(*get_retention_features(json_data))
+    )
@@ -0,0 +1,846 @@
+"""合成データセットの生成
+
+generateJson.js が出力する月次レポート（基本分析/詳細分析/月次サマリー/定着率分析）と
+同じ構造のダミーデータを、スタッフ数・月数・支部数・商材数を指定して生成する。
+乱数はシードで固定されるため、同じ引数からは常に同じデータが得られる。
+性能改善の検証用に、現行規模の10倍・100倍のデータを作成することを想定している。
+
+生成CLI:
+    python -m utils.synthetic_data -o 合成データ.zip --scale 10
+    python -m utils.synthetic_data -o 合成データ.isbundle --staff 300 --months 12
+"""
+import argparse
+import calendar
+import datetime
+import json
+import math
+import os
+import random
+import zipfile
+
+from utils.config import RISK_FACTORS, RISK_THRESHOLDS, RISK_WEIGHTS
+
+# 既定の規模（現行の運用データ相当）
+DEFAULT_STAFF_COUNT = 30
+DEFAULT_MONTH_COUNT = 6
+DEFAULT_BRANCH_COUNT = 4
+DEFAULT_PRODUCT_COUNT = 3
+DEFAULT_START_MONTH = '2025-01'
+
+# 支部名・商材名（指定数が多い場合は連番で補う）
+BRANCH_NAMES = ['東京', '横浜', '名古屋', '福岡', '新潟', '大分']
+PRODUCT_NAMES = ['商材A', '商材B', '商材C', '商材D', '商材E']
+
+# 支部が未登録のスタッフの割合（スタッフ一覧にいない日報提出者に相当）
+UNASSIGNED_BRANCH_RATE = 0.05
+# 期間中に活動をやめるスタッフの割合
+CHURN_RATE = 0.25
+# サブ商材を架電する日の割合
+SUB_PRODUCT_RATE = 0.2
+# 自己申告アポのうちTAAANに入力される割合
+TAAAN_ENTRY_RATE = 0.6
+# TAAAN商談ステータスの出現比率
+DEAL_STATUS_WEIGHTS = {'承認': 0.55, '却下': 0.15, '承認待ち': 0.2, '要対応': 0.1}
+
+# config.js の既定値（アラート・月次サマリー）
+ALERT_THRESHOLDS = {
+    'approval_rate': {'warning': 60, 'critical': 50},
+    'high_risk_staff': {'warning': 10, 'critical': 15},
+    'retention': {'warning': 30, 'critical': 20}
+}
+TOP_STAFF_COUNT = 10
+
+
+def _month_range(start_month, month_count):
+    """開始月から指定数の月（YYYY-MM）を返す"""
+    year, month = map(int, start_month.split('-'))
+    months = []
+    for _ in range(month_count):
+        months.append(f"{year:04d}-{month:02d}")
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return months
+
+
+def _names(base_names, count, prefix):
+    """既定の名前リストを使い、足りない分は連番で補う"""
+    names = list(base_names[:count])
+    for i in range(len(names), count):
+        names.append(f"{prefix}{i + 1}")
+    return names
+
+
+def _jst_iso(day):
+    """JSTの日付をgenerateJson.jsと同じUTCのISO文字列（前日15:00Z）に変換"""
+    return (day - datetime.timedelta(days=1)).strftime('%Y-%m-%dT15:00:00.000Z')
+
+
+def _to_fixed(value):
+    """JavaScriptの toFixed(2) に相当"""
+    return f"{value:.2f}"
+
+
+def _js_round(value):
+    """JavaScriptの Math.round に相当（0.5は切り上げ）"""
+    return math.floor(value + 0.5)
+
+
+def _months_between(date1, date2):
+    """generateJson.js の getMonthsBetween に相当（ISO文字列の年月差）"""
+    if not date1 or not date2:
+        return 0
+    return (int(date2[:4]) - int(date1[:4])) * 12 + (int(date2[5:7]) - int(date1[5:7]))
+
+
+def _build_roster(rng, staff_count, months, branches, products):
+    """スタッフ一覧（支部・入社日・活動傾向）を生成"""
+    first_day = datetime.date.fromisoformat(months[0] + '-01')
+    roster = []
+    for i in range(staff_count):
+        branch = None if rng.random() < UNASSIGNED_BRANCH_RATE else rng.choice(branches)
+        # 7割は期間開始前、3割は期間中に入社
+        if rng.random() < 0.7:
+            join_day = first_day - datetime.timedelta(days=rng.randint(1, 365))
+        else:
+            join_month = rng.choice(months)
+            year, month = map(int, join_month.split('-'))
+            join_day = datetime.date(year, month, rng.randint(1, calendar.monthrange(year, month)[1]))
+        last_month = rng.choice(months) if rng.random() < CHURN_RATE else months[-1]
+        roster.append({
+            'name': f"スタッフ{i + 1:04d}",
+            'branch': branch,
+            'join_day': join_day,
+            'join_date': _jst_iso(join_day),
+            'last_month': last_month,
+            'activity_rate': rng.uniform(0.2, 0.9),
+            'skill': rng.uniform(0.5, 1.5),
+            'main_product': rng.choice(products)
+        })
+    return roster
+
+
+def _product_record(rng, product, call_hours, skill):
+    """1商材分の日次指標を生成（架電数から各結果を配分）"""
+    call_count = int(call_hours * rng.uniform(12, 25))
+    disconnect = int(call_count * rng.uniform(0.1, 0.3))
+    reception_bk = int(call_count * rng.uniform(0.2, 0.4))
+    no_one_in_charge = int(call_count * rng.uniform(0.1, 0.2))
+    charge_connected = max(call_count - disconnect - reception_bk - no_one_in_charge, 0)
+    charge_bk = int(charge_connected * rng.uniform(0.3, 0.6))
+    get_appointment = min(int(charge_connected * 0.12 * skill * rng.uniform(0, 1.5)), charge_connected - charge_bk)
+    return {
+        'product': product,
+        'call_hours': call_hours,
+        'call_count': call_count,
+        'reception_bk': reception_bk,
+        'no_one_in_charge': no_one_in_charge,
+        'disconnect': disconnect,
+        'charge_connected': charge_connected,
+        'charge_bk': charge_bk,
+        'get_appointment': get_appointment
+    }
+
+
+def _generate_daily(rng, roster, months, products):
+    """日報レコード（generateJson.js の daily 相当）を日付順に生成"""
+    daily = []
+    for month in months:
+        year, mon = map(int, month.split('-'))
+        for day_num in range(1, calendar.monthrange(year, mon)[1] + 1):
+            day = datetime.date(year, mon, day_num)
+            weekend = day.weekday() >= 5
+            for staff in roster:
+                if day < staff['join_day'] or month > staff['last_month']:
+                    continue
+                rate = staff['activity_rate'] * (0.2 if weekend else 1.0)
+                if rng.random() >= rate:
+                    continue
+                main_hours = rng.choice([1, 1.5, 2, 2.5, 3, 4])
+                main_product = staff['main_product'] if rng.random() < 0.8 else rng.choice(products)
+                sub_products = []
+                if len(products) > 1 and rng.random() < SUB_PRODUCT_RATE:
+                    sub_product = rng.choice([p for p in products if p != main_product])
+                    sub_products.append(_product_record(rng, sub_product, rng.choice([0.5, 1, 1.5]), staff['skill']))
+                daily.append({
+                    'date': _jst_iso(day),
+                    'month': month,
+                    'staff': staff['name'],
+                    'branch': staff['branch'],
+                    'join_date': staff['join_date'],
+                    'main_product': _product_record(rng, main_product, main_hours, staff['skill']),
+                    'sub_products': sub_products
+                })
+    return daily
+
+
+def _generate_deals(rng, daily, product_prices):
+    """自己申告アポの一部をTAAAN商談として生成"""
+    statuses = list(DEAL_STATUS_WEIGHTS)
+    weights = list(DEAL_STATUS_WEIGHTS.values())
+    deals = []
+    for record in daily:
+        for product in [record['main_product']] + record['sub_products']:
+            for _ in range(product['get_appointment']):
+                if rng.random() >= TAAAN_ENTRY_RATE:
+                    continue
+                deals.append({
+                    'date': record['date'],
+                    'month': record['month'],
+                    'staff': record['staff'],
+                    'product': product['product'],
+                    'deal_status': rng.choices(statuses, weights)[0],
+                    'commission': product_prices[product['product']]
+                })
+    return deals
+
+
+def _new_totals(**fields):
+    """集計用の合計値フィールドを初期化"""
+    totals = dict(fields)
+    totals.update({
+        'total_calls': 0,
+        'total_hours': 0,
+        'total_appointments': 0,
+        'total_deals': 0,
+        'total_approved': 0,
+        'total_rejected': 0,
+        'total_revenue': 0,
+        'total_potential_revenue': 0,
+        'approval_rate': 0
+    })
+    return totals
+
+
+def _add_activity(target, products):
+    """架電数・架電時間・アポ数を加算"""
+    for product in products:
+        target['total_calls'] += product['call_count']
+        target['total_hours'] += product['call_hours']
+        target['total_appointments'] += product['get_appointment']
+
+
+def _add_deal(target, status, commission):
+    """TAAAN商談をステータス別に加算（承認は確定売上、承認待ち・要対応は潜在売上）"""
+    target['total_deals'] += 1
+    if status == '承認':
+        target['total_approved'] += 1
+        target['total_revenue'] += commission
+    elif status == '却下':
+        target['total_rejected'] += 1
+    elif status in ('承認待ち', '要対応'):
+        target['total_potential_revenue'] += commission
+
+
+def _build_basic_analysis(daily, deals, staff_branches, generated_at):
+    """基本分析（generateJson.js の generateAnalysisJson 相当）を組み立てる"""
+    monthly_data = {}
+    for record in daily:
+        month = record['month']
+        if month not in monthly_data:
+            summary = _new_totals()
+            del summary['approval_rate']
+            monthly_data[month] = {
+                'month': month,
+                'branches': {},
+                'products': {},
+                'staff': {},
+                'summary': summary
+            }
+        month_data = monthly_data[month]
+        products = [record['main_product']] + record['sub_products']
+
+        if record['branch']:
+            branch_data = month_data['branches'].setdefault(
+                record['branch'], _new_totals(branch_name=record['branch'], staff_count=0)
+            )
+            branch_data.setdefault('staff_list', [])
+            _add_activity(branch_data, products)
+            if record['staff'] not in branch_data['staff_list']:
+                branch_data['staff_list'].append(record['staff'])
+                branch_data['staff_count'] = len(branch_data['staff_list'])
+
+        for product in products:
+            product_data = month_data['products'].setdefault(
+                product['product'], _new_totals(product_name=product['product'])
+            )
+            _add_activity(product_data, [product])
+
+        staff_data = month_data['staff'].get(record['staff'])
+        if staff_data is None:
+            staff_data = _new_totals(
+                staff_name=record['staff'], branch=record['branch'], join_date=record['join_date']
+            )
+            staff_data['daily_activity'] = []
+            month_data['staff'][record['staff']] = staff_data
+        _add_activity(staff_data, products)
+        staff_data['daily_activity'].append({
+            'date': record['date'],
+            'main_product': record['main_product'],
+            'sub_products': record['sub_products']
+        })
+        _add_activity(month_data['summary'], products)
+
+    for deal in deals:
+        month_data = monthly_data.get(deal['month'])
+        if month_data is None:
+            continue
+        status = deal['deal_status']
+        commission = deal['commission']
+        _add_deal(month_data['summary'], status, commission)
+        branch = staff_branches.get(deal['staff'])
+        if branch and branch in month_data['branches']:
+            _add_deal(month_data['branches'][branch], status, commission)
+        elif not branch:
+            branch_data = month_data['branches'].setdefault(
+                '未設定', _new_totals(branch_name='未設定', staff_count=0)
+            )
+            branch_data.setdefault('staff_list', [])
+            _add_deal(branch_data, status, commission)
+        _add_deal(month_data['products'][deal['product']], status, commission)
+        _add_deal(month_data['staff'][deal['staff']], status, commission)
+
+    summary_by_period = _new_totals()
+    del summary_by_period['approval_rate']
+    summary_by_period['overall_approval_rate'] = 0
+    for month_data in monthly_data.values():
+        summary = month_data['summary']
+        if summary['total_deals'] > 0:
+            summary['approval_rate'] = _to_fixed(summary['total_approved'] / summary['total_deals'] * 100)
+        for group in ('branches', 'products', 'staff'):
+            for item in month_data[group].values():
+                if item['total_deals'] > 0:
+                    item['approval_rate'] = _to_fixed(item['total_approved'] / item['total_deals'] * 100)
+        for key in summary_by_period:
+            if key in summary:
+                summary_by_period[key] += summary[key]
+    if summary_by_period['total_deals'] > 0:
+        summary_by_period['overall_approval_rate'] = _to_fixed(
+            summary_by_period['total_approved'] / summary_by_period['total_deals'] * 100
+        )
+
+    sorted_months = sorted(monthly_data)
+    return {
+        'metadata': {
+            'generated_at': generated_at,
+            'data_period': {
+                'start_month': sorted_months[0] if sorted_months else None,
+                'end_month': sorted_months[-1] if sorted_months else None
+            },
+            'total_months': len(monthly_data)
+        },
+        'monthly_analysis': monthly_data,
+        'summary_by_period': summary_by_period,
+        'monthly_conversion': _build_monthly_conversion(daily, deals, staff_branches)
+    }
+
+
+def _build_monthly_conversion(daily, deals, staff_branches):
+    """アポ獲得・TAAAN入力・承認の月次集計（monthly_conversion）を組み立てる"""
+    def new_counts():
+        return {'self_reported_appointments': 0, 'taaan_entries': 0, 'approved_deals': 0}
+
+    conversion = {}
+    for record in daily:
+        month_conv = conversion.setdefault(record['month'], {
+            'total': new_counts(), 'by_staff': {}, 'by_branch': {}, 'by_product': {}
+        })
+        appointments = record['main_product']['get_appointment'] + sum(
+            sub['get_appointment'] for sub in record['sub_products']
+        )
+        keys = (
+            ('by_staff', record['staff'] or '未設定'),
+            ('by_branch', record['branch'] or '未設定'),
+            ('by_product', record['main_product']['product'] or '未設定')
+        )
+        month_conv['total']['self_reported_appointments'] += appointments
+        for group, key in keys:
+            month_conv[group].setdefault(key, new_counts())['self_reported_appointments'] += appointments
+
+    for deal in deals:
+        month_conv = conversion.get(deal['month'])
+        if month_conv is None:
+            continue
+        keys = (
+            ('by_staff', deal['staff'] or '未設定'),
+            ('by_branch', staff_branches.get(deal['staff']) or '未設定'),
+            ('by_product', deal['product'] or '未設定')
+        )
+        targets = [month_conv['total']] + [month_conv[group].setdefault(key, new_counts()) for group, key in keys]
+        for target in targets:
+            target['taaan_entries'] += 1
+            if deal['deal_status'] == '承認':
+                target['approved_deals'] += 1
+
+    for month_conv in conversion.values():
+        items = [month_conv['total']]
+        for group in ('by_staff', 'by_branch', 'by_product'):
+            items.extend(month_conv[group].values())
+        for item in items:
+            apps = item['self_reported_appointments']
+            entries = item['taaan_entries']
+            item['taaan_rate'] = entries / apps if apps > 0 else None
+            item['approval_rate'] = item['approved_deals'] / entries if entries > 0 else None
+            item['true_approval_rate'] = item['approved_deals'] / apps if apps > 0 else None
+    return conversion
+
+
+def _build_retention_analysis(daily, generated_at):
+    """定着率分析（generateJson.js の generateRetentionAnalysisJson 相当）を組み立てる"""
+    history = {}
+    all_months = set()
+    for record in daily:
+        staff = history.get(record['staff'])
+        if staff is None:
+            staff = history[record['staff']] = {
+                'branch': record['branch'],
+                'join_date': record['join_date'],
+                'activity_months': {},
+                'first_activity_date': record['date'],
+                'last_activity_date': record['date'],
+                'total_activity_days': 0,
+                'total_calls': 0,
+                'total_hours': 0,
+                'total_appointments': 0
+            }
+        month = record['month']
+        month_data = staff['activity_months'].setdefault(month, {
+            'month': month,
+            'activity_days': 0,
+            'total_calls': 0,
+            'total_hours': 0,
+            'total_appointments': 0,
+            'daily_activities': []
+        })
+        main = record['main_product']
+        month_data['activity_days'] += 1
+        for target in (month_data, staff):
+            target['total_calls'] += main['call_count']
+            target['total_hours'] += main['call_hours']
+            target['total_appointments'] += main['get_appointment']
+        month_data['daily_activities'].append({
+            'date': record['date'],
+            'call_count': main['call_count'],
+            'call_hours': main['call_hours'],
+            'get_appointment': main['get_appointment'],
+            'product': main['product']
+        })
+        staff['total_activity_days'] += 1
+        staff['last_activity_date'] = record['date']
+        all_months.add(month)
+
+    sorted_months = sorted(all_months)
+    risk_analysis = {'high_risk_staff': [], 'medium_risk_staff': [], 'low_risk_staff': []}
+    staff_analysis = {}
+    for staff_name, staff in history.items():
+        months_since_join = _months_between(staff['join_date'], staff['last_activity_date'])
+        active_months = len(staff['activity_months'])
+        activity_rate = active_months / len(all_months) * 100 if all_months else 0
+        monthly_activity_rate = _to_fixed(activity_rate) if all_months else 0
+        avg_days = _to_fixed(staff['total_activity_days'] / active_months) if active_months else 0
+
+        risk_score = 0
+        risk_factors = []
+        if float(monthly_activity_rate) < RISK_FACTORS['activity_rate_threshold']:
+            risk_score += RISK_WEIGHTS['low_activity_rate']
+            risk_factors.append(f"活動率が{RISK_FACTORS['activity_rate_threshold']}%未満")
+        recent_days = sum(
+            staff['activity_months'][m]['activity_days'] for m in sorted(staff['activity_months'])[-3:]
+        )
+        if recent_days < RISK_FACTORS['recent_activity_days_threshold']:
+            risk_score += RISK_WEIGHTS['recent_inactivity']
+            risk_factors.append(f"最近3ヶ月の活動日数が{RISK_FACTORS['recent_activity_days_threshold']}日未満")
+        appointment_rate = staff['total_appointments'] / staff['total_calls'] * 100 if staff['total_calls'] > 0 else 0
+        if appointment_rate < RISK_FACTORS['appointment_rate_threshold']:
+            risk_score += RISK_WEIGHTS['low_performance']
+            risk_factors.append(f"アポ獲得率が{RISK_FACTORS['appointment_rate_threshold']}%未満")
+        if (months_since_join < RISK_FACTORS['short_tenure_months']
+                and staff['total_activity_days'] < RISK_FACTORS['min_activity_days_short_tenure']):
+            risk_score += RISK_WEIGHTS['short_tenure_low_activity']
+            risk_factors.append(
+                f"入社{RISK_FACTORS['short_tenure_months']}ヶ月未満で"
+                f"活動日数が{RISK_FACTORS['min_activity_days_short_tenure']}日未満"
+            )
+        activity_days = [m['activity_days'] for m in staff['activity_months'].values()]
+        variance = 0
+        if len(activity_days) > 1:
+            avg = sum(activity_days) / len(activity_days)
+            variance = sum((d - avg) ** 2 for d in activity_days) / len(activity_days)
+        if variance > RISK_FACTORS['activity_variance_threshold']:
+            risk_score += RISK_WEIGHTS['unstable_activity']
+            risk_factors.append(f"活動のばらつきが大きい（閾値: {RISK_FACTORS['activity_variance_threshold']}）")
+
+        if risk_score >= RISK_THRESHOLDS['high_risk']:
+            risk_level = 'high'
+        elif risk_score >= RISK_THRESHOLDS['medium_risk']:
+            risk_level = 'medium'
+        else:
+            risk_level = 'low'
+        risk_analysis[f"{risk_level}_risk_staff"].append(staff_name)
+
+        staff_analysis[staff_name] = {
+            'staff_name': staff_name,
+            'branch': staff['branch'],
+            'join_date': staff['join_date'],
+            'first_activity_date': staff['first_activity_date'],
+            'last_activity_date': staff['last_activity_date'],
+            'months_since_join': months_since_join,
+            'months_since_first_activity': _months_between(
+                staff['first_activity_date'], staff['last_activity_date']
+            ),
+            'active_months': active_months,
+            'total_activity_days': staff['total_activity_days'],
+            'monthly_activity_rate': monthly_activity_rate,
+            'avg_monthly_activity_days': avg_days,
+            'total_calls': staff['total_calls'],
+            'total_hours': staff['total_hours'],
+            'total_appointments': staff['total_appointments'],
+            'appointment_rate': _to_fixed(appointment_rate),
+            'risk_score': risk_score,
+            'risk_level': risk_level,
+            'risk_factors': risk_factors,
+            'activity_months': staff['activity_months']
+        }
+
+    monthly_retention_rates = {}
+    for month in sorted_months:
+        active = 0
+        total = 0
+        for staff in history.values():
+            join_month = staff['join_date'][:7] if staff['join_date'] else None
+            if not join_month or join_month <= month:
+                total += 1
+                if month in staff['activity_months']:
+                    active += 1
+        monthly_retention_rates[month] = {
+            'month': month,
+            'active_staff': active,
+            'total_staff': total,
+            'retention_rate': _to_fixed(active / total * 100) if total > 0 else 0
+        }
+
+    branch_analysis = {}
+    for staff_name, staff in staff_analysis.items():
+        branch = staff['branch'] or '未分類'
+        branch_data = branch_analysis.setdefault(branch, {
+            'branch_name': branch,
+            'total_staff': 0,
+            'active_staff': 0,
+            'high_risk_staff': 0,
+            'medium_risk_staff': 0,
+            'low_risk_staff': 0,
+            'avg_activity_rate': 0,
+            'avg_risk_score': 0
+        })
+        branch_data['total_staff'] += 1
+        branch_data['avg_activity_rate'] += float(staff['monthly_activity_rate'])
+        branch_data['avg_risk_score'] += staff['risk_score']
+        branch_data[f"{staff['risk_level']}_risk_staff"] += 1
+        if float(staff['monthly_activity_rate']) > 50:
+            branch_data['active_staff'] += 1
+    for branch_data in branch_analysis.values():
+        branch_data['avg_activity_rate'] = _to_fixed(branch_data['avg_activity_rate'] / branch_data['total_staff'])
+        branch_data['avg_risk_score'] = _to_fixed(branch_data['avg_risk_score'] / branch_data['total_staff'])
+
+    return {
+        'metadata': {
+            'generated_at': generated_at,
+            'analysis_period': {
+                'start_month': sorted_months[0] if sorted_months else None,
+                'end_month': sorted_months[-1] if sorted_months else None
+            },
+            'total_months': len(all_months)
+        },
+        'staff_retention_analysis': staff_analysis,
+        'monthly_retention_rates': monthly_retention_rates,
+        'branch_retention_analysis': branch_analysis,
+        'risk_analysis': risk_analysis
+    }
+
+
+def _build_detailed_analysis(basic_analysis):
+    """詳細分析（基本分析＋detailed_metrics）を組み立てる"""
+    detailed = dict(basic_analysis)
+    detailed['detailed_metrics'] = {
+        'acquisition_analysis': {
+            'new_customers': {},
+            'existing_customers': {},
+            'acquisition_efficiency': {}
+        },
+        'activity_efficiency': {
+            'calls_per_hour': {},
+            'appointments_per_call': {},
+            'deals_per_appointment': {},
+            'revenue_per_deal': {}
+        },
+        'trend_analysis': {
+            'monthly_trends': {},
+            'branch_comparison': {},
+            'product_performance': {}
+        }
+    }
+    return detailed
+
+
+def _alert(level, subject, value, threshold, unit, below):
+    """月次サマリーのアラートを作成"""
+    direction = '下回っています' if below else '超えています'
+    label = '危険レベル' if level == 'critical' else '警告レベル'
+    return {
+        'type': level,
+        'message': f"{subject}が{label}を{direction}",
+        'value': f"{value}{unit}",
+        'threshold': f"{threshold}{unit}"
+    }
+
+
+def _build_monthly_summary(basic_analysis, retention_analysis, month, generated_at):
+    """月次サマリー（generateJson.js の generateMonthlySummary 相当）を組み立てる"""
+    month_data = basic_analysis['monthly_analysis'].get(month)
+    if month_data is None:
+        return None
+    summary = month_data['summary']
+    risk = retention_analysis['risk_analysis']
+    retention_rate = retention_analysis['monthly_retention_rates'].get(month, {}).get('retention_rate', 0)
+
+    key_metrics = {
+        'total_calls': summary['total_calls'],
+        'total_hours': summary['total_hours'],
+        'total_appointments': summary['total_appointments'],
+        'total_deals': summary['total_deals'],
+        'total_approved': summary['total_approved'],
+        'total_rejected': summary['total_rejected']
+    }
+    if 'approval_rate' in summary:
+        key_metrics['approval_rate'] = summary['approval_rate']
+
+    deal_keys = ['total_deals', 'total_approved', 'total_revenue', 'total_potential_revenue', 'approval_rate']
+    branch_performance = {
+        branch: {key: data[key] for key in ['total_calls', 'total_hours', 'total_appointments'] + deal_keys}
+        for branch, data in month_data['branches'].items()
+    }
+    product_performance = {
+        product: {key: data[key] for key in ['total_calls', 'total_hours', 'total_appointments'] + deal_keys}
+        for product, data in month_data['products'].items()
+    }
+    staff_rows = [
+        dict(staff_name=name, branch=data['branch'], **{
+            key: data[key] for key in ['total_calls', 'total_hours', 'total_appointments'] + deal_keys
+        })
+        for name, data in month_data['staff'].items()
+    ]
+    staff_rows.sort(key=lambda row: row['total_calls'], reverse=True)
+    staff_performance = {row['staff_name']: row for row in staff_rows[:TOP_STAFF_COUNT]}
+
+    staff_retention = retention_analysis['staff_retention_analysis']
+    retention_metrics = {
+        'total_staff': len(staff_retention),
+        'active_staff': sum(
+            1 for data in staff_retention.values()
+            if float(data['monthly_activity_rate']) > RISK_FACTORS['activity_rate_threshold']
+        ),
+        'high_risk_staff': len(risk['high_risk_staff']),
+        'medium_risk_staff': len(risk['medium_risk_staff']),
+        'low_risk_staff': len(risk['low_risk_staff']),
+        'retention_rate': retention_rate
+    }
+
+    alerts = []
+    if 'approval_rate' in key_metrics:
+        approval_rate = float(key_metrics['approval_rate'])
+        for level in ('critical', 'warning'):
+            threshold = ALERT_THRESHOLDS['approval_rate'][level]
+            if approval_rate < threshold:
+                alerts.append(_alert(level, '承認率', key_metrics['approval_rate'], threshold, '%', True))
+                break
+    for level in ('critical', 'warning'):
+        threshold = ALERT_THRESHOLDS['high_risk_staff'][level]
+        if retention_metrics['high_risk_staff'] >= threshold:
+            alerts.append(_alert(level, '高リスク学生', retention_metrics['high_risk_staff'], threshold, '名', False))
+            break
+    for level in ('critical', 'warning'):
+        threshold = ALERT_THRESHOLDS['retention'][level]
+        if float(retention_rate) < threshold:
+            alerts.append(_alert(level, '定着率', retention_rate, threshold, '%', True))
+            break
+
+    return {
+        'metadata': {
+            'report_period': month,
+            'generated_at': generated_at,
+            'report_type': 'monthly_summary'
+        },
+        'key_metrics': key_metrics,
+        'deal_status_breakdown': {
+            'approved': summary['total_approved'],
+            'rejected': summary['total_rejected'],
+            'pending': summary['total_deals'] - summary['total_approved'] - summary['total_rejected'],
+            'total': summary['total_deals']
+        },
+        'branch_performance': branch_performance,
+        'product_performance': product_performance,
+        'staff_performance': staff_performance,
+        'retention_metrics': retention_metrics,
+        'alerts': alerts,
+        'branch_product_cross_analysis': _build_branch_product_cross(month_data)
+    }
+
+
+def _build_branch_product_cross(month_data):
+    """支部×商材クロス分析（商材別商談数の比率でスタッフ実績を配分）"""
+    cross = {'taaan_deals': {}, 'approved_deals': {}, 'total_revenue': {}}
+    product_deals = {product: data['total_deals'] for product, data in month_data['products'].items()}
+    total_product_deals = sum(product_deals.values())
+    if total_product_deals == 0:
+        return cross
+    for staff in month_data['staff'].values():
+        if staff['total_deals'] <= 0:
+            continue
+        branch = staff['branch'] or '未設定'
+        for product, deals in product_deals.items():
+            ratio = deals / total_product_deals
+            for key, source in (('taaan_deals', 'total_deals'), ('approved_deals', 'total_approved'),
+                                ('total_revenue', 'total_revenue')):
+                cell = cross[key].setdefault(branch, {})
+                cell[product] = cell.get(product, 0) + _js_round(staff[source] * ratio)
+    return cross
+
+
+def _normalize_numbers(value, seen=None):
+    """整数値のfloatをintに置き換える（JSON.stringifyと同じく 3.0 を 3 と出力するため）"""
+    if seen is None:
+        seen = set()
+    if isinstance(value, (dict, list)):
+        if id(value) in seen:
+            return value
+        seen.add(id(value))
+        items = value.items() if isinstance(value, dict) else enumerate(value)
+        for key, item in items:
+            if isinstance(item, float) and item.is_integer():
+                value[key] = int(item)
+            elif isinstance(item, (dict, list)):
+                _normalize_numbers(item, seen)
+    return value
+
+
+def generate_dataset(staff_count=DEFAULT_STAFF_COUNT, month_count=DEFAULT_MONTH_COUNT,
+                     branch_count=DEFAULT_BRANCH_COUNT, product_count=DEFAULT_PRODUCT_COUNT,
+                     start_month=DEFAULT_START_MONTH, seed=0):
+    """
+    月次レポート一式の合成データを生成
+
+    全期間を含む基本分析・詳細分析・定着率分析は各月のファイルで同じオブジェクトを共有する
+    （generateMonthlyReportForAllMonths と同じく、各月ファイルに全期間分が含まれる）。
+
+    Args:
+        staff_count: スタッフ数
+        month_count: 月数
+        branch_count: 支部数
+        product_count: 商材数
+        start_month: 開始月（YYYY-MM形式）
+        seed: 乱数シード
+
+    Returns:
+        dict: ファイル名をキーとするJSONデータ（Zip展開後と同じ形式）
+    """
+    if min(staff_count, month_count, branch_count, product_count) < 1:
+        raise ValueError("スタッフ数・月数・支部数・商材数は1以上を指定してください")
+    rng = random.Random(seed)
+    months = _month_range(start_month, month_count)
+    branches = _names(BRANCH_NAMES, branch_count, '支部')
+    products = _names(PRODUCT_NAMES, product_count, '商材')
+    product_prices = {product: rng.randint(2, 10) * 5000 for product in products}
+
+    roster = _build_roster(rng, staff_count, months, branches, products)
+    daily = _generate_daily(rng, roster, months, products)
+    deals = _generate_deals(rng, daily, product_prices)
+    staff_branches = {staff['name']: staff['branch'] for staff in roster}
+
+    # 生成日時は最終月の翌月1日に固定（同じ引数で同じ内容になるように）
+    next_month = _month_range(months[-1], 2)[1]
+    generated_at = f"{next_month}-01T00:00:00.000Z"
+
+    basic = _build_basic_analysis(daily, deals, staff_branches, generated_at)
+    retention = _build_retention_analysis(daily, generated_at)
+    detailed = _build_detailed_analysis(basic)
+
+    json_data = {}
+    for month in months:
+        summary = _build_monthly_summary(basic, retention, month, generated_at)
+        if summary is not None:
+            json_data[f"月次サマリー_{month}.json"] = summary
+        json_data[f"定着率分析_{month}.json"] = retention
+        json_data[f"詳細分析_{month}.json"] = detailed
+        json_data[f"基本分析_{month}.json"] = basic
+    return _normalize_numbers(json_data)
+
+
+def write_dataset_zip(json_data, output):
+    """
+    合成データをアップロード用Zip（整形済みJSON）として書き出す
+
+    同じオブジェクトを参照するファイルは1回だけシリアライズする。
+
+    Args:
+        json_data: ファイル名をキーとするJSONデータ
+        output: 出力先のパスまたはバイナリファイルオブジェクト
+    """
+    serialized = {}
+    with zipfile.ZipFile(output, 'w', compression=zipfile.ZIP_DEFLATED) as zip_ref:
+        for filename, data in json_data.items():
+            text = serialized.get(id(data))
+            if text is None:
+                text = serialized[id(data)] = json.dumps(data, ensure_ascii=False, indent=2).encode('utf-8')
+            zip_ref.writestr(filename, text)
+
+
+def main(argv=None):
+    """コマンドライン実行"""
+    parser = argparse.ArgumentParser(
+        description='generateJson.js と同じ構造の合成データ（月次レポート一式）を生成します'
+    )
+    parser.add_argument('-o', '--output', required=True,
+                        help='出力先（.zip または .isbundle。拡張子でZip/バンドルを切り替え）')
+    parser.add_argument('--staff', type=int, default=DEFAULT_STAFF_COUNT, help='スタッフ数')
+    parser.add_argument('--months', type=int, default=DEFAULT_MONTH_COUNT, help='月数')
+    parser.add_argument('--start-month', default=DEFAULT_START_MONTH, help='開始月（YYYY-MM形式）')
+    parser.add_argument('--branches', type=int, default=DEFAULT_BRANCH_COUNT, help='支部数')
+    parser.add_argument('--products', type=int, default=DEFAULT_PRODUCT_COUNT, help='商材数')
+    parser.add_argument('--scale', type=int, default=1, help='スタッフ数の倍率（10や100で現行規模の10倍・100倍）')
+    parser.add_argument('--seed', type=int, default=0, help='乱数シード')
+    args = parser.parse_args(argv)
+
+    try:
+        datetime.date.fromisoformat(args.start_month + '-01')
+        json_data = generate_dataset(
+            staff_count=args.staff * args.scale,
+            month_count=args.months,
+            branch_count=args.branches,
+            product_count=args.products,
+            start_month=args.start_month,
+            seed=args.seed
+        )
+    except ValueError as e:
+        print(f"❌ 生成に失敗しました: {e}")
+        return 1
+
+    if args.output.endswith('.isbundle'):
+        from utils.dataset_bundle import write_bundle
+        with open(args.output, 'wb') as f:
+            write_bundle(json_data, f)
+    else:
+        write_dataset_zip(json_data, args.output)
+
+    basic = json_data[max(name for name in json_data if name.startswith('基本分析_'))]
+    activity_days = sum(
+        len(staff['daily_activity'])
+        for month_data in basic['monthly_analysis'].values()
+        for staff in month_data['staff'].values()
+    )
+    print(f"✅ {len(json_data)}個のJSONファイルを生成しました → {args.output}")
+    print(f"👥 スタッフ {args.staff * args.scale:,}名 / {args.months}ヶ月 / "
+          f"支部 {args.branches} / 商材 {args.products} / 日次活動 {activity_days:,}件")
+    print(f"📦 {os.path.getsize(args.output):,} bytes")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())